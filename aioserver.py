@@ -0,0 +1,134 @@
+# aioserver.py
+"""
+asyncio game socket server: the /game/<game_id> protocol without a thread
+per connection.
+
+    python -m aioserver --host 0.0.0.0 --port 8001
+
+Each connection is one coroutine reading frames (wsproto does the
+WebSocket framing over asyncio streams) and handing them to
+protocol.receive, the same entry point app.py uses: the room's actor
+applies them in order on a worker thread and answers through
+Connection.send. An idle connection costs a coroutine, a socket and a
+wsproto state machine. Raise the file descriptor limit (ulimit -n) to match the number
+of connections you expect.
+
+The deck REST API and the pages stay on the Flask app.
+"""
+import argparse
+import asyncio
+import re
+
+from wsproto import ConnectionType, WSConnection
+from wsproto.events import (AcceptConnection, CloseConnection, Message, Ping, RejectConnection,
+                            Request, TextMessage)
+from wsproto.utilities import RemoteProtocolError
+
+import gamelog
+import protocol
+
+log = gamelog.channel('ws')
+
+GAME_PATH = re.compile(r'^/game/([^/?#]+)/?(?:\?.*)?$')
+READ_SIZE = 1 << 16
+
+
+# --- connections -----------------------------------------------------------------
+
+class Connection:
+    """
+    What protocol.* sees as `ws`. send() may be called from any thread (bot
+    seats, room actors); frames sent after the socket closed are dropped.
+    """
+
+    def __init__(self, ws, writer, loop):
+        self._ws = ws
+        self._writer = writer
+        self._loop = loop
+        self.closed = False
+
+    def send(self, text):
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._write(text)
+        else:
+            self._loop.call_soon_threadsafe(self._write, text)
+
+    def _write(self, text):
+        if not self.closed:
+            self._writer.write(self._ws.send(Message(data=text)))
+
+    def close(self, code=1000):
+        self._loop.call_soon_threadsafe(self._close, code)
+
+    def _close(self, code):
+        if not self.closed:
+            self._writer.write(self._ws.send(CloseConnection(code=code)))
+            self.closed = True
+            self._writer.close()
+
+
+# --- serving ----------------------------------------------------------------------
+
+async def _serve(reader, writer):
+    ws = WSConnection(ConnectionType.SERVER)
+    conn = None
+    parts = []
+    try:
+        while True:
+            data = await reader.read(READ_SIZE)
+            ws.receive_data(data or None)
+            for event in ws.events():
+                if isinstance(event, Request):
+                    match = GAME_PATH.match(event.target)
+                    if match is None:
+                        writer.write(ws.send(RejectConnection(status_code=404)))
+                        return
+                    writer.write(ws.send(AcceptConnection()))
+                    conn = Connection(ws, writer, asyncio.get_running_loop())
+                    protocol.open_connection(conn, match.group(1))
+                elif isinstance(event, TextMessage):
+                    parts.append(event.data)
+                    if event.message_finished:
+                        text = ''.join(parts)
+                        parts.clear()
+                        if not text:
+                            log.info("close", conn_id=conn._id, reason="empty_message")
+                            conn._close(1000)
+                            return
+                        protocol.receive(conn, text)
+                elif isinstance(event, Ping):
+                    writer.write(ws.send(event.response()))
+                elif isinstance(event, CloseConnection):
+                    log.info("close", conn_id=conn._id, reason="ConnectionClosed")
+                    if not conn.closed:
+                        writer.write(ws.send(event.response()))
+                    return
+            if not data:
+                return
+            await writer.drain()
+    except (ConnectionError, RemoteProtocolError):
+        pass
+    finally:
+        if conn is not None:
+            conn.closed = True
+            protocol.close_connection(conn)
+        writer.close()
+
+
+async def main(host='127.0.0.1', port=8001):
+    server = await asyncio.start_server(_serve, host, port, backlog=4096)
+    log.info("listening", host=host, port=port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    args = parser.parse_args()
+    asyncio.run(main(args.host, args.port))
@@ -1,21 +1,28 @@
 from flask import Flask, render_template,  redirect
 from flask_sock import Sock
-import json
 import uuid
-from game import ChessGame
+import os
+import hmac
+import json
 from flask_cors import CORS
-import traceback, faulthandler
-from flask import Flask, request, jsonify, abort
+import faulthandler
+from flask import Flask, request, jsonify, abort, Response, stream_with_context
 from models import db, User, Deck, DeckPile, DeckCard, PileType
 from functools import wraps
+from collections import namedtuple
+from sqlalchemy import delete, event, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, object_session, selectinload
+from ttlcache import TTLCache
 import inspect
 from cards import Monster, Land, Sorcery  # import your base classes
-# Both gave choices & readied -> validate & start
+import registry
+import gamelog
 from game import validate_deck_payload
+import protocol
 from simple_websocket.errors import ConnectionClosed
-import time
-from itertools import count
-WS_ID_COUNTER = count(1)  # 1,2,3,...
+
+log = gamelog.channel('ws')
 
 
 
@@ -25,8 +32,8 @@ app = Flask(__name__)
 CORS(app)
 sock = Sock(app)
 
-# dev: SQLite; prod: set to your Postgres URL
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///dev.db"
+# dev: SQLite; prod: set DATABASE_URL to your Postgres URL
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///dev.db")
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 db.init_app(app)
 
@@ -34,49 +41,9 @@ db.init_app(app)
 
 # --- helpers ---------------------------------------------------------------
 
-def _all_subclasses(cls):
-    out = set()
-    for sub in cls.__subclasses__():
-        out.add(sub)
-        out |= _all_subclasses(sub)
-    return out
-
-# keep only stable, catalog-y fields; strip instance id/owner
-WANTED_FIELDS = {
-    "card_id","type","name","role","mana","image","text","attack","defense",
-    "activation_needs","creation_needs","movement"
-}
-
-def _slim(d: dict) -> dict:
-    return {k: v for k, v in d.items() if k in WANTED_FIELDS}
-
-# cache so we don’t rebuild every request (hot-reload clears this)
-_CARD_CATALOG = None
-
 def build_card_catalog():
-    global _CARD_CATALOG
-    if _CARD_CATALOG is not None:
-        return _CARD_CATALOG
-
-    catalog = []
-    for base in (Monster, Land, Sorcery):
-        for cls in sorted(_all_subclasses(base), key=lambda c: c.__name__):
-            # Most of your cards only need owner
-            try:
-                inst = cls(owner="1")
-            except TypeError:
-                # If a special constructor appears, skip it (or handle here)
-                continue
-            d = inst.to_dict()
-            d.pop("id", None)     # per-instance uuid
-            d.pop("owner", None)  # not needed for catalog
-            # prefer class attr name if to_dict omitted it
-            if "name" not in d and getattr(cls, "name", None):
-                d["name"] = cls.name
-            catalog.append(_slim(d))
-
-    _CARD_CATALOG = catalog
-    return _CARD_CATALOG
+    # prebuilt once when cards.py is imported; /api/cards/reload rebuilds it
+    return registry.catalog()
 
 # --- routes ----------------------------------------------------------------
 
@@ -86,7 +53,6 @@ def api_cards():
     Optional filters:
       /api/cards?type=monster|sorcery|land&role=blue&q=search
     """
-    print('heeeere')
     data = build_card_catalog()
     q_type = (request.args.get("type") or "").lower()
     q_role = (request.args.get("role") or "").lower()
@@ -102,11 +68,17 @@ def api_cards():
 
     return jsonify([c for c in data if ok(c)])
 
+@app.get("/api/admin/rooms")
+def api_admin_rooms():
+    """Rooms held in memory vs spilled to disk (see protocol.py, room lifecycle). Admin only."""
+    if not _is_admin():
+        abort(403)
+    return jsonify(protocol.room_stats())
+
 @app.post("/api/cards/reload")
 def api_cards_reload():
-    """If you edit cards.py at runtime, call this to rebuild the cache."""
-    global _CARD_CATALOG
-    _CARD_CATALOG = None
+    """If you edit cards.py at runtime, call this to rebuild the registry."""
+    registry.reload()
     return jsonify({"ok": True, "reloaded": True})
 
 
@@ -114,21 +86,72 @@ def api_cards_reload():
 # For now, keep it simple: FE sends Clerk user id in a header after verifying with Clerk.
 CLERK_HEADER = "X-Clerk-User-Id"
 
+# Clerk user id -> users.id, shared by all request threads; saves the lookup
+# (and the racy first insert) on every authenticated request. Deleted users
+# are dropped once the delete commits (earlier, a concurrent request could
+# cache the id again before the row is gone). The cache is per process: other
+# workers can keep serving a deleted user's id until its TTL runs out.
+_user_ids = TTLCache(maxsize=10_000, ttl=300)
+
+AuthUser = namedtuple("AuthUser", "id clerk_user_id")
+
+def _resolve_user_id(clerk_user_id):
+    user = User.query.filter_by(clerk_user_id=clerk_user_id).first()
+    if not user:
+        user = User(clerk_user_id=clerk_user_id)
+        db.session.add(user)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # another process inserted the same user first
+            db.session.rollback()
+            user = User.query.filter_by(clerk_user_id=clerk_user_id).one()
+    return user.id
+
+@event.listens_for(User, "after_delete")
+def _forget_deleted_user(mapper, connection, target):
+    object_session(target).info.setdefault("deleted_clerk_user_ids", set()).add(target.clerk_user_id)
+
+@event.listens_for(Session, "do_orm_execute")
+def _forget_bulk_deleted_users(orm_execute_state):
+    # Query.delete() / session.execute(delete(User)) skip after_delete
+    if orm_execute_state.is_delete and orm_execute_state.bind_mapper is User.__mapper__:
+        orm_execute_state.session.info["deleted_users_in_bulk"] = True  # which ones isn't known
+
+@event.listens_for(Session, "after_commit")
+def _forget_committed_deletes(session):
+    if session.info.pop("deleted_users_in_bulk", False):
+        _user_ids.clear()
+    for clerk_user_id in session.info.pop("deleted_clerk_user_ids", ()):
+        _user_ids.invalidate(clerk_user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _keep_rolled_back_users(session):
+    session.info.pop("deleted_users_in_bulk", None)
+    session.info.pop("deleted_clerk_user_ids", None)
+
+def _authenticate():
+    clerk_user_id = request.headers.get(CLERK_HEADER)
+    if not clerk_user_id:
+        abort(401)
+    user_id = _user_ids.get_or_load(clerk_user_id, lambda: _resolve_user_id(clerk_user_id))
+    request.user = AuthUser(user_id, clerk_user_id)
+
 def require_user(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
-        clerk_user_id = request.headers.get(CLERK_HEADER)
-        if not clerk_user_id:
-            abort(401)
-        user = User.query.filter_by(clerk_user_id=clerk_user_id).first()
-        if not user:
-            user = User(clerk_user_id=clerk_user_id)
-            db.session.add(user)
-            db.session.commit()
-        request.user = user
+        _authenticate()
         return f(*args, **kwargs)
     return wrapper
 
+# Admin-scoped endpoints compare this header to the ADMIN_TOKEN env var (unset: no admin access).
+ADMIN_HEADER = "X-Admin-Token"
+app.config["ADMIN_TOKEN"] = os.environ.get("ADMIN_TOKEN")
+
+def _is_admin():
+    token = app.config["ADMIN_TOKEN"]
+    return bool(token) and hmac.compare_digest(request.headers.get(ADMIN_HEADER, ""), token)
+
 @app.route("/api/decks", methods=["GET"])
 @require_user
 def list_decks():
@@ -164,22 +187,41 @@ def create_deck():
 @app.route("/api/decks/<deck_id>", methods=["GET"])
 @require_user
 def get_deck(deck_id):
-    deck = Deck.query.filter_by(id=deck_id, user_id=request.user.id).first_or_404()
-    piles = DeckPile.query.filter_by(deck_id=deck.id).all()
-    result = {
+    # deck + piles + ordered cards in one query
+    deck = (Deck.query
+            .options(joinedload(Deck.piles).joinedload(DeckPile.cards))
+            .filter_by(id=deck_id, user_id=request.user.id)
+            .first_or_404())
+    return jsonify(_deck_json(deck))
+
+@app.route("/api/decks/full", methods=["GET"])
+@require_user
+def get_decks_full():
+    """
+    Many decks with their piles and cards in one response:
+      /api/decks/full              every deck of the user
+      /api/decks/full?ids=a,b,c    just these (unknown ids are left out)
+    """
+    q = (Deck.query
+         .options(selectinload(Deck.piles).selectinload(DeckPile.cards))
+         .filter_by(user_id=request.user.id))
+    ids = [i for i in (request.args.get("ids") or "").split(",") if i]
+    if ids:
+        q = q.filter(Deck.id.in_(ids))
+    decks = q.order_by(Deck.created_at.desc()).all()  # 3 queries however many decks
+    return jsonify([_deck_json(d) for d in decks])
+
+def _deck_json(deck):
+    return {
         "id": str(deck.id),
         "name": deck.name,
         "description": deck.description,
         "is_active": deck.is_active,
-        "piles": {}
+        "piles": {
+            p.pile_type.value: [{"card_id": c.card_id, "qty": c.qty, "position": c.position} for c in p.cards]
+            for p in deck.piles
+        },
     }
-    for p in piles:
-        cards = (DeckCard.query
-                 .filter_by(pile_id=p.id)
-                 .order_by(DeckCard.position.asc().nulls_last(), DeckCard.card_id.asc())
-                 .all())
-        result["piles"][p.pile_type.value] = [{"card_id": c.card_id, "qty": c.qty, "position": c.position} for c in cards]
-    return jsonify(result)
 
 @app.route("/api/decks/<deck_id>", methods=["PUT"])
 @require_user
@@ -200,40 +242,82 @@ def update_deck(deck_id):
 @require_user
 def replace_pile_cards(deck_id):
     """
-    Body:
+    Body, one pile:
     {
       "pile": "MAIN" | "LAND" | "SIDE",
       "cards": [{"card_id":"bonecrawler","qty":3,"position":null}, ...]
     }
-    This REPLACES the pile contents (idempotent).
+    or several at once:
+    {
+      "piles": {"MAIN": [...cards], "LAND": [...cards]}
+    }
+    This REPLACES the contents of every pile given (idempotent). Only the rows
+    that differ are written: one bulk insert, update and delete, one transaction.
     """
     data = request.get_json(force=True) or {}
-    pile_name = (data.get("pile") or "").upper()
-    try:
-        pile_type = PileType[pile_name]
-    except Exception:
-        return jsonify({"error":"invalid pile"}), 400
+    if "piles" in data:
+        given = data.get("piles") or {}
+    else:
+        given = {data.get("pile") or "": data.get("cards")}
+    wanted = {}
+    for pile_name, entries in given.items():
+        try:
+            pile_type = PileType[pile_name.upper()]
+        except Exception:
+            return jsonify({"error":"invalid pile"}), 400
+        rows = _pile_rows(entries or [])
+        if rows is None:
+            return jsonify({"error": f"duplicate card_id in {pile_type.value}"}), 400
+        wanted[pile_type] = rows
 
     deck = Deck.query.filter_by(id=deck_id, user_id=request.user.id).first_or_404()
-    pile = DeckPile.query.filter_by(deck_id=deck.id, pile_type=pile_type).first()
-    if not pile:
-        pile = DeckPile(deck_id=deck.id, pile_type=pile_type)
-        db.session.add(pile)
-        db.session.flush()
-
-    # wipe and replace
-    DeckCard.query.filter_by(pile_id=pile.id).delete()
-    cards = data.get("cards") or []
-    for i, entry in enumerate(cards):
+    piles = {p.pile_type: p for p in
+             DeckPile.query.filter(DeckPile.deck_id == deck.id, DeckPile.pile_type.in_(list(wanted)))}
+    for pile_type in wanted:
+        if pile_type not in piles:
+            piles[pile_type] = DeckPile(deck_id=deck.id, pile_type=pile_type)
+            db.session.add(piles[pile_type])
+    db.session.flush()
+
+    stored = {}  # (pile_id, card_id) -> (row id, qty, position)
+    for row_id, pile_id, cid, qty, pos in db.session.execute(
+            select(DeckCard.id, DeckCard.pile_id, DeckCard.card_id, DeckCard.qty, DeckCard.position)
+            .where(DeckCard.pile_id.in_([p.id for p in piles.values()]))):
+        stored[(pile_id, cid)] = (row_id, qty, pos)
+
+    inserts, updates = [], []
+    for pile_type, rows in wanted.items():
+        pile_id = piles[pile_type].id
+        for cid, (qty, pos) in rows.items():
+            have = stored.pop((pile_id, cid), None)
+            if have is None:
+                inserts.append({"pile_id": pile_id, "card_id": cid, "qty": qty, "position": pos})
+            elif have[1:] != (qty, pos):
+                updates.append({"id": have[0], "qty": qty, "position": pos})
+    deletes = [row_id for row_id, _, _ in stored.values()]
+
+    if deletes:
+        db.session.execute(delete(DeckCard).where(DeckCard.id.in_(deletes)))
+    if updates:
+        db.session.execute(update(DeckCard), updates)
+    if inserts:
+        db.session.execute(insert(DeckCard), inserts)
+    db.session.commit()
+    return jsonify({"ok": True, "inserted": len(inserts), "updated": len(updates), "deleted": len(deletes)})
+
+def _pile_rows(entries):
+    """Request cards -> {card_id: (qty, position)}; None if a card_id repeats."""
+    rows = {}
+    for i, entry in enumerate(entries):
         cid = entry.get("card_id")
         qty = int(entry.get("qty", 1))
         pos = entry.get("position", i)
         if not cid or qty <= 0:
             continue
-        db.session.add(DeckCard(pile_id=pile.id, card_id=cid, qty=qty, position=pos))
-
-    db.session.commit()
-    return jsonify({"ok": True})
+        if cid in rows:
+            return None
+        rows[cid] = (qty, pos)
+    return rows
 
 @app.route("/api/decks/<deck_id>", methods=["DELETE"])
 @require_user
@@ -245,255 +329,143 @@ def delete_deck(deck_id):
 
 
 
-user_assignments = {}
-connected_users = {}
-games = {}
-# app.py (game socket handler additions)
-
-rooms = {}  # game_id -> {"phase": "lobby"|"playing", "choices": {"1": None, "2": None}, "ready": {"1": False, "2": False}}
-
-def _room(game_id):
-    if game_id not in rooms:
-        rooms[game_id] = {
-            "phase": "lobby",
-            "choices": {'1': None, '2': None},   # stores uploaded payloads (or deck_ids)
-            "ready": {'1': False, '2': False},
-        }
-    return rooms[game_id]
-
-def _broadcast_lobby(game_id):
-    r = _room(game_id)
-    if r['phase'] != 'lobby':
-        return
-    game = games.get(game_id)
-    extra = {
-        'phase': r['phase'],
-        'choices': {k: bool(v) for k, v in r['choices'].items()},
-        'ready': r['ready'],
-        'usernames': user_assignments.get(game_id, {}),
-    }
-    _broadcast(game_id, 'lobby', game, extra)
-
-def _maybe_start_match(game_id, game):
-    r = _room(game_id)
-    if r["phase"] != "lobby":
-        return
-    if not (r["choices"]['1'] and r["choices"]['2']):
-        return
-    if not (r["ready"]['1'] and r["ready"]['2']):
-        return
-
-
-
-    ok1, msg1 = validate_deck_payload(r["choices"]['1'])
-    ok2, msg2 = validate_deck_payload(r["choices"]['2'])
-    if not ok1 or not ok2:
-        # notify failures to specific users if you want; for now, broadcast
-        _broadcast(game_id, "lobby_error", game, {
-                      "message": f"Deck invalid: P1={msg1}, P2={msg2}"
-                                   })
-        return
-
-    p1 = r["choices"]['1']["piles"]
-    p2 = r["choices"]['2']["piles"]
-    game.apply_decks_and_start(
-        p1.get("MAIN", []), p1.get("LAND", []),
-        p2.get("MAIN", []), p2.get("LAND", []),
-    )
-
-    r["phase"] = "playing"
-    # Send initial full state with type 'init' like you already do
-    _broadcast(game_id, 'init', game, {
-        'usernames': user_assignments.get(game_id, {}),
-        'message': 'Match started',
-        'phase': 'playing',   # <-- add
-    })
-
-
-# ---------- Helpers (no behavior change) ----------
-
-def _ser_board(game):
-    return [[p.to_dict() if p else None for p in row] for row in game.board]
-
-def _ser_land_board(game):
-    return [[p.to_dict() if p else None for p in row] for row in game.land_board]
-
-def _ser_hand(game, pid):
-    return [c.to_dict() for c in game.hands[pid]]
-
-def _ser_graveyard(game):
-    return {
-        '1': [c.to_dict() for c in game.graveyard['1']],
-        '2': [c.to_dict() for c in game.graveyard['2']],
-    }
-
-def _ser_land_decks(game):
-    return {
-        '1': [c.to_dict() for c in game.land_decks['1']],
-        '2': [c.to_dict() for c in game.land_decks['2']],
-    }
-
-def _deck_sizes(game):
-    return {
-        '1': len(game.decks['1']),
-        '2': len(game.decks['2']),
-    }
-
-def _actions_this_turn(game):
-    return {
-        '1': {
-            'summoned': '1' in game.summoned_this_turn,
-            'sorcery_used': '1' in game.sorcery_used_this_turn,
-            'land_placed': '1' in game.land_placed_this_turn,
-        },
-        '2': {
-            'summoned': '2' in game.summoned_this_turn,
-            'sorcery_used': '2' in game.sorcery_used_this_turn,
-            'land_placed': '2' in game.land_placed_this_turn,
-        },
-        # Optional: perspective-friendly flags
-        'current': {
-            'summoned': game.current_player in game.summoned_this_turn,
-            'sorcery_used': game.current_player in game.sorcery_used_this_turn,
-            'land_placed': game.current_player in game.land_placed_this_turn,
-        }
-    }
-
-def _base_state(game):
-    # Matches what you were sending everywhere
-    return {
-        'board': _ser_board(game),
-        'land_board': _ser_land_board(game),
-        'hand1': _ser_hand(game, '1'),
-        'hand2': _ser_hand(game, '2'),
-        'turn': game.current_player,
-        'mana': game.mana,
-        'graveyard': _ser_graveyard(game),
-        'land_decks': _ser_land_decks(game),
-        'deck_sizes': _deck_sizes(game),
-        'center_tile_control': game.center_tile_control,
-        'actions_this_turn': _actions_this_turn(game),
-        'stack': game.stack,
-        'interaction': _ser_interaction(game.interaction, game)
-    }
-
-
-def _ser_step(step: 'StepSpec'):
-    if not step:
-        return None
-    return {
-        'kind': step.kind,
-        'owner': step.owner,
-        'zone': step.zone,
-        'filter': step.filter,
-        'as_key': step.as_key,
-        'cost': step.cost,
-    }
-
-def _step_suggestions(game, ixn, step):
-    """Return a list the FE can use to render/choose (or [] if none)."""
-    owner = ixn.owner
-    if step.kind == "select_board_target":
-        out = []
-        for x, row in enumerate(game.board):
-            for y, c in enumerate(row):
-                if not c: continue
-                if step.filter and step.filter.get("require_monster") and getattr(c, "type", None) != "monster":
-                    continue
-                if step.owner == "self" and c.owner != owner:
-                    continue
-                if step.owner == "opponent" and c.owner == owner:
-                    continue
-                if step.filter and step.filter.get("require_enemy") and c.owner == owner:
-                    continue
-                out.append([x, y])
-        return out
-
-    if step.kind == "select_land_target":
-        out = []
-        for x, row in enumerate(game.land_board):
-            for y, land in enumerate(row):
-                if not land: continue
-                if step.owner == "self" and land.owner != owner:
-                    continue
-                if step.owner == "opponent" and land.owner == owner:
-                    continue
-                out.append([x, y])
-        return out
-
-    if step.kind == "select_deck_card":
-        deck = game.decks[owner]
-        filt = step.filter or {}
-        def ok(card):
-            if filt.get("type") and getattr(card, "type", None) != filt["type"]:
-                return False
-            if "role" in filt and getattr(card, "role", None) != filt["role"]:
-                return False
-            if "max_attack" in filt and getattr(card, "attack", None) is not None and card.attack > int(filt["max_attack"]):
-                return False
-            if "min_attack" in filt and getattr(card, "attack", None) is not None and card.attack < int(filt["min_attack"]):
-                return False
-            return True
-        return [c.to_dict() for c in deck if ok(c)]
-
-    if step.kind == "discard_from_hand":
-        # FE can just let the active player click any card in hand.
-        # (Return indices if you prefer: list(range(len(game.hands[owner]))))
-        return []
-
-    if step.kind == "pay_cost":
-        return []
-
-    if step.kind == "apply_effect":
-        return []
-
-    return []
-
-def _ser_interaction(ixn, game=None):
-    if not ixn:
-        return None
-    step = ixn.current_step()
-    awaiting = _ser_step(step) if step else None
-    if awaiting and game is not None:
-        awaiting = {**awaiting, "suggestions": _step_suggestions(game, ixn, step)}
-    return {
-        'type': ixn.type,
-        'owner': ixn.owner,
-        'card_id': ixn.card_id,
-        'slot_index': ixn.slot_index,
-        'free': ixn.free,
-        'pos': ixn.pos,
-        'cursor': ixn.cursor,
-        'awaiting': awaiting
-    }
 
+# --- Bulk import/export: one deck per line (NDJSON), same shape choose_deck takes ---
+#   {"name": ..., "description": ..., "piles": {"MAIN": [{"card_id", "qty"}, ...], "LAND": [...], "SIDE": [...]}}
 
+EXPORT_FETCH = 1000   # rows per server-side cursor fetch
+IMPORT_BATCH = 500    # decks per transaction
+MAX_IMPORT_ERRORS = 100
 
+@app.get("/api/decks/export")
+def export_decks():
+    """
+    Stream decks as NDJSON:
+      /api/decks/export                     the caller's decks
+      /api/decks/export?scope=all           every deck        (admin)
+      /api/decks/export?users=clerk1,...    these users' decks (admin)
+    """
+    users = [u for u in (request.args.get("users") or "").split(",") if u]
+    stmt = (select(Deck.id, Deck.name, Deck.description, DeckPile.pile_type, DeckCard.card_id, DeckCard.qty)
+            .outerjoin(DeckPile, DeckPile.deck_id == Deck.id)
+            .outerjoin(DeckCard, DeckCard.pile_id == DeckPile.id)
+            .order_by(Deck.id, DeckPile.pile_type, DeckCard.position.asc().nulls_last(), DeckCard.card_id))
+    if request.args.get("scope") == "all" or users:
+        if not _is_admin():
+            abort(403)
+        if users:
+            stmt = stmt.join(User, User.id == Deck.user_id).where(User.clerk_user_id.in_(users))
+    else:
+        _authenticate()
+        stmt = stmt.where(Deck.user_id == request.user.id)
+
+    def lines():
+        # rows arrive grouped by deck; emit each deck as soon as the next one starts
+        result = db.session.execute(stmt.execution_options(yield_per=EXPORT_FETCH))
+        deck = None
+        for deck_id, name, description, pile_type, card_id, qty in result:
+            if deck is None or deck["id"] != deck_id:
+                if deck is not None:
+                    yield json.dumps(deck) + "\n"
+                deck = {"id": deck_id, "name": name, "description": description,
+                        "piles": {p.value: [] for p in PileType}}
+            if card_id is not None:
+                deck["piles"][pile_type.value].append({"card_id": card_id, "qty": qty})
+        if deck is not None:
+            yield json.dumps(deck) + "\n"
+
+    return Response(stream_with_context(lines()), mimetype="application/x-ndjson")
+
+@app.post("/api/decks/import")
+@require_user
+def import_decks():
+    """
+    Body: NDJSON, one deck per line (blank lines are skipped). Read as a stream and
+    written IMPORT_BATCH decks per transaction. Card ids go through the registry.
+    -> {"imported": n, "failed": n, "errors": [{"line", "error"}, ...]}
+    """
+    imported, failed, errors = 0, 0, []
+    batch = []  # (line number, deck payload)
 
-def _send(ws, msg_type, game, extra=None):
-    payload = {'type': msg_type, **_base_state(game)}
-    if extra: payload.update(extra)
-    ws.send(json.dumps(payload))
+    def fail(line_no, msg):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_IMPORT_ERRORS:
+            errors.append({"line": line_no, "error": msg})
 
-def _broadcast(game_id, msg_type, game, extra=None):
-    conns = connected_users.get(game_id, {})
-    dead = []
-    for uid, ws_conn in list(conns.items()):
+    def flush():
+        nonlocal imported
         try:
-            _send(ws_conn, msg_type, game, extra)
-        except Exception:
-            dead.append(uid)
-    for uid in dead:
-        conns.pop(uid, None)
-
-
-def _broadcast_per_viewer(game_id, builder):
-    """builder(uid, game)->(msg_type, extra_dict) so you can vary 'type' per-recipient."""
-    conns = connected_users.get(game_id, {})
-    game = games[game_id]
-    for uid, ws_conn in conns.items():
-        msg_type, extra = builder(uid, game)
-        _send(ws_conn, msg_type, game, extra)
+            _insert_decks(request.user.id, [d for _, d in batch])
+            db.session.commit()
+            imported += len(batch)
+        except Exception as e:
+            db.session.rollback()
+            for line_no, _ in batch:
+                fail(line_no, f"batch failed: {e}")
+        batch.clear()
+
+    for line_no, raw in enumerate(request.stream, 1):
+        if not raw.strip():
+            continue
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            fail(line_no, "invalid JSON")
+            continue
+        msg = _import_error(payload)
+        if msg:
+            fail(line_no, msg)
+            continue
+        batch.append((line_no, payload))
+        if len(batch) >= IMPORT_BATCH:
+            flush()
+    if batch:
+        flush()
+    return jsonify({"imported": imported, "failed": failed, "errors": errors})
+
+def _import_error(payload):
+    """Why a deck line can't be imported, or None."""
+    if not isinstance(payload, dict) or not isinstance(payload.get("piles") or {}, dict):
+        return "Bad payload"
+    if not isinstance(payload.get("name"), str) or not payload["name"].strip():
+        return "name required"
+    for rows in payload["piles"].values() if payload.get("piles") else ():
+        if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+            return "Bad pile"
+        if not all(isinstance(r.get("qty", 1), int) for r in rows):
+            return "qty must be an integer"
+    ok, msg = validate_deck_payload(payload)
+    return None if ok else msg
+
+def _insert_decks(user_id, payloads):
+    """Bulk-insert validated deck payloads: decks, then their piles, then their cards."""
+    decks, piles, cards = [], [], []
+    pile_cards = {}  # (deck id, pile type) -> {card_id: qty}
+    for payload in payloads:
+        deck_id = str(uuid.uuid4())
+        decks.append({"id": deck_id, "user_id": user_id, "name": payload["name"].strip(),
+                      "description": payload.get("description")})
+        given = payload.get("piles") or {}
+        for pile_type in PileType:
+            rows = given.get(pile_type.value) or []
+            if not rows and pile_type is PileType.SIDE:
+                continue  # new decks get MAIN and LAND, like create_deck
+            piles.append({"deck_id": deck_id, "pile_type": pile_type})
+            qtys = pile_cards[(deck_id, pile_type)] = {}
+            for row in rows:
+                cid = registry.metadata(registry.lookup(row["card_id"]))["card_id"]
+                qty = int(row.get("qty", 1))
+                if qty > 0:
+                    qtys[cid] = qtys.get(cid, 0) + qty
+    db.session.execute(insert(Deck), decks)
+    pile_ids = db.session.execute(insert(DeckPile).returning(DeckPile.id, DeckPile.deck_id, DeckPile.pile_type),
+                                  piles)
+    for pile_id, deck_id, pile_type in pile_ids:
+        for i, (cid, qty) in enumerate(pile_cards[(deck_id, pile_type)].items()):
+            cards.append({"pile_id": pile_id, "card_id": cid, "qty": qty, "position": i})
+    if cards:
+        db.session.execute(insert(DeckCard), cards)
 
 
 @app.route('/')
@@ -513,366 +485,23 @@ def room(game_id):
 
 @sock.route('/game/<game_id>')
 def game(ws, game_id):
-    ws._id = next(WS_ID_COUNTER)
-    print(f"[WS] {time.time():.6f} OPEN conn_id={ws._id} game_id={game_id}")
-
-    if game_id not in games:
-        games[game_id] = ChessGame()
-
-    game = games[game_id]
-    user_id = None
-
-    # Ensure we have a persistent assignment for this game.
-    if game_id not in user_assignments:
-        user_assignments[game_id] = {}
-
+    protocol.open_connection(ws, game_id)
     try:
         while True:
             try:
                 message = ws.receive()
             except ConnectionClosed as cc:
-                print(f"[WS] {time.time():.6f} CLOSE conn_id={ws._id} reason=ConnectionClosed")
+                log.info("close", conn_id=ws._id, reason="ConnectionClosed")
                 # Normal client disconnect (page change, StrictMode unmount, tab close, etc.)
                 break
 
-
             if not message:
-                print(f"[WS] {time.time():.6f} CLOSE conn_id={ws._id} reason=empty_message")
-
+                log.info("close", conn_id=ws._id, reason="empty_message")
                 break
-            print(f"[WS] {time.time():.6f} RECV conn_id={ws._id} raw={message[:200]}")
-
-            try:
-                data = json.loads(message)
-            except Exception:
-                # Not JSON? Ignore this frame and keep waiting.
-                try:
-                    ws.send(json.dumps({'type': 'error', 'message': 'Expected JSON'}))
-                except Exception:
-                    pass
-                continue
-
-            if not user_id:
-                # Ensure the connected_users map exists for this game.
-                if game_id not in connected_users:
-                    connected_users[game_id] = {}
-                game_users = connected_users[game_id]
-
-                # Get the username from the client (the client generated it if none existed)
-                incoming_username = data.get('username')
-
-                if not incoming_username:
-                    # Ignore and wait for a proper identify packet; do NOT close the socket.
-                    try:
-                        ws.send(json.dumps({'type': 'error', 'message': 'Username is required'}))
-                    except Exception:
-                        pass
-                    continue
-                print(f"[WS] {time.time():.6f} IDENT conn_id={ws._id} username={incoming_username}")
-
-                print('incoming_username', incoming_username)
-
-                # Check if this username was already assigned a slot
-                if incoming_username in user_assignments[game_id]:
-                    user_id = user_assignments[game_id][incoming_username]
-                else:
-                    # Assign a new slot if available.
-                    if '1' not in game_users:
-                        user_id = '1'
-                    elif '2' not in game_users:
-                        user_id = '2'
-                    else:
-                        ws.send(json.dumps({'type': 'error', 'message': 'Game room is full'}))
-                        return
-                    # Save this assignment so that it persists on reconnects.
-                    user_assignments[game_id][incoming_username] = user_id
-
-                # Register this WebSocket connection.
-                connected_users[game_id][user_id] = ws
-
-                # Send initial board + hands (same fields as before)
-                _send(ws, 'init', game, {
-                    'username': incoming_username,
-                    'user_id': user_id,
-                    'user_assignments': user_assignments[game_id],
-                    'phase': _room(game_id)['phase'],  # 'lobby' on handshake
-                })
-                _broadcast_lobby(game_id)
-
-            elif data['type'] == 'choose_deck':
-                # Client sends an exported deck JSON payload directly:
-                # { type:'choose_deck', deck: {version, name, piles:{MAIN, SIDE, LAND}} }
-                r = _room(game_id)
-                deck_payload = data.get('deck')
-                if not deck_payload:
-                    _send(ws, 'lobby_error', games[game_id], {"message": "Missing deck payload"})
-                    continue
-                r["choices"][user_id] = deck_payload
-                r["ready"][user_id] = False  # reset ready on new choice
-                print('')
-                _broadcast_lobby(game_id)
-
-            elif data['type'] == 'ready':
-                r = _room(game_id)
-                r["ready"][user_id] = True
-                _broadcast_lobby(game_id)
-                _maybe_start_match(game_id, game)
-
-
-            elif data['type'] == 'move':
-                if game._locked():
-                    _send(ws, 'update', game, {'success': False, 'info': 'A sorcery is resolving'})
-                    continue
-                from_pos = data['from']
-                to_pos = data['to']
-                success, info = game.move(from_pos, to_pos, user_id)
-
-                if success:
-                    _broadcast(game_id, 'update', game, {
-                        'success': success,
-                        'info': info,
-                        'from': from_pos,
-                        'to': to_pos,
-                        'user_id': user_id,
-                        'moves_left': game.max_moves_per_turn - game.moves_this_turn,
-                        'usernames': user_assignments[game_id],
-                    })
-                else:
-                    # Only notify the user who tried the move
-                    _send(ws, 'update', game, {
-                        'success': success,
-                        'info': info,
-                        'from': from_pos,
-                        'to': to_pos,
-                        'user_id': user_id,
-                        'moves_left': game.max_moves_per_turn - game.moves_this_turn,
-                        'usernames': user_assignments[game_id],
-                    })
-
-            elif (data['type'] == 'end-turn') or (data['type'] == 'end-turn-with-discard'):
-                if game._locked():
-                    _send(ws, 'update', game, {'success': False, 'info': 'A sorcery is resolving'})
-                    continue
-                if data['type'] == 'end-turn-with-discard':
-                    discarded_card = game.hands[user_id].pop(data['slot'])
-                    game.graveyard[user_id].append(discarded_card)
-
-                if len(game.hands[user_id]) > 5:
-                    # Same as before: actor gets 'discard-to-end-turn', opponent gets 'opponent-discarding'
-                    def builder(uid, game_):
-                        msg_type = 'discard-to-end-turn' if uid == user_id else 'opponent-discarding'
-                        extra = {
-                            'success': True,
-                            'mana': game_.mana,
-                            'info': "Discarding needed to end turn!",
-                            'moves_left': game_.max_moves_per_turn - game_.moves_this_turn,
-                            'usernames': user_assignments[game_id],
-                        }
-                        return msg_type, extra
-                    _broadcast_per_viewer(game_id, builder)
-
-                # elif game.center_tile_control[user_id] >= 7:
-                #     # This player wins (same payload fields as before)
-                #     def builder(uid, game_):
-                #         extra = {
-                #             'success': True,
-                #             'mana': game_.mana,
-                #             'info': f"Player {user_id} has controlled the center for 6 turns!",
-                #             'moves_left': game_.max_moves_per_turn - game_.moves_this_turn,
-                #             'game_over': {
-                #                 'result': 'victory' if uid == user_id else 'defeat'
-                #             },
-                #             'usernames': user_assignments[game_id],
-                #         }
-                #         return 'game-over', extra
-                #     _broadcast_per_viewer(game_id, builder)
-
-                elif user_id == game.current_player:
-                    game.toggle_turn()
-                    _broadcast(game_id, 'update', game, {
-                        'mana': game.mana,
-                        'info': f"Player {user_id} ended their turn.",
-                        'success': True,
-                        'moves_left': game.max_moves_per_turn - game.moves_this_turn,
-                        'usernames': user_assignments[game_id],
-                    })
-
-            elif data['type'] == 'summon':
-                if game._locked():
-                    _send(ws, 'update', game, {'success': False, 'info': 'A sorcery is resolving'})
-                    continue
-                slot = data['slot']
-                to_pos = data['to']
-                success, info = game.summon_card(slot, to_pos, user_id)
-
-                if success:
-                    _broadcast(game_id, 'update', game, {
-                        'success': success,
-                        'info': info,
-                        'to': to_pos,
-                        'mana': game.mana,
-                        'center_tile_control': game.center_tile_control,
-                        'usernames': user_assignments[game_id],
-                    })
-                else:
-                    # Only notify the player who attempted the summon
-                    _send(connected_users[game_id][user_id], 'update', game, {
-                        'success': success,
-                        'info': info,
-                        'to': to_pos,
-                        'mana': game.mana,
-                        'center_tile_control': game.center_tile_control,
-                        'usernames': user_assignments[game_id],
-                    })
-
-            elif data['type'] == 'direct-attack':
-                if game._locked():
-                    _send(ws, 'update', game, {'success': False, 'info': 'A sorcery is resolving'})
-                    continue
-                pos = data['pos']
-                success, info, game_over = game.direct_attack(pos, user_id)
-                x, y = pos
-                card = game.board[x][y]  # same as before
-
-                if game_over:
-                    winner = user_id
-                    def builder(uid, game_):
-                        extra = {
-                            'success': True,
-                            'mana': game_.mana,
-                            'info': info,
-                            'moves_left': game_.max_moves_per_turn - game_.moves_this_turn,
-                            'game_over': {
-                                'result': 'victory' if uid == winner else 'defeat'
-                            },
-                            'usernames': user_assignments[game_id],
-                        }
-                        return 'game-over', extra
-                    _broadcast_per_viewer(game_id, builder)
-                    return
-                else:
-                    _broadcast(game_id, 'update', game, {
-                        'success': success,
-                        'card': card.to_dict() if card else None,
-                        'mana': game.mana,
-                        'info': info,
-                        'moves_left': game.max_moves_per_turn - game.moves_this_turn,
-                        'usernames': user_assignments[game_id],
-                    })
-
-            elif data['type'] == 'activate-sorcery':
-                ts = time.time()  # ← add this
-                print(f"[WS] {ts:.6f} ACT conn_id={ws._id} user={user_id} slot={data.get('slot')} pos={data.get('pos')} ixn={bool(game.interaction)}")
-
-                if not user_id: continue
-                slot = data['slot']
-                pos = data.get('pos')
-                ok, info, is_free = game.game_can_activate_card(slot, user_id, pos)
-                if not ok:
-                    _send(ws, 'update', game, {'success': False, 'info': info})
-                    continue
-
-                ok2, info2 = game.begin_sorcery(slot, user_id, pos, free=is_free)
-                _broadcast(game_id, 'update', game, {
-                    'success': ok2,
-                    'info': info2,
-                    'usernames': user_assignments[game_id],
-                    'moves_left': game.max_moves_per_turn - game.moves_this_turn,
-                })
-
-            elif data['type'] == 'sorcery-step':
-                print(data, 'sorcery step')
-                payload = data.get('payload') or {}
-                status, info = game.sorcery_step_input(user_id, payload)
-                ok = (status != "error")
-                _broadcast(game_id, 'update', game, {
-                    'success': ok,
-                    'info': info,
-                    'usernames': user_assignments[game_id],
-                    'moves_left': game.max_moves_per_turn - game.moves_this_turn,
-                })
-
-
-            elif data['type'] == 'place-land':
-                if game._locked():
-                    _send(ws, 'update', game, {'success': False, 'info': 'A sorcery is resolving'})
-                    continue
-                print(data)
-                if not user_id:
-                    continue  # or raise, or wait — don't access hands/cards yet
-
-                slot = data['slot']
-                pos = data.get('pos')  # optional
-
-                # Regular placement logic
-                success, info, is_free = game.game_can_place_land(slot, user_id, pos)
-                if not success:
-                    # Only notify the user who tried the move
-                    _send(ws, 'update', game, {
-                        'success': success,
-                        'mana': game.mana,
-                        'info': info,
-                        'pos': pos,
-                        'moves_left': game.max_moves_per_turn - game.moves_this_turn,
-                        'usernames': user_assignments[game_id],
-                    })
-                else:
-                    success, info = game.place_land(slot, user_id, pos, reduce_mana=not is_free)
-                    _broadcast(game_id, 'update', game, {
-                        'success': success,
-                        'pos': pos,
-                        'mana': game.mana,
-                        'info': info,
-                        'moves_left': game.max_moves_per_turn - game.moves_this_turn,
-                        'usernames': user_assignments[game_id],
-                    })
-
-            elif data['type'] == 'resolve-land':
-                if game._locked():
-                    _send(ws, 'update', game, {'success': False, 'info': 'A sorcery is resolving'})
-                    continue
-                slot = data['slot']
-                target = data['target']
-                card = game.hands[user_id][slot]
-
-                success, info, is_free = game.game_can_place_land(slot, user_id, target)
-
-                if hasattr(card, "resolve_with_input"):
-                    # Try resolving first — don't remove card or spend mana yet
-                    success, info = card.resolve_with_input(game, user_id, target)
-                    if success:
-                        game.hands[user_id].pop(slot)
-                        game.graveyard[user_id].append(card)
-                        if not is_free:
-                            game.mana[user_id] -= card.mana
-
-                    _broadcast(game_id, 'update', game, {
-                        'success': success,
-                        'mana': game.mana,
-                        'info': info,
-                        'moves_left': game.max_moves_per_turn - game.moves_this_turn,
-                        'usernames': user_assignments[game_id],
-                    })
-
-    except Exception as e:
-        # Full Python traceback (with line numbers)
-        print("\n=== WebSocket exception ===")
-        print("game_id:", game_id, "user_id:", user_id)
-        print("Last received message:", locals().get("data", None))
-        traceback.print_exc()
-        # Optionally send to the client, so you see it in the browser console
-        try:
-            ws.send(json.dumps({
-                "type": "server-error",
-                "error": str(e),
-                "traceback": traceback.format_exc(),
-            }))
-        except Exception:
-            pass
-
+            protocol.receive(ws, message)
     finally:
-        if user_id and user_id in connected_users.get(game_id, {}):
-            del connected_users[game_id][user_id]
+        protocol.close_connection(ws)
+
 
 
 if __name__ == '__main__':
@@ -0,0 +1,380 @@
+# bench.py
+"""
+Engine micro-benchmarks: fixed seeds, fixed positions, one command.
+
+    python -m bench                         # run everything, print a table
+    python -m bench --out bench.json        # save results (keep one as the baseline)
+    python -m bench --baseline bench.json   # compare; exit 1 if anything got slower
+                                            # (confirmed by re-running it, see --confirm)
+    python -m bench -k sorcery/             # only benchmarks whose name contains this
+
+Mid-game positions come from seeded greedy self-play (simulate.py) and are
+kept as ChessGame snapshots. Benchmarks that change the game restore a fresh
+copy before every call, outside the timed region; read-only ones are timed in
+loops. Times are microseconds per call.
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from itertools import count, cycle, islice
+
+import cards  # registers every card class
+import registry
+from bitboard import tiles
+from card_types import Land, Sorcery, evaluate_creation_or_activation_needs
+from game import ChessGame, build_instances_from_rows, validate_deck_payload
+from simulate import greedy_policy, play_turn, role_decks, start_game, step_choices
+
+POSITION_SEEDS = (11, 22, 33)
+POSITION_TURNS = 6
+DECKS = ('blue', 'red')
+
+BENCHES = []  # (name, fn); fn(ctx, calls) -> {result name: timing}
+
+
+def bench(name):
+    def deco(fn):
+        BENCHES.append((name, fn))
+        return fn
+    return deco
+
+
+# --- timing ---------------------------------------------------------------------
+
+def _summary(samples_ns, extra=None):
+    us = sorted(s / 1000 for s in samples_ns)
+    out = {
+        'min_us': round(us[0], 3),        # best round: what comparisons use
+        'median_us': round(statistics.median(us), 3),
+        'rounds': len(us),
+    }
+    if extra:
+        out.update(extra)
+    return out
+
+
+def time_each(cases, calls, rounds=7):
+    """
+    cases: [(snapshot bytes, op(game))]. Each round restores a fresh game per
+    call (untimed), then times op over all of them; -> per-call ns per round.
+    """
+    for snap, op in cases:  # warm caches (hash keys, ray tables) before timing
+        op(ChessGame.from_bytes(snap))
+    per_round = max(len(cases), calls // rounds)
+    samples = []
+    clock = time.perf_counter_ns
+    for _ in range(rounds):
+        batch = [(ChessGame.from_bytes(snap), op) for snap, op in islice(cycle(cases), per_round)]
+        gc.disable()
+        try:
+            t0 = clock()
+            for game, op in batch:
+                op(game)
+            samples.append((clock() - t0) / per_round)
+        finally:
+            gc.enable()
+    return samples
+
+
+def time_loop(op, number, rounds=7):
+    """Per-call ns of op() over `rounds` runs of `number` calls."""
+    op()
+    samples = []
+    clock = time.perf_counter_ns
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            t0 = clock()
+            for _ in range(number):
+                op()
+            samples.append((clock() - t0) / number)
+    finally:
+        gc.enable()
+    return samples
+
+
+# --- fixtures -------------------------------------------------------------------
+
+class Context:
+    def __init__(self):
+        decks = {d['name']: d for d in role_decks()}
+        self.decks = [decks[name] for name in DECKS]
+        self.positions = [self._midgame(seed) for seed in POSITION_SEEDS]
+
+    def _midgame(self, seed):
+        rng = random.Random(seed)
+        game = start_game(self.decks[0], self.decks[1], seed)
+        for _ in range(POSITION_TURNS):
+            if play_turn(game, greedy_policy, rng):
+                break
+        return game.to_bytes()
+
+    def games(self):
+        return [ChessGame.from_bytes(snap) for snap in self.positions]
+
+
+def _with_card(snap, cls, uid=None):
+    """Snapshot of `snap` with a fresh `cls` appended to the hand of uid (default: player to move)."""
+    game = ChessGame.from_bytes(snap)
+    uid = uid or game.current_player
+    card = cls(uid)
+    card.id = str(next(game._card_ids))
+    game.hands[uid].append(card)
+    return game.to_bytes(), len(game.hands[uid]) - 1
+
+
+# --- benchmarks -----------------------------------------------------------------
+
+@bench('move')
+def bench_move(ctx, calls):
+    cases = []
+    for snap, game in zip(ctx.positions, ctx.games()):
+        uid = game.current_player
+        for frm, to in game.legal_moves(uid)[:8]:
+            cases.append((snap, lambda g, f=frm, t=to, u=uid: g.move(f, t, u)))
+    return {'move/midgame': _summary(time_each(cases, calls), {'cases': len(cases)})}
+
+
+@bench('move_lands')
+def bench_move_lands(ctx, calls):
+    """A monster stepping onto / through every land with on_enter, passing or blocking hooks."""
+    mover = registry.lookup('bonecrawler')
+    out = {}
+    for cls in registry.card_classes():
+        if not issubclass(cls, Land):
+            continue
+        hooks = [h for h in ('on_enter', 'affects_monster_passing', 'blocks_movement') if h in vars(cls)]
+        if not hooks:
+            continue
+        cases = []
+        for land_owner in ('1', '2'):
+            game = ChessGame(seed=0)
+            game.board[4][2] = mover('1')
+            game.land_board[3][2] = cls(land_owner)
+            snap = game.to_bytes()
+            cases.append((snap, lambda g: g.move([4, 2], [3, 2], '1')))   # onto the land
+            cases.append((snap, lambda g: g.move([4, 2], [2, 2], '1')))   # across it
+        out[f'move_lands/{cls.card_id}'] = _summary(time_each(cases, calls), {'hooks': hooks})
+    return out
+
+
+@bench('summon')
+def bench_summon(ctx, calls):
+    monster = registry.lookup('bonecrawler')
+    cases = []
+    for snap, game in zip(ctx.positions, ctx.games()):
+        uid = game.current_player
+        snap, slot = _with_card(snap, monster)
+        for pos in game.get_valid_summon_positions(uid):
+            if game.board[pos[0]][pos[1]] is None:
+                cases.append((snap, lambda g, s=slot, p=pos, u=uid: g.summon_card(s, p, u)))
+    return {'summon/midgame': _summary(time_each(cases, calls), {'cases': len(cases)})}
+
+
+@bench('toggle_turn')
+def bench_toggle_turn(ctx, calls):
+    cases = [(snap, lambda g: g.toggle_turn()) for snap in ctx.positions]
+    return {'toggle_turn/midgame': _summary(time_each(cases, calls))}
+
+
+@bench('needs')
+def bench_needs(ctx, calls):
+    jobs = []
+    for game in ctx.games():
+        for pid in ('1', '2'):
+            for card in list(game.hands[pid]) + list(game.land_decks[pid]):
+                if card.type in ('sorcery', 'land'):
+                    jobs.extend((card, game, x, y) for x in range(6) for y in range(6))
+
+    def op():
+        for card, game, x, y in jobs:
+            evaluate_creation_or_activation_needs(card, game, x, y)
+    per_batch = time_loop(op, max(1, calls // 100))
+    games = ctx.games()
+    heat = time_loop(lambda: [g.placement_heatmaps(pid) for g in games for pid in ('1', '2')], max(1, calls // 20))
+    return {
+        'needs/evaluate': _summary([t / len(jobs) for t in per_batch], {'calls_per_sample': len(jobs)}),
+        'needs/heatmaps': _summary([t / (2 * len(games)) for t in heat]),
+    }
+
+
+def _other_side_to_move(snap):
+    game = ChessGame.from_bytes(snap)
+    game.turn_index = (game.turn_index + 1) % len(game.players)
+    return game.to_bytes()
+
+
+def _record_inputs(snap, slot, target):
+    """Resolve once with the first valid input at every prompt; -> (inputs, resolved)."""
+    game = ChessGame.from_bytes(snap)
+    uid = game.current_player
+    game.begin_sorcery(slot, uid, target, free=True)
+    inputs = []
+    while game.interaction:
+        choices = step_choices(game)
+        if not choices:
+            return inputs, False
+        status, _ = game.sorcery_step_input(uid, choices[0])
+        if status == 'error':
+            return inputs, False
+        inputs.append(choices[0])
+    return inputs, True
+
+
+@bench('sorcery')
+def bench_sorcery(ctx, calls):
+    """
+    begin_sorcery through _finalize_sorcery for every sorcery, inputs fixed up
+    front. Sorceries no position resolves (e.g. a tutor with nothing to find)
+    are reported as skipped rather than timing their error path.
+    """
+    # either seat to move: some scripts need the other role's deck
+    bases = ctx.positions + [_other_side_to_move(snap) for snap in ctx.positions]
+    out = {}
+    for cls in registry.card_classes():
+        if not issubclass(cls, Sorcery):
+            continue
+        # first position/target where the fixed inputs resolve the whole script
+        found = None
+        for base in bases:
+            game = ChessGame.from_bytes(base)
+            uid = game.current_player
+            snap, slot = _with_card(base, cls)
+            for x, y in list(tiles(game.bitboards.occupied)) or [(2, 2)]:
+                inputs, resolved = _record_inputs(snap, slot, [x, y])
+                if resolved:
+                    found = (snap, slot, uid, [x, y], inputs)
+                    break
+            if found:
+                break
+        if found is None:
+            out[f'sorcery/{cls.card_id}'] = {'skipped': 'no position and target resolves the script'}
+            continue
+        snap, slot, uid, target, inputs = found
+
+        def op(g, slot=slot, uid=uid, target=target, inputs=inputs):
+            g.begin_sorcery(slot, uid, target, free=True)
+            for payload in inputs:
+                g.sorcery_step_input(uid, payload)
+        out[f'sorcery/{cls.card_id}'] = _summary(
+            time_each([(snap, op)], max(70, calls // 4)),
+            {'steps': len(inputs)})
+    return out
+
+
+@bench('build_instances')
+def bench_build_instances(ctx, calls):
+    rows = ctx.decks[0]['piles']['MAIN']
+    samples = time_loop(lambda: build_instances_from_rows(rows, '1', random.Random(1), count(1)),
+                        max(1, calls // 10))
+    return {'build_instances/main_deck': _summary(samples, {'cards': sum(r['qty'] for r in rows)})}
+
+
+@bench('validate_deck')
+def bench_validate_deck(ctx, calls):
+    decks = ctx.decks
+    samples = time_loop(lambda: [validate_deck_payload(d) for d in decks], max(1, calls // 10))
+    return {'validate_deck/payload': _summary([t / len(decks) for t in samples])}
+
+
+@bench('base_state')
+def bench_base_state(ctx, calls):
+    from protocol import _base_state
+    games = ctx.games()
+    samples = time_loop(lambda: [json.dumps(_base_state(g)) for g in games], max(1, calls // 10))
+    return {'base_state/json': _summary([t / len(games) for t in samples])}
+
+
+# --- runner ---------------------------------------------------------------------
+
+def run(selected=None, calls=400):
+    ctx = Context()
+    results = {}
+    for name, fn in BENCHES:
+        if selected and not any(s in name or s.startswith(name + '/') for s in selected):
+            continue
+        for key, res in fn(ctx, calls).items():
+            if not selected or any(s in key for s in selected):
+                results[key] = res
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'calls': calls,
+            'position_seeds': list(POSITION_SEEDS),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """-> rows of (name, best round, baseline best round, change) and the names that regressed."""
+    rows, regressed = [], []
+    base = baseline.get('results', {})
+    for name, res in current['results'].items():
+        old = base.get(name, {})
+        now, then = res.get('min_us'), old.get('min_us')
+        change = (now / then - 1) if now is not None and then else None
+        if change is not None and change > threshold:
+            regressed.append(name)
+        rows.append((name, now, then, change))
+    return rows, regressed
+
+
+def _table(rows):
+    lines = [f"{'benchmark':<44} {'best us':>11} {'baseline':>11} {'change':>8}"]
+    for name, now, then, change in rows:
+        now_s = f"{now:.2f}" if now is not None else 'skipped'
+        then_s = f"{then:.2f}" if then else '-'
+        change_s = f"{change:+.1%}" if change is not None else ''
+        lines.append(f"{name:<44} {now_s:>11} {then_s:>11} {change_s:>8}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    p.add_argument('-k', dest='select', action='append', default=[], help='only benchmarks containing this (repeatable)')
+    p.add_argument('--calls', type=int, default=400, help='timed calls per benchmark')
+    p.add_argument('--out', help='write results as JSON')
+    p.add_argument('--baseline', help='results JSON to compare against')
+    p.add_argument('--threshold', type=float, default=0.15, help='allowed slowdown before failing (default 15%%)')
+    p.add_argument('--confirm', type=int, default=2,
+                   help='re-runs of a benchmark over the threshold before it counts as slower (default 2)')
+    args = p.parse_args(argv)
+
+    current = run(args.select, args.calls)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    rows, regressed = compare(current, baseline, args.threshold)
+    for _ in range(args.confirm):
+        if not regressed:
+            break
+        # one run is noise on a loaded or single-CPU host: re-time only the
+        # suspects and keep each one's best round
+        again = run(regressed, args.calls)['results']
+        for name in regressed:
+            res = again.get(name)
+            if res and res.get('min_us') is not None and res['min_us'] < current['results'][name]['min_us']:
+                current['results'][name] = res
+        rows, regressed = compare(current, baseline, args.threshold)
+    print(_table(rows))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(current, f, indent=2)
+            f.write('\n')
+    if regressed:
+        print(f"\n{len(regressed)} regression(s) over {args.threshold:.0%}: {', '.join(regressed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
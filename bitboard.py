@@ -0,0 +1,201 @@
+# bitboard.py
+"""
+Integer bitboards kept alongside the object grids in ChessGame.
+
+Tile (x, y) is bit x * STRIDE + y on both the 6x6 monster board and the 7x7
+land board, so masks from either board can be combined directly.
+ChessGame builds its grids with tracked_grid(), whose rows report every
+`grid[x][y] = ...` write back to BitBoards (and the position hash); card
+code keeps writing to the grids as before and the masks follow.
+"""
+from typing import Dict, Iterator, Tuple
+
+from card_types import Land
+
+STRIDE = 8
+
+
+def bit(x: int, y: int) -> int:
+    return 1 << (x * STRIDE + y)
+
+
+def mask_of(positions) -> int:
+    m = 0
+    for x, y in positions:
+        m |= 1 << (x * STRIDE + y)
+    return m
+
+
+def tiles(mask: int) -> Iterator[Tuple[int, int]]:
+    """Yield (x, y) for every set bit, in row-major order."""
+    while mask:
+        low = mask & -mask
+        yield divmod(low.bit_length() - 1, STRIDE)
+        mask ^= low
+
+
+def _other(pid):
+    return '2' if pid == '1' else '1'
+
+
+class _Row(list):
+    __slots__ = ('_on_set', '_x')
+
+    def __setitem__(self, y, value):
+        if isinstance(y, slice):
+            list.__setitem__(self, y, value)
+            for i, v in enumerate(self):
+                self._on_set(self._x, i, v)
+            return
+        if y < 0:
+            y += len(self)
+        list.__setitem__(self, y, value)
+        self._on_set(self._x, y, value)
+
+
+def tracked_grid(size, on_set):
+    """size x size grid of None whose rows call on_set(x, y, value) on every write."""
+    grid = []
+    for x in range(size):
+        row = _Row([None] * size)
+        row._on_set = on_set
+        row._x = x
+        grid.append(row)
+    return grid
+
+
+def _drop(masks, b):
+    # clear bit b from the one keyed mask that holds it; empty masks go away
+    for k, m in masks.items():
+        if m & b:
+            m &= ~b
+            if m:
+                masks[k] = m
+            else:
+                del masks[k]
+            return
+
+
+class BitBoards:
+    def __init__(self):
+        self.occupancy: Dict[str, int] = {'1': 0, '2': 0}   # monsters per owner
+        self.monster_role: Dict[str, int] = {}              # monsters per role
+        self.lands = 0                                      # any land
+        self.land_owner: Dict[str, int] = {'1': 0, '2': 0}
+        self.land_role: Dict[str, int] = {}
+        # tiles holding an enemy land whose blocks_movement hook may stop this
+        # player's monsters (the hook still decides for the specific monster)
+        self.blockers: Dict[str, int] = {'1': 0, '2': 0}
+        self.turn_start = 0                                 # lands with an on_turn_start hook
+
+    @property
+    def occupied(self) -> int:
+        return self.occupancy['1'] | self.occupancy['2']
+
+    def empty(self, x, y) -> bool:
+        return not (self.occupied >> (x * STRIDE + y)) & 1
+
+    def monster_mask(self, owner=None, role=None) -> int:
+        m = self.occupied if owner is None else self.occupancy.get(owner, 0)
+        if role is not None:
+            m &= self.monster_role.get(role, 0)
+        return m
+
+    def land_mask(self, owner=None, role=None) -> int:
+        m = self.lands if owner is None else self.land_owner.get(owner, 0)
+        if role is not None:
+            m &= self.land_role.get(role, 0)
+        return m
+
+    @property
+    def turn_start_tiles(self) -> int:
+        """Monsters standing on a land whose on_turn_start hook fires at every turn change."""
+        return self.turn_start & self.occupied
+
+    def clear_monsters(self):
+        self.occupancy = {'1': 0, '2': 0}
+        self.monster_role = {}
+
+    def clear_lands(self):
+        self.lands = 0
+        self.land_owner = {'1': 0, '2': 0}
+        self.land_role = {}
+        self.blockers = {'1': 0, '2': 0}
+        self.turn_start = 0
+
+    def set_monster(self, x, y, card):
+        b = 1 << (x * STRIDE + y)
+        occ = self.occupancy
+        occ['1'] &= ~b
+        occ['2'] &= ~b
+        _drop(self.monster_role, b)
+        if card is None:
+            return
+        if card.owner in occ:
+            occ[card.owner] |= b
+        role = getattr(card, 'role', None)
+        self.monster_role[role] = self.monster_role.get(role, 0) | b
+
+    def set_land(self, x, y, land):
+        b = 1 << (x * STRIDE + y)
+        self.lands &= ~b
+        self.turn_start &= ~b
+        for pid in ('1', '2'):
+            self.land_owner[pid] &= ~b
+            self.blockers[pid] &= ~b
+        _drop(self.land_role, b)
+        if land is None:
+            return
+        self.lands |= b
+        role = getattr(land, 'role', None)
+        self.land_role[role] = self.land_role.get(role, 0) | b
+        if type(land).on_turn_start is not Land.on_turn_start:
+            self.turn_start |= b
+        if land.owner in self.land_owner:
+            self.land_owner[land.owner] |= b
+            if type(land).blocks_movement is not Land.blocks_movement:
+                self.blockers[_other(land.owner)] |= b
+
+    def sync(self, board, land_board):
+        """Recompute every mask from the grids (after changes the rows can't see, e.g. card.owner)."""
+        occupancy = {'1': 0, '2': 0}
+        monster_role = {}
+        for x, row in enumerate(board):
+            for y, card in enumerate(row):
+                if card is not None:
+                    b = 1 << (x * STRIDE + y)
+                    if card.owner in occupancy:
+                        occupancy[card.owner] |= b
+                    role = getattr(card, 'role', None)
+                    monster_role[role] = monster_role.get(role, 0) | b
+        self.occupancy, self.monster_role = occupancy, monster_role
+
+        lands = turn_start = 0
+        land_owner = {'1': 0, '2': 0}
+        blockers = {'1': 0, '2': 0}
+        land_role = {}
+        for x, row in enumerate(land_board):
+            for y, land in enumerate(row):
+                if land is not None:
+                    b = 1 << (x * STRIDE + y)
+                    lands |= b
+                    role = getattr(land, 'role', None)
+                    land_role[role] = land_role.get(role, 0) | b
+                    cls = type(land)
+                    if cls.on_turn_start is not Land.on_turn_start:
+                        turn_start |= b
+                    if land.owner in land_owner:
+                        land_owner[land.owner] |= b
+                        if cls.blocks_movement is not Land.blocks_movement:
+                            blockers[_other(land.owner)] |= b
+        self.lands, self.land_owner, self.land_role = lands, land_owner, land_role
+        self.blockers, self.turn_start = blockers, turn_start
+
+    def snapshot(self):
+        return (dict(self.occupancy), dict(self.monster_role), self.lands, dict(self.land_owner),
+                dict(self.land_role), dict(self.blockers), self.turn_start)
+
+    def restore(self, snap):
+        occupancy, monster_role, self.lands, land_owner, land_role, blockers, self.turn_start = snap
+        self.occupancy, self.monster_role = dict(occupancy), dict(monster_role)
+        self.land_owner, self.land_role, self.blockers = dict(land_owner), dict(land_role), dict(blockers)
@@ -0,0 +1,265 @@
+# bot.py
+"""
+Server-side bot player: time-bounded Monte Carlo tree search.
+
+The bot makes one decision at a time: a summon, a move, a direct attack, a
+land placement, a sorcery, an input for a pending sorcery prompt (StepSpec),
+or ending the turn. Each decision is searched for the difficulty's time
+budget in a worker process (the position travels as a ChessGame snapshot),
+then played through the same engine methods the socket handler calls:
+
+    future = bot.think(game, seat, 'normal')     # doesn't block the caller
+    ok, info, game_over = bot.play(game, seat, future.result()['action'])
+
+The tree covers the rest of the bot's own turn, where everything is known.
+After it ends, a rollout re-deals the opponent's hidden hand and both decks
+at random, lets the greedy self-play policy (simulate.py) play out a couple
+of turns, and scores the position for the bot in [0, 1].
+"""
+import math
+import multiprocessing
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cards  # registers every card class
+import gamelog
+from drawpile import DrawPile
+from game import ChessGame
+from simulate import MAX_HAND, greedy_policy, legal_actions, play_turn, role_decks, step_choices
+
+log = gamelog.channel('bot')
+
+# seconds of search per decision
+DIFFICULTY = {'easy': 0.2, 'normal': 1.0, 'hard': 3.0}
+
+ROLLOUT_TURNS = 2     # turns played out after the bot's own turn ends
+EXPLORATION = 0.7     # UCT constant (rewards are in [0, 1])
+EVAL_SCALE = 12.0     # mana-equivalent swing worth ~0.73 in evaluate()
+THREAT_WEIGHT = 0.5   # a monster on the enemy back row is half its mana again
+
+
+def _opponent(uid):
+    return '2' if uid == '1' else '1'
+
+
+# --- playing actions --------------------------------------------------------------
+
+def to_move(game, uid):
+    """True if `uid` has the next decision (its turn, or its sorcery prompt)."""
+    if game.interaction is not None:
+        return game.interaction.owner == uid
+    return game.current_player == uid
+
+
+def decisions(game, uid):
+    """Every decision `uid` can make now; [] when a sorcery prompt can't be answered."""
+    if game.interaction is not None:
+        return [('step', payload) for payload in step_choices(game)]
+    return legal_actions(game, uid)
+
+
+def end_turn(game, uid):
+    """Discard the cheapest cards down to the hand limit, then pass the turn."""
+    hand = game.hands[uid]
+    while len(hand) > MAX_HAND:
+        game.discard(min(range(len(hand)), key=lambda i: hand[i].mana), uid)
+    game.toggle_turn()
+
+
+def play(game, uid, action):
+    """Play one decision through the engine; -> (ok, info, game_over)."""
+    kind = action[0]
+    if kind == 'direct_attack':
+        return game.direct_attack(action[1], uid)
+    if kind == 'move':
+        ok, info = game.move(action[1], action[2], uid)
+    elif kind == 'summon':
+        ok, info = game.summon_card(action[1], action[2], uid)
+    elif kind == 'land':
+        ok, info = game.place_land(action[1], uid, action[2], reduce_mana=not action[3])
+    elif kind == 'sorcery':
+        ok, info = game.begin_sorcery(action[1], uid, action[2], free=action[3])
+    elif kind == 'step':
+        status, info = game.sorcery_step_input(uid, action[1])
+        ok = status != 'error'
+    elif kind == 'end':
+        end_turn(game, uid)
+        ok, info = True, f"Player {uid} ended their turn."
+    else:
+        raise ValueError(f"Unknown bot action {kind!r}")
+    return ok, info, False
+
+
+# --- evaluation -------------------------------------------------------------------
+
+def evaluate(game, uid):
+    """Position score for `uid` in (0, 1): mana lead plus board material and threats."""
+    opp = _opponent(uid)
+    score = game.mana[uid] - game.mana[opp]
+    for x, row in enumerate(game.board):
+        for card in row:
+            if card is None or card.type != 'monster':
+                continue
+            value = card.mana
+            if x == (0 if card.owner == '1' else 5):
+                value += THREAT_WEIGHT * card.mana  # can attack directly next turn
+            score += value if card.owner == uid else -value
+    return 1.0 / (1.0 + math.exp(-score / EVAL_SCALE))
+
+
+def _determinize(game, uid, rng):
+    """Re-deal what `uid` can't see: the opponent's hand and both draw orders."""
+    opp = _opponent(uid)
+    hand = game.hands[opp]
+    unseen = list(hand) + list(game.decks[opp])
+    rng.shuffle(unseen)
+    n = len(hand)
+    hand[:] = unseen[:n]
+    game.decks[opp] = DrawPile(unseen[n:])
+    own = list(game.decks[uid])
+    rng.shuffle(own)
+    game.decks[uid] = DrawPile(own)
+
+
+def _rollout(game, uid, rng):
+    while game.interaction is not None:
+        choices = step_choices(game)
+        if not choices:
+            return 0.0
+        status, _ = game.sorcery_step_input(game.interaction.owner, rng.choice(choices))
+        if status == 'error':
+            return 0.0
+    _determinize(game, uid, rng)
+    if game.current_player == uid and play_turn(game, greedy_policy, rng):
+        return 1.0
+    for _ in range(ROLLOUT_TURNS):
+        mover = game.current_player
+        if play_turn(game, greedy_policy, rng):
+            return 1.0 if mover == uid else 0.0
+    return evaluate(game, uid)
+
+
+# --- search -----------------------------------------------------------------------
+
+class Node:
+    __slots__ = ('action', 'children', 'untried', 'visits', 'total', 'result', 'closed')
+
+    def __init__(self, action=None):
+        self.action = action
+        self.children = []
+        self.untried = None    # decisions not expanded yet; None until first visit
+        self.visits = 0
+        self.total = 0.0
+        self.result = None     # fixed reward: 1.0 won, 0.0 stuck sorcery
+        self.closed = False    # no decisions below (turn ended, game over, stuck)
+
+    def best_child(self):
+        log_n = math.log(self.visits)
+        return max(self.children, key=lambda c: c.total / c.visits
+                   + EXPLORATION * math.sqrt(log_n / c.visits))
+
+
+def _restore(snap):
+    game = ChessGame.from_bytes(snap)
+    game.start_journal()  # rollouts roll back sorceries that get stuck
+    return game
+
+
+def _iterate(root, snap, uid, rng):
+    game = _restore(snap)
+    node = root
+    path = [root]
+    while not node.closed and node.untried == [] and node.children:
+        node = node.best_child()
+        play(game, uid, node.action)  # the engine is deterministic within the turn
+        path.append(node)
+
+    if not node.closed:
+        if node.untried is None:
+            node.untried = decisions(game, uid)
+            rng.shuffle(node.untried)
+        while node.untried:
+            action = node.untried.pop()
+            ok, _, over = play(game, uid, action)
+            if not ok:
+                game = _restore(snap)  # rejected: replay the path and try the next one
+                for n in path[1:]:
+                    play(game, uid, n.action)
+                continue
+            child = Node(action)
+            node.children.append(child)
+            node = child
+            path.append(child)
+            if over:
+                child.closed, child.result = True, 1.0
+            elif action[0] == 'end':
+                child.closed = True
+            elif game.interaction is not None and not step_choices(game):
+                child.closed, child.result = True, 0.0
+            break
+        else:
+            if not node.children:
+                node.closed, node.result = True, 0.0
+
+    reward = node.result if node.result is not None else _rollout(game, uid, rng)
+    for n in path:
+        n.visits += 1
+        n.total += reward
+
+
+def search(snap, uid, budget, seed=None):
+    """
+    Search the position in `snap` for `uid` for about `budget` seconds.
+    -> {'action', 'iterations', 'visits', 'value'}. Runs in a worker process.
+    """
+    rng = random.Random(seed)
+    deadline = time.monotonic() + budget
+    root = Node()
+    root.untried = decisions(ChessGame.from_bytes(snap), uid)
+    if len(root.untried) == 1:  # forced, nothing to think about
+        return {'action': root.untried[0], 'iterations': 0, 'visits': 0, 'value': None}
+    rng.shuffle(root.untried)
+
+    iterations = 0
+    while time.monotonic() < deadline and not root.closed:
+        _iterate(root, snap, uid, rng)
+        iterations += 1
+    if not root.children:
+        return {'action': ('end',), 'iterations': iterations, 'visits': 0, 'value': None}
+    best = max(root.children, key=lambda c: (c.visits, c.total))
+    return {
+        'action': best.action,
+        'iterations': iterations,
+        'visits': best.visits,
+        'value': round(best.total / best.visits, 4),
+    }
+
+
+# --- worker pool ------------------------------------------------------------------
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # the socket server is multithreaded; start workers fresh instead of forking it
+                workers = int(os.environ.get('BOT_WORKERS', 0)) or None
+                _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def think(game, uid, difficulty='normal', seed=None):
+    """Start searching `uid`'s next decision; -> Future of search()'s result."""
+    return _executor().submit(search, game.to_bytes(), uid, DIFFICULTY[difficulty], seed)
+
+
+def default_deck(rng=random):
+    """A deck for a bot seat when none is given: one of the per-role decks."""
+    return rng.choice(role_decks())
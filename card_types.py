@@ -1,18 +1,34 @@
-import uuid
+from itertools import count
 
 from interactions import StepSpec
+import gamelog
 
+log = gamelog.channel('cards')
 
-class Card:
+_INSTANCE_IDS = count(1)  # per-process instance ids: '1', '2', ...
+
+
+class _CardMeta(type):
+    """Give every card class empty __slots__ unless it declares its own, so instances carry no __dict__."""
+    def __new__(mcls, name, bases, ns):
+        ns.setdefault('__slots__', ())
+        return super().__new__(mcls, name, bases, ns)
+
+
+class Card(metaclass=_CardMeta):
+    __slots__ = ('id', 'owner')
+
+    # static per-class data; subclasses override
     name = "Default Card"
     role = 'default role'
-    def __init__(self, card_type, card_id, owner, image='', mana=0):
-        self.id = str(uuid.uuid4())      # unique instance ID
-        self.card_id = card_id           # shared ID for this card type
-        self.type = card_type            # 'monster', 'land', or 'sorcery'
-        self.owner = owner               # user who owns it
-        self.image = image
-        self.mana = mana
+    card_id = None   # shared ID for this card type
+    type = None      # 'monster', 'land', or 'sorcery'
+    image = ''
+    mana = 0
+
+    def __init__(self, owner):
+        self.id = str(next(_INSTANCE_IDS))  # unique instance ID (within the process, so within a game)
+        self.owner = owner                  # user who owns it
 
     def to_dict(self):
         return {
@@ -27,14 +43,16 @@ class Card:
         }
 
 class Monster(Card):
+    __slots__ = ('attack', 'defense')
+    type = 'monster'
     movement = {}
     original_attack = 0
     original_defense = 0
 
-    def __init__(self, card_id, owner, attack, defense, image='', mana=0):
-        super().__init__('monster', card_id, owner, image, mana)
-        self.attack = attack
-        self.defense = defense
+    def __init__(self, owner):
+        super().__init__(owner)
+        self.attack = self.original_attack
+        self.defense = self.original_defense
 
     def to_dict(self):
         base = super().to_dict()
@@ -100,11 +118,9 @@ class Monster(Card):
 
 
 class Sorcery(Card):
+    type = 'sorcery'
     activation_needs = [] # default: no constraints
     text = ''
-    def __init__(self, card_id, owner, image='', mana=0):
-        super().__init__('sorcery', card_id, owner, image, mana)
-
 
 
     def affect_board(self, game, pos, user_id):
@@ -127,11 +143,9 @@ class Sorcery(Card):
 
 
 class Land(Card):
+    type = 'land'
     creation_needs = [] # default: no constraints
     text = ''
-    def __init__(self, card_id, owner, image='', mana=0):
-        super().__init__('land', card_id, owner, image, mana)
-
 
     def affect_board(self, game, user_id):
         """
@@ -156,7 +170,6 @@ class Land(Card):
         return base
 
 def satisfies_need(game, x, y, direction, owner, required_role=None):
-    print(required_role, 'req role')
     dx, dy = get_direction_offset(direction, owner)
     tx, ty = x + dx, y + dy
 
@@ -182,7 +195,6 @@ def satisfies_need(game, x, y, direction, owner, required_role=None):
                 continue
             nx, ny = offset
             if [tx + nx, ty + ny] == [x, y]:
-                print(target_card.role)
                 if required_role and getattr(target_card, "role", None) == required_role:
 
                     return 2
@@ -216,7 +228,7 @@ def evaluate_creation_or_activation_needs(card, game, x, y):
 
 
     results = [satisfies_need(game, x, y, direction, card.owner, required_role=getattr(card, "role", None)) for direction in needs]
-    print(results, "results")
+    log.debug("needs", card=card.card_id, pos=(x, y), results=results)
     if all(r == 2 for r in results):
         return 2  # All match and same role → free
     elif all(r >= 1 for r in results):
@@ -226,12 +238,12 @@ def evaluate_creation_or_activation_needs(card, game, x, y):
 
 
 
-def get_direction_offset(direction, owner=None):
+def _direction_offsets(owner):
     forward = -1 if owner == '1' else 1
     left = -1 if owner == '1' else 1
     right = 1 if owner == '1' else -1
 
-    mapping = {
+    return {
         "forward": (forward, 0),
         "back": (-forward, 0),
         "left": (0, left),
@@ -241,5 +253,85 @@ def get_direction_offset(direction, owner=None):
         "back-left": (-forward, left),
         "back-right": (-forward, right),
     }
-    return mapping.get(direction, (0, 0))
 
+
+# owner -> direction -> (dx, dy); player 1 faces up the board, everyone else down
+DIRECTION_OFFSETS = {'1': _direction_offsets('1'), '2': _direction_offsets('2')}
+
+
+def get_direction_offset(direction, owner=None):
+    return DIRECTION_OFFSETS['1' if owner == '1' else '2'].get(direction, (0, 0))
+
+
+# --- whole-board needs -----------------------------------------------------------
+
+_MISSING = object()
+
+
+class NeedMap:
+    """
+    Needs results for every tile at once. One pass over both boards records
+    which tiles each of `owner`'s monsters and lands satisfy a need for, so
+    status() is a few dict lookups instead of a satisfies_need() call per
+    direction. Results match evaluate_creation_or_activation_needs for cards
+    owned by `owner`.
+    """
+    __slots__ = ('owner', 'rows', 'cols', 'support', 'enemies')
+
+    def __init__(self, game, owner):
+        self.owner = owner
+        self.rows, self.cols = len(game.board), len(game.board[0])
+        offsets = DIRECTION_OFFSETS['1' if owner == '1' else '2']
+        # (need offset, x, y) -> role of the card that satisfies it
+        support = {}
+        # satisfies_need only looks at lands under the monster board
+        for tx, row in enumerate(game.land_board[:self.rows]):
+            for ty, land in enumerate(row[:self.cols]):
+                if isinstance(land, Land) and land.owner == owner:
+                    for d in land.creation_needs:
+                        dx, dy = offsets.get(d, (0, 0))
+                        support[((-dx, -dy), tx + dx, ty + dy)] = getattr(land, "role", None)
+        # an own monster pointing back wins over the land under it; an enemy one blocks its tile
+        enemies = set()
+        for tx, row in enumerate(game.board):
+            for ty, card in enumerate(row):
+                if not isinstance(card, Monster):
+                    continue
+                if card.owner != owner:
+                    enemies.add((tx, ty))
+                    continue
+                for d, range_val in card.movement.items():
+                    if range_val not in (1, 2, 'any'):
+                        continue
+                    dx, dy = offsets.get(d, (0, 0))
+                    support[((-dx, -dy), tx + dx, ty + dy)] = getattr(card, "role", None)
+        self.support = support
+        self.enemies = enemies
+
+    def status(self, card, x, y):
+        """0 blocked, 1 paid, 2 free: the card's needs at (x, y)."""
+        needs = getattr(card, "activation_needs", None) if card.type == "sorcery" else getattr(card, "creation_needs", None)
+        if not needs:
+            return 2
+        offsets = DIRECTION_OFFSETS['1' if card.owner == '1' else '2']
+        role = getattr(card, "role", None)
+        best = 2
+        for d in needs:
+            off = offsets.get(d, (0, 0))
+            tx, ty = x + off[0], y + off[1]
+            if not (0 <= tx < self.rows and 0 <= ty < self.cols) or (tx, ty) in self.enemies:
+                return 0
+            provider = self.support.get((off, x, y), _MISSING)
+            if provider is _MISSING:
+                return 0
+            if not (role and provider == role):
+                best = 1
+        return best
+
+    def grid(self, card, size=None):
+        """
+        size x size grid of status() (default: the monster board). Land-board
+        tiles past the monster board can still be satisfied by a neighbour on it.
+        """
+        size = size or self.rows
+        return [[self.status(card, x, y) for y in range(size)] for x in range(size)]
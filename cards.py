@@ -1,9 +1,14 @@
 from card_types import Monster, Sorcery, Land
 from game import StepSpec
-import time
+import gamelog
+
+log = gamelog.channel('cards')
 
 class Bonecrawler(Monster):  # Formerly: Pawn
     name = "Bonecrawler"
+    card_id = 'bonecrawler'
+    image = '/static/cards/bonecrawler.png'
+    mana = 2
     movement = {
         "forward": 2,
         'left': 2,
@@ -14,19 +19,12 @@ class Bonecrawler(Monster):  # Formerly: Pawn
     original_attack = 100
     original_defense = 200
 
-    def __init__(self, owner):
-        super().__init__(
-            card_id='bonecrawler',
-            owner=owner,
-            attack=self.original_attack,
-            defense=self.original_defense,
-            image='/static/cards/bonecrawler.png',
-            mana=2
-        )
-
 #
 class ShadowVine(Monster):  # Formerly: DiagonalRanger
     name = "Shadow Vine"
+    card_id = 'shadow_vine'
+    image = '/static/cards/shadow_vine.png'
+    mana = 3
     movement = {
         "forward": 2,
         "forward-left": 2,
@@ -37,19 +35,12 @@ class ShadowVine(Monster):  # Formerly: DiagonalRanger
     original_attack = 200
     original_defense = 200
 
-    def __init__(self, owner):
-        super().__init__(
-            card_id='shadow_vine',
-            owner=owner,
-            attack=self.original_attack,
-            defense=self.original_defense,
-            image='/static/cards/shadow_vine.png',
-            mana=3
-        )
-
 
 class DreadmawQueen(Monster):  # Formerly: Queen
     name = "Dreadmaw Queen"
+    card_id = 'dreadmaw_queen'
+    image = '/static/cards/dreadmaw_queen.png'
+    mana = 4
     movement = {
         "forward": 2,
         "forward-left": 2,
@@ -64,18 +55,11 @@ class DreadmawQueen(Monster):  # Formerly: Queen
     original_attack = 170
     original_defense = 130
 
-    def __init__(self, owner):
-        super().__init__(
-            card_id='dreadmaw_queen',
-            owner=owner,
-            attack=self.original_attack,
-            defense=self.original_defense,
-            image='/static/cards/dreadmaw_queen.png',
-            mana=4
-        )
-
 class FrostRevenant(Monster):
     name = "Frost Revenant"
+    card_id = 'frost_revenant'
+    image = '/static/cards/frost_revenant.png'
+    mana = 3
     movement = {
         "forward": 2,
         "back-left": 1,
@@ -84,19 +68,13 @@ class FrostRevenant(Monster):
     original_attack = 170
     original_defense = 190
     role = "white"
-    def __init__(self, owner):
-        super().__init__(
-            card_id='frost_revenant',
-            owner=owner,
-            attack=self.original_attack,
-            defense=self.original_defense,
-            image='/static/cards/frost_revenant.png',
-            mana=3
-        )
 
 
 class SolarPaladin(Monster):
     name = "Solar Paladin"
+    card_id = 'solar_paladin'
+    image = '/static/cards/solar_paladin.png'
+    mana = 4
     movement = {
         "forward": 1,
         "back": 1,
@@ -107,18 +85,12 @@ class SolarPaladin(Monster):
     original_attack = 230
     original_defense = 130
     role = "red"
-    def __init__(self, owner):
-        super().__init__(
-            card_id='solar_paladin',
-            owner=owner,
-            attack=self.original_attack,
-            defense=self.original_defense,
-            image='/static/cards/solar_paladin.png',
-            mana=4
-        )
 
 class SylvanArcher(Monster):
     name = "Sylvan Archer"
+    card_id = 'sylvan_archer'
+    image = '/static/cards/sylvan_archer.png'
+    mana = 2
     movement = {
         "forward-left": 1,
         "forward-right": 1,
@@ -129,20 +101,13 @@ class SylvanArcher(Monster):
     original_attack = 130
     original_defense = 200
 
-    def __init__(self, owner):
-        super().__init__(
-            card_id='sylvan_archer',
-            owner=owner,
-            attack=self.original_attack,
-            defense=self.original_defense,
-            image='/static/cards/sylvan_archer.png',
-            mana=2
-        )
-
 
 
 class Magistra(Monster):
     name = "Magistra"
+    card_id = 'magistra'
+    image = '/static/cards/magistra.png'
+    mana = 3
     movement = {
         "forward": 1,
         "left": 2,
@@ -154,20 +119,13 @@ class Magistra(Monster):
     original_attack = 170
     original_defense = 190
 
-    def __init__(self, owner):
-        super().__init__(
-            card_id='magistra',
-            owner=owner,
-            attack=self.original_attack,
-            defense=self.original_defense,
-            image='/static/cards/magistra.png',
-            mana=3
-        )
-
 
 
 class LordOfTheAbyss(Monster):
     name = "Lord of the Abyss"
+    card_id = 'lord_of_the_abyss'
+    image = '/static/cards/lord_of_the_abyss.png'
+    mana = 4
     movement = {
         "forward": 1,
         "left": 1,
@@ -179,19 +137,12 @@ class LordOfTheAbyss(Monster):
     original_attack = 220
     original_defense = 200
 
-    def __init__(self, owner):
-        super().__init__(
-            card_id='lord_of_the_abyss',
-            owner=owner,
-            attack=self.original_attack,
-            defense=self.original_defense,
-            image='/static/cards/lord_of_the_abyss.png',
-            mana=4
-        )
-
 
 class Stormcaller(Monster):
     name = "Stormcaller"
+    card_id = 'stormcaller'
+    image = '/static/cards/stormcaller.png'
+    mana = 3
     movement = {
         "forward-right": 2,
         "back-left": 1,
@@ -201,20 +152,13 @@ class Stormcaller(Monster):
     original_attack = 170
     original_defense = 190
 
-    def __init__(self, owner):
-        super().__init__(
-            card_id='stormcaller',
-            owner=owner,
-            attack=self.original_attack,
-            defense=self.original_defense,
-            image='/static/cards/stormcaller.png',
-            mana=3
-        )
-
 
 
 class WingsOfTheShatteredSkies(Monster):
     name = "Wings of the Shattered Skies"
+    card_id = 'wings_of_the_shattered_skies'
+    image = '/static/cards/wings_of_the_shattered_skies.png'
+    mana = 2
     movement = {
         'forward': 2,
         "forward-right": 1,
@@ -226,19 +170,12 @@ class WingsOfTheShatteredSkies(Monster):
     original_attack = 150
     original_defense = 170
 
-    def __init__(self, owner):
-        super().__init__(
-            card_id='wings_of_the_shattered_skies',
-            owner=owner,
-            attack=self.original_attack,
-            defense=self.original_defense,
-            image='/static/cards/wings_of_the_shattered_skies.png',
-            mana=2
-        )
-
 
 class AbyssalLeviathan(Monster):
     name = "Abyssal Leviathan"
+    card_id = 'abyssal_leviathan'
+    image = '/static/cards/abyssal_leviathan.png'
+    mana = 5
     movement = {
         "forward": 2,
         "back": 1,
@@ -249,19 +186,12 @@ class AbyssalLeviathan(Monster):
     original_attack = 250
     original_defense = 150
 
-    def __init__(self, owner):
-        super().__init__(
-            card_id='abyssal_leviathan',
-            owner=owner,
-            attack=self.original_attack,
-            defense=self.original_defense,
-            image='/static/cards/abyssal_leviathan.png',
-            mana=5
-        )
-
 
 class BloodthornReaper(Monster):
     name = "Bloodthorn Reaper"
+    card_id = 'bloodthorn_reaper'
+    image = '/static/cards/bloodthorn_reaper.png'
+    mana = 3
     movement = {
         "forward-left": 2,
         "forward-right": 2,
@@ -271,18 +201,11 @@ class BloodthornReaper(Monster):
     original_attack = 190
     original_defense = 140
 
-    def __init__(self, owner):
-        super().__init__(
-            card_id='bloodthorn_reaper',
-            owner=owner,
-            attack=self.original_attack,
-            defense=self.original_defense,
-            image='/static/cards/bloodthorn_reaper.png',
-            mana=3
-        )
-
 class CelestialTitan(Monster):
     name = "Celestial Titan"
+    card_id = 'celestial_titan'
+    image = '/static/cards/celestial_titan.png'
+    mana = 5
     movement = {
         "forward": 2,
         "left": 1,
@@ -292,15 +215,6 @@ class CelestialTitan(Monster):
     original_attack = 200
     original_defense = 250
     role = "red"
-    def __init__(self, owner):
-        super().__init__(
-            card_id='celestial_titan',
-            owner=owner,
-            attack=self.original_attack,
-            defense=self.original_defense,
-            image='/static/cards/celestial_titan.png',
-            mana=5
-        )
 
 
 
@@ -309,11 +223,12 @@ class CelestialTitan(Monster):
 
 class VolcanicRift(Land):
     name = "Volcanic Rift"
+    card_id = 'volcanic_rift'
+    image = '/static/cards/volcanic_rift.png'
+    mana = 1
     text = "Burns an opponent's monster for 50 DEF when it steps on this tile."
     creation_needs = ["forward"]
     role = "red"
-    def __init__(self, owner):
-        super().__init__('volcanic_rift', owner, image='/static/cards/volcanic_rift.png', mana=1)
 
     def on_enter(self, game, pos, monster):
         if monster.owner != self.owner:
@@ -326,11 +241,12 @@ class VolcanicRift(Land):
 
 class SacredGrove(Land):
     name = "Sacred Grove"
+    card_id = 'sacred_grove'
+    image = '/static/cards/sacred_grove.png'
+    mana = 1
     text = "Heals your monster for 30 DEF every turn it's on this tile."
     creation_needs = ['left']
     role = "blue"
-    def __init__(self, owner):
-        super().__init__('sacred_grove', owner, image='/static/cards/sacred_grove.png', mana=1)
 
     def on_turn_start(self, game, pos, monster):
         if monster.owner == self.owner:
@@ -339,11 +255,12 @@ class SacredGrove(Land):
 
 class FrozenBarrier(Land):
     name = "Frozen Barrier"
+    card_id = 'frozen_barrier'
+    image = '/static/cards/frozen_barrier.png'
+    mana = 1
     text = "Opponent's monsters cannot move across this tile."
     creation_needs = ["right", 'forward']
     role = "white"
-    def __init__(self, owner):
-        super().__init__('frozen_barrier', owner, image='/static/cards/frozen_barrier.png', mana=1)
 
     def blocks_movement(self, monster):
         if monster.owner != self.owner:
@@ -354,11 +271,12 @@ class FrozenBarrier(Land):
 
 # class WearyTravellersInn(Land):
 #     name = "Weary Travellers Inn"
+#     card_id = 'weary_travellers_inn'
+#     image = '/static/cards/weary_travellers_inn.png'
+#     mana = 1
 #     text = "When your monster lands on this tile, you gain one more move."
 #     creation_needs = ["right", 'forward']
 #     role = "blue"
-#     def __init__(self, owner):
-#         super().__init__('weary_travellers_inn', owner, image='/static/cards/weary_travellers_inn.png', mana=1)
 #
 #     def on_enter(self, game, pos, monster):
 #         # Only grant to the tile's owner
@@ -378,11 +296,12 @@ class FrozenBarrier(Land):
 
 class StormNexus(Land):
     name = "Storm Nexus"
+    card_id = 'storm_nexus'
+    image = '/static/cards/storm_nexus.png'
+    mana = 1
     text = "Reduces the ATK of enemy monsters that land on this tile by 40."
     creation_needs = ["back-left"]
     role = "black"
-    def __init__(self, owner):
-        super().__init__('storm_nexus', owner, image='/static/cards/storm_nexus.png', mana=1)
 
     def on_enter(self, game, pos, monster):
         if monster.owner != self.owner:
@@ -391,11 +310,12 @@ class StormNexus(Land):
 
 class WastelandMine(Land):
     name = "Wasteland Mine"
+    card_id = 'wasteland_mine'
+    image = '/static/cards/wasteland_mine.png'
+    mana = 1
     text = "An opponents monster going over or landing on this land loses 30 ATK and DEF"
     creation_needs = ["right"]
     role = "red"
-    def __init__(self, owner):
-        super().__init__('wasteland_mine', owner, image='/static/cards/wasteland_mine.png', mana=1)
 
     def on_enter(self, game, pos, monster):
         if monster.owner != self.owner:
@@ -410,11 +330,12 @@ class WastelandMine(Land):
 
 class RuleOfTheMeek(Land):
     name = "Rule of the Meek"
+    card_id = 'rule_of_the_meek'
+    image = '/static/cards/rule_of_the_meek.png'
+    mana = 1
     text = "Opponent's monsters with ATK or DEF over 150 cannot move across this tile."
     creation_needs = ["forward-right"]
     role = "white"
-    def __init__(self, owner):
-        super().__init__('rule_of_the_meek', owner, image='/static/cards/rule_of_the_meek.png', mana=1)
 
     def blocks_movement(self, monster):
         if monster.owner != self.owner and ((monster.defense > 150) and (monster.attack > 150)):
@@ -436,6 +357,9 @@ class RuleOfTheMeek(Land):
 
 class EmberRavager(Monster):
     name = "Ember Ravager"
+    card_id = 'ember_ravager'
+    image = '/static/cards/ember_ravager.png'
+    mana = 4
     movement = {
         "forward": 2,
         "left": 1,
@@ -446,19 +370,12 @@ class EmberRavager(Monster):
     original_attack = 240
     original_defense = 140
 
-    def __init__(self, owner):
-        super().__init__(
-            card_id='ember_ravager',
-            owner=owner,
-            attack=self.original_attack,
-            defense=self.original_defense,
-            image='/static/cards/ember_ravager.png',
-            mana=4
-        )
-
 
 class RiftStrider(Monster):
     name = "Rift Strider"
+    card_id = 'rift_strider'
+    image = '/static/cards/rift_strider.png'
+    mana = 4
     movement = {
         "forward": "any",
         "back": "any",
@@ -469,19 +386,12 @@ class RiftStrider(Monster):
     original_attack = 160
     original_defense = 160
 
-    def __init__(self, owner):
-        super().__init__(
-            card_id='rift_strider',
-            owner=owner,
-            attack=self.original_attack,
-            defense=self.original_defense,
-            image='/static/cards/rift_strider.png',
-            mana=4
-        )
-
 
 class PaleSentinel(Monster):
     name = "Pale Sentinel"
+    card_id = 'pale_sentinel'
+    image = '/static/cards/pale_sentinel.png'
+    mana = 3
     movement = {
         "forward-left": 1,
         "forward-right": 1,
@@ -492,19 +402,12 @@ class PaleSentinel(Monster):
     original_attack = 150
     original_defense = 220
 
-    def __init__(self, owner):
-        super().__init__(
-            card_id='pale_sentinel',
-            owner=owner,
-            attack=self.original_attack,
-            defense=self.original_defense,
-            image='/static/cards/pale_sentinel.png',
-            mana=3
-        )
-
 
 class GloomStalker(Monster):
     name = "Gloom Stalker"
+    card_id = 'gloom_stalker'
+    image = '/static/cards/gloom_stalker.png'
+    mana = 4
     movement = {
         "forward-left": 2,
         "forward-right": 2,
@@ -515,16 +418,6 @@ class GloomStalker(Monster):
     original_attack = 210
     original_defense = 160
 
-    def __init__(self, owner):
-        super().__init__(
-            card_id='gloom_stalker',
-            owner=owner,
-            attack=self.original_attack,
-            defense=self.original_defense,
-            image='/static/cards/gloom_stalker.png',
-            mana=4
-        )
-
 
 # =========================
 # LANDS (new mechanics)
@@ -532,13 +425,13 @@ class GloomStalker(Monster):
 
 class SanctumOfDawn(Land):
     name = "Sanctum of Dawn"
+    card_id = 'sanctum_of_dawn'
+    image = '/static/cards/sanctum_of_dawn.png'
+    mana = 1
     text = "At the start of your turn, if your monster is on this tile, gain 1 mana."
     creation_needs = ["left"]
     role = "white"
 
-    def __init__(self, owner):
-        super().__init__('sanctum_of_dawn', owner, image='/static/cards/sanctum_of_dawn.png', mana=1)
-
     def on_turn_start(self, game, pos, monster):
         if monster and monster.owner == self.owner:
             game.mana[self.owner] = game.mana.get(self.owner, 0) + 1
@@ -546,13 +439,13 @@ class SanctumOfDawn(Land):
 
 class ObsidianSpikes(Land):
     name = "Obsidian Spikes"
+    card_id = 'obsidian_spikes'
+    image = '/static/cards/obsidian_spikes.png'
+    mana = 1
     text = "Enemies lose 40 DEF entering; passing through also shaves 20 ATK."
     creation_needs = ["forward"]
     role = "red"
 
-    def __init__(self, owner):
-        super().__init__('obsidian_spikes', owner, image='/static/cards/obsidian_spikes.png', mana=1)
-
     def on_enter(self, game, pos, monster):
         if monster.owner != self.owner:
             monster.defense -= 40
@@ -568,27 +461,27 @@ class ObsidianSpikes(Land):
 
 class AetherSpring(Land):
     name = "Aether Spring"
+    card_id = 'aether_spring'
+    image = '/static/cards/aether_spring.png'
+    mana = 1
     text = "At the start of your turn, if your monster is here, draw 1."
     creation_needs = ["forward-right"]
     role = "blue"
 
-    def __init__(self, owner):
-        super().__init__('aether_spring', owner, image='/static/cards/aether_spring.png', mana=1)
-
     def on_turn_start(self, game, pos, monster):
         if monster and monster.owner == self.owner and game.decks[self.owner]:
-            game.hands[self.owner].append(game.decks[self.owner].pop(0))
+            game.hands[self.owner].append(game.decks[self.owner].draw())
 
 
 class NightshroudBog(Land):
     name = "Nightshroud Bog"
+    card_id = 'nightshroud_bog'
+    image = '/static/cards/nightshroud_bog.png'
+    mana = 1
     text = "Enemies entering lose 20 ATK and 20 DEF."
     creation_needs = ["back"]
     role = "black"
 
-    def __init__(self, owner):
-        super().__init__('nightshroud_bog', owner, image='/static/cards/nightshroud_bog.png', mana=1)
-
     def on_enter(self, game, pos, monster):
         if monster.owner != self.owner:
             monster.attack -= 20
@@ -601,13 +494,13 @@ class NightshroudBog(Land):
 
 class WardOfCensure(Land):
     name = "Ward of Censure"
+    card_id = 'ward_of_censure'
+    image = '/static/cards/ward_of_censure.png'
+    mana = 1
     text = "Blocks movement of enemy red or white monsters."
     creation_needs = ["back-left"]
     role = "black"
 
-    def __init__(self, owner):
-        super().__init__('ward_of_censure', owner, image='/static/cards/ward_of_censure.png', mana=1)
-
     def blocks_movement(self, monster):
         return monster.owner != self.owner and (getattr(monster, "role", None) in ("red", "white"))
 
@@ -622,36 +515,33 @@ class WardOfCensure(Land):
 
 class TideOfKnowledge(Sorcery):
     name = "Tide of Knowledge"
+    card_id = 'tide_of_knowledge'
+    image = '/static/cards/tide_of_knowledge.png'
+    mana = 2
     text = "Draw up to 2 cards. +1 extra if you control at least 2 blue lands."
     activation_needs = ["forward"]
     role = "blue"
 
-    def __init__(self, owner):
-        super().__init__('tide_of_knowledge', owner, image='/static/cards/tide_of_knowledge.png', mana=2)
-
     def affect_board(self, game, target_pos, user_id):
         # count blue lands you control
-        blue_lands = sum(
-            1 for row in game.land_board for land in row
-            if land and land.owner == user_id and getattr(land, "role", None) == "blue"
-        )
+        blue_lands = game.count_lands(user_id, "blue")
         draws = 2 + (1 if blue_lands >= 2 else 0)
         for _ in range(draws):
             if game.decks[user_id]:
-                game.hands[user_id].append(game.decks[user_id].pop(0))
+                game.hands[user_id].append(game.decks[user_id].draw())
 
 
 
 
 class RiteOfReclamation(Sorcery):
     name = "Rite of Reclamation"
+    card_id = 'rite_of_reclamation'
+    image = '/static/cards/rite.png'
+    mana = 3
     text = "Discard a card; destroy an enemy monster; bring back a monster from your graveyard."
     activation_needs = ["forward"]
     role = "black"
 
-    def __init__(self, owner):
-        super().__init__('rite_of_reclamation', owner, image='/static/cards/rite.png', mana=3)
-
     def script(self, game, user_id):
         return [
             StepSpec(kind="discard_from_hand", owner="self", zone="hand", as_key="discarded"),
@@ -687,102 +577,96 @@ class RiteOfReclamation(Sorcery):
 
 class BlazingRain(Sorcery):
     name = 'Blazing Rain'
+    card_id = 'blazing_rain'
+    image = '/static/cards/blazing_rain.png'
+    mana = 3
     text = "Weaken all opponent's DEF by 50."
     activation_needs = ["back"]
     role = "red"
-    def __init__(self, owner):
-        super().__init__('blazing_rain', owner, image='/static/cards/blazing_rain.png', mana=3)
 
 
     def affect_board(self, game, target_pos, user_id):
-        for row in game.board:
-            for i, card in enumerate(row):
-                if card and card.owner != user_id and isinstance(card, Monster):
-                    card.defense -= 50
-                    if card.defense <= 0:
-                        game.graveyard[card.owner].append(card)
-                        row[i] = None
+        opponent = '2' if user_id == '1' else '1'
+        for x, y, card in game.iter_monsters(opponent):
+            if isinstance(card, Monster):
+                card.defense -= 50
+                if card.defense <= 0:
+                    game.graveyard[card.owner].append(card)
+                    game.board[x][y] = None
 
 
 class NaturesResurgence(Sorcery):
     name = 'Natures Resurgence'
+    card_id = 'natures_resurgence'
+    image = '/static/cards/natures_resurgence.png'
+    mana = 1
     text = 'Increase the DEF of your monsters by 30.'
     activation_needs = [ "forward-right"]
     role = "white"
-    def __init__(self, owner):
-        super().__init__('natures_resurgence', owner, image='/static/cards/natures_resurgence.png', mana=1)
 
     def affect_board(self, game, target_pos, user_id):
-        for row in game.board:
-            for card in row:
-                if card and card.owner == user_id and isinstance(card, Monster):
-                    card.defense += 30
+        for x, y, card in game.iter_monsters(user_id):
+            if isinstance(card, Monster):
+                card.defense += 30
 
 
 class MysticDraw(Sorcery):
     name = 'Mystic Draw'
+    card_id = 'mystic_draw'
+    image = '/static/cards/mystic_draw.png'
+    mana = 2
     text = 'Draw 2 cards.'
     activation_needs = ["left", "back"]
     role = "blue"
-    def __init__(self, owner):
-        super().__init__('mystic_draw', owner, image='/static/cards/mystic_draw.png', mana=2)
 
     def affect_board(self, game, target_pos, user_id):
         for _ in range(2):
             if game.decks[user_id]:
-                game.hands[user_id].append(game.decks[user_id].pop(0))
+                game.hands[user_id].append(game.decks[user_id].draw())
 #
 
 class DivineReset(Sorcery):
     name = 'Divine Reset'
+    card_id = 'divine_reset'
+    image = '/static/cards/divine_reset.png'
+    mana = 2
     text = 'Destroy all monsters on the field.'
     activation_needs = ['left', 'right']
     role = "black"
-    def __init__(self, owner):
-        super().__init__(
-            card_id='divine_reset',
-            owner=owner,
-            image='/static/cards/divine_reset.png',
-            mana=2
-        )
 
     def affect_board(self, game, target_pos, user_id):
-        for row in game.board:
-            for i, card in enumerate(row):
-                if card and isinstance(card, Monster):
-                    game.graveyard[card.owner].append(card)
-                    row[i] = None
+        for x, y, card in game.iter_monsters():
+            if isinstance(card, Monster):
+                game.graveyard[card.owner].append(card)
+                game.board[x][y] = None
 
 
 class ArcaneTempest(Sorcery):
     name = 'Arcane Tempest'
+    card_id = 'arcane_tempest'
+    image = '/static/cards/arcane_tempest.png'
+    mana = 2
     text = "Reduce all opponent's ATK by 40."
     activation_needs = ['back-right']
     role = "white"
-    def __init__(self, owner):
-        super().__init__('arcane_tempest', owner, image='/static/cards/arcane_tempest.png', mana=2)
 
     def affect_board(self, game, target_pos, user_id):
-        for row in game.board:
-            for card in row:
-                if card and card.owner != user_id and isinstance(card, Monster):
-                    card.attack -= 40
+        opponent = '2' if user_id == '1' else '1'
+        for x, y, card in game.iter_monsters(opponent):
+            if isinstance(card, Monster):
+                card.attack -= 40
 
 
 
 
 class SilentRecruiter(Sorcery):
     name = "Silent Recruiter"
+    card_id = 'silent_recruiter'
+    image = '/static/cards/silent_recruiter.png'
+    mana = 2
     text = "Choose monster with attack lower or equal to 180 from deck and add to hand."
     activation_needs = ['back']
     role = "white"
-    def __init__(self, owner):
-        super().__init__(
-            card_id="silent_recruiter",
-            owner=owner,
-            image="/static/cards/silent_recruiter.png",
-            mana=2
-        )
 
     def script(self, game, user_id):
         # Build a dynamic filter the FE can also use to pre-highlight
@@ -794,12 +678,9 @@ class SilentRecruiter(Sorcery):
 
     def add_picked_to_hand(self, game, _pos, user_id):
         cid = game.interaction.temp["pick"]
-        deck = game.decks[user_id]
-        for i, c in enumerate(deck):
-            if c.id == cid:
-                deck.pop(i)
-                game.hands[user_id].append(c)
-                return
+        card = game.decks[user_id].take(cid)
+        if card:
+            game.hands[user_id].append(card)
 
 
 
@@ -811,13 +692,13 @@ class SilentRecruiter(Sorcery):
 
 class MonarchsSummons(Sorcery):
     name = "Monarch's Summons"
+    card_id = 'monarchs_summons'
+    image = '/static/cards/monarchs_summons.png'
+    mana = 2
     text = "Tutor a red monster with ATK ≥ 200 from your deck to your hand."
     activation_needs = ["right"]
     role = "red"
 
-    def __init__(self, owner):
-        super().__init__('monarchs_summons', owner, image='/static/cards/monarchs_summons.png', mana=2)
-
     def script(self, game, user_id):
         # Note: UI uses the filter to pre-highlight. We'll re-check in apply.
         return [
@@ -829,21 +710,19 @@ class MonarchsSummons(Sorcery):
     def add_picked_to_hand(self, game, _pos, user_id):
         cid = game.interaction.temp["pick"]
         deck = game.decks[user_id]
-        for i, c in enumerate(deck):
-            if c.id == cid and c.type == 'monster' and getattr(c, "role", None) == "red" and getattr(c, "attack", 0) >= 200:
-                deck.pop(i)
-                game.hands[user_id].append(c)
-                return
+        c = deck.get(cid)
+        if c and c.type == 'monster' and getattr(c, "role", None) == "red" and getattr(c, "attack", 0) >= 200:
+            game.hands[user_id].append(deck.take(cid))
 
 class OneMoreTrick(Sorcery):
     name = "One More Trick"
+    card_id = 'one_more_trick'
+    image = '/static/cards/one_more_trick.png'
+    mana = 3
     text = "Choose a sorcery from deck and add to hand."
     activation_needs = ['forward']
     role = "blue"
 
-    def __init__(self, owner):
-        super().__init__('one_more_trick', owner, image="/static/cards/one_more_trick.png", mana=3)
-
     def script(self, game, user_id):
         return [
             StepSpec(kind="select_deck_card", owner="self", zone="deck",
@@ -854,21 +733,19 @@ class OneMoreTrick(Sorcery):
     def add_picked_to_hand(self, game, _pos, user_id):
         cid = game.interaction.temp["pick"]
         deck = game.decks[user_id]
-        for i, c in enumerate(deck):
-            if c.id == cid and c.type == 'sorcery':
-                deck.pop(i)
-                game.hands[user_id].append(c)
-                return
+        c = deck.get(cid)
+        if c and c.type == 'sorcery':
+            game.hands[user_id].append(deck.take(cid))
 
 class WanderersCompass(Sorcery):
     name = "Wanderer's Compass"
+    card_id = 'wanderers_compass'
+    image = '/static/cards/wanderers_compass.png'
+    mana = 2
     text = "Choose a blue sorcery from deck and add to hand."
     activation_needs = ['left']
     role = "blue"
 
-    def __init__(self, owner):
-        super().__init__('wanderers_compass', owner, image="/static/cards/wanderers_compass.png", mana=2)
-
     def script(self, game, user_id):
         return [
             StepSpec(kind="select_deck_card", owner="self", zone="deck",
@@ -879,24 +756,22 @@ class WanderersCompass(Sorcery):
     def add_picked_to_hand(self, game, _pos, user_id):
         cid = game.interaction.temp["pick"]
         deck = game.decks[user_id]
-        for i, c in enumerate(deck):
-            if c.id == cid and c.type == 'sorcery' and getattr(c, "role", None) == "blue":
-                deck.pop(i)
-                game.hands[user_id].append(c)
-                return
+        c = deck.get(cid)
+        if c and c.type == 'sorcery' and getattr(c, "role", None) == "blue":
+            game.hands[user_id].append(deck.take(cid))
 
 
 # --- TARGET A BOARD MONSTER (ANY/ENEMY/ALLY) -------------------------------
 
 class HexOfInversion(Sorcery):
     name = "Hex of Inversion"
+    card_id = 'hex_of_inversion'
+    image = '/static/cards/hex_of_inversion.png'
+    mana = 2
     text = "Choose a monster; swap its ATK and DEF."
     activation_needs = ["back-right"]
     role = "black"
 
-    def __init__(self, owner):
-        super().__init__('hex_of_inversion', owner, image='/static/cards/hex_of_inversion.png', mana=2)
-
     def script(self, game, user_id):
         return [
             StepSpec(kind="select_board_target", owner="any", zone="board",
@@ -913,13 +788,13 @@ class HexOfInversion(Sorcery):
 
 class Overcharge(Sorcery):
     name = "Overcharge"
+    card_id = 'overcharge'
+    image = '/static/cards/overcharge.png'
+    mana = 1
     text = "Choose your monster; it gains +100 ATK and loses 50 DEF."
     activation_needs = ["forward-left"]
     role = "red"
 
-    def __init__(self, owner):
-        super().__init__('overcharge', owner, image='/static/cards/overcharge.png', mana=1)
-
     def script(self, game, user_id):
         return [
             StepSpec(kind="select_board_target", owner="self", zone="board",
@@ -940,13 +815,13 @@ class Overcharge(Sorcery):
 
 class TargetedDestruction(Sorcery):
     name = "Targeted Destruction"
+    card_id = 'targeted_destruction'
+    image = '/static/cards/targeted_destruction.png'
+    mana = 2
     text = "Choose and destroy an enemy monster."
     activation_needs = ['forward-right']
     role = "black"
 
-    def __init__(self, owner):
-        super().__init__('targeted_destruction', owner, image='/static/cards/targeted_destruction.png', mana=2)
-
     def script(self, game, user_id):
         return [
             StepSpec(kind="select_board_target", owner="opponent", zone="board",
@@ -964,13 +839,13 @@ class TargetedDestruction(Sorcery):
 
 class EmpoweringLight(Sorcery):
     name = "Empowering Light"
+    card_id = 'empowering_light'
+    image = '/static/cards/empowering_light.png'
+    mana = 2
     text = "Choose a monster to increase its ATK by 50."
     activation_needs = ['back-left']
     role = "white"
 
-    def __init__(self, owner):
-        super().__init__('empowering_light', owner, image='/static/cards/empowering_light.png', mana=2)
-
     def script(self, game, user_id):
         return [
             StepSpec(kind="select_board_target", owner="any", zone="board",
@@ -987,13 +862,13 @@ class EmpoweringLight(Sorcery):
 
 class FrostbiteCurse(Sorcery):
     name = "Frostbite Curse"
+    card_id = 'frostbite_curse'
+    image = '/static/cards/frostbite_curse.png'
+    mana = 2
     text = "Choose a monster to decrease its DEF by 30."
     activation_needs = ['forward']
     role = "red"
 
-    def __init__(self, owner):
-        super().__init__('frostbite_curse', owner, image='/static/cards/frostbite_curse.png', mana=2)
-
     def script(self, game, user_id):
         return [
             StepSpec(kind="select_board_target", owner="any", zone="board",
@@ -1013,13 +888,13 @@ class FrostbiteCurse(Sorcery):
 
 class MindSeize(Sorcery):
     name = "Mind Seize"
+    card_id = 'mind_seize'
+    image = '/static/cards/mind_seize.png'
+    mana = 2
     text = "Choose an enemy monster to take control of it."
     activation_needs = ['back']
     role = "red"
 
-    def __init__(self, owner):
-        super().__init__('mind_seize', owner, image='/static/cards/mind_seize.png', mana=2)
-
     def script(self, game, user_id):
         return [
             StepSpec(kind="select_board_target", owner="opponent", zone="board",
@@ -1036,13 +911,13 @@ class MindSeize(Sorcery):
 
 class PowerSurge(Sorcery):
     name = "Power Surge"
+    card_id = 'power_surge'
+    image = '/static/cards/power_surge.png'
+    mana = 2
     text = "Choose a monster to double its ATK and DEF."
     activation_needs = ['forward']
     role = "red"
 
-    def __init__(self, owner):
-        super().__init__('power_surge', owner, image='/static/cards/power_surge.png', mana=2)
-
     def script(self, game, user_id):
         return [
             StepSpec(kind="select_board_target", owner="any", zone="board",
@@ -1062,13 +937,13 @@ class PowerSurge(Sorcery):
 
 class ConsecrateGround(Sorcery):
     name = "Consecrate Ground"
+    card_id = 'consecrate_ground'
+    image = '/static/cards/consecrate_ground.png'
+    mana = 2
     text = "Destroy an enemy land."
     activation_needs = ["left"]
     role = "white"
 
-    def __init__(self, owner):
-        super().__init__('consecrate_ground', owner, image='/static/cards/consecrate_ground.png', mana=2)
-
     def script(self, game, user_id):
         return [
             StepSpec(kind="select_land_target", owner="opponent", zone="land",
@@ -1087,13 +962,13 @@ class ConsecrateGround(Sorcery):
 
 class BloodTithe(Sorcery):
     name = "Blood Tithe"
+    card_id = 'blood_tithe'
+    image = '/static/cards/blood_tithe.png'
+    mana = 1
     text = "Sacrifice one of your monsters; gain 2 mana."
     activation_needs = ["back"]
     role = "black"
 
-    def __init__(self, owner):
-        super().__init__('blood_tithe', owner, image='/static/cards/blood_tithe.png', mana=1)
-
     def script(self, game, user_id):
         return [
             StepSpec(kind="select_board_target", owner="self", zone="board",
@@ -1102,10 +977,10 @@ class BloodTithe(Sorcery):
         ]
 
     def do_sac_gain(self, game, _pos, user_id):
-        print(f"[CARD] {time.time():.6f} do_sac_gain user={user_id} temp_keys={list(game.interaction.temp.keys()) if game.interaction else 'NO-IXN'}")
         x, y = game.interaction.temp["sac"]
         card = game.board[x][y]
-        print(f"[CARD] {time.time():.6f} sac at {(x, y)} card={getattr(card, 'id', None)} owner={getattr(card, 'owner', None)} mana_before={game.mana[user_id]}")
+        log.debug("sac_gain", user=user_id, pos=(x, y), card=getattr(card, 'id', None),
+                  owner=getattr(card, 'owner', None), mana_before=game.mana[user_id])
         if card and card.owner == user_id:
             game.graveyard[user_id].append(card)
             game.board[x][y] = None
@@ -1116,13 +991,13 @@ class BloodTithe(Sorcery):
 
 class RiteOfReclamation(Sorcery):
     name = "Rite of Reclamation"
+    card_id = 'rite_of_reclamation'
+    image = '/static/cards/rite.png'
+    mana = 3
     text = "Discard a card; destroy an enemy monster; bring back a monster from your graveyard."
     activation_needs = ["forward"]
     role = "black"
 
-    def __init__(self, owner):
-        super().__init__('rite_of_reclamation', owner, image='/static/cards/rite.png', mana=3)
-
     def script(self, game, user_id):
         return [
             StepSpec(kind="discard_from_hand", owner="self", zone="hand", as_key="discarded"),
@@ -1155,13 +1030,13 @@ class RiteOfReclamation(Sorcery):
 
 class CircleOfRebirth(Sorcery):
     name = "Circle of Rebirth"
+    card_id = 'circle_of_rebirth'
+    image = '/static/cards/circle_of_rebirth.png'
+    mana = 4
     text = "Discard 2 cards; destroy enemy land; summon monster from graveyard; heal all your monsters for 30."
     activation_needs = ["forward", "back"]
     role = "white"
     
-    def __init__(self, owner):
-        super().__init__('circle_of_rebirth', owner, image='/static/cards/circle_of_rebirth.png', mana=4)
-    
     def script(self, game, user_id):
         return [
             StepSpec(kind="discard_from_hand", owner="self", zone="hand", as_key="discard1"),
@@ -1200,21 +1075,20 @@ class CircleOfRebirth(Sorcery):
             game.board[x][y] = monster
     
     def do_heal_all(self, game, _pos, user_id):
-        for row in game.board:
-            for card in row:
-                if card and card.owner == user_id and hasattr(card, 'defense'):
-                    card.defense += 30
+        for _, _, card in game.iter_monsters(user_id):
+            if hasattr(card, 'defense'):
+                card.defense += 30
 
 
 class VoidNexusRitual(Sorcery):
     name = "Void Nexus Ritual"
+    card_id = 'void_nexus_ritual'
+    image = '/static/cards/void_nexus_ritual.png'
+    mana = 5
     text = "Sacrifice monster; discard sorcery; destroy enemy monster; steal opponent's next draw."
     activation_needs = ["left", "right"]
     role = "black"
     
-    def __init__(self, owner):
-        super().__init__('void_nexus_ritual', owner, image='/static/cards/void_nexus_ritual.png', mana=5)
-    
     def script(self, game, user_id):
         return [
             StepSpec(kind="select_board_target", owner="self", zone="board",
@@ -1245,19 +1119,19 @@ class VoidNexusRitual(Sorcery):
     def do_steal_next_draw(self, game, _pos, user_id):
         opponent_id = '2' if user_id == '1' else '1'
         if game.decks[opponent_id]:
-            stolen_card = game.decks[opponent_id].pop(0)
+            stolen_card = game.decks[opponent_id].draw()
             game.hands[user_id].append(stolen_card)
 
 
 class ElementalConvergence(Sorcery):
     name = "Elemental Convergence"
+    card_id = 'elemental_convergence'
+    image = '/static/cards/elemental_convergence.png'
+    mana = 6
     text = "Choose monster; sacrifice land; summon monster from deck; boost all monsters of same role."
     activation_needs = ["forward", "left", "right"]
     role = "blue"
     
-    def __init__(self, owner):
-        super().__init__('elemental_convergence', owner, image='/static/cards/elemental_convergence.png', mana=6)
-    
     def script(self, game, user_id):
         return [
             StepSpec(kind="select_board_target", owner="any", zone="board",
@@ -1282,12 +1156,8 @@ class ElementalConvergence(Sorcery):
         elemental_pos = game.interaction.temp["place_elemental"]
         
         # Find and remove elemental from deck
-        deck = game.decks[user_id]
-        for i, c in enumerate(deck):
-            if c.id == elemental_id:
-                elemental = deck.pop(i)
-                break
-        else:
+        elemental = game.decks[user_id].take(elemental_id)
+        if elemental is None:
             return  # Elemental not found
         
         # Place on empty board position
@@ -1308,24 +1178,22 @@ class ElementalConvergence(Sorcery):
         role_to_boost = target_monster.role
         
         # Boost all monsters of the same role on the board
-        for row in game.board:
-            for card in row:
-                if (card and hasattr(card, 'role') and 
-                    card.role == role_to_boost and hasattr(card, 'attack')):
-                    card.attack += 25
-                    if hasattr(card, 'defense'):
-                        card.defense += 15
+        for _, _, card in game.iter_monsters(role=role_to_boost):
+            if hasattr(card, 'attack'):
+                card.attack += 25
+                if hasattr(card, 'defense'):
+                    card.defense += 15
 
 
 class BurningSacrifice(Sorcery):
     name = "Burning Sacrifice"
+    card_id = 'burning_sacrifice'
+    image = '/static/cards/burning_sacrifice.png'
+    mana = 3
     text = "Sacrifice monster; steal monster from deck; destroy enemy land."
     activation_needs = ["forward", "right"]
     role = "red"
     
-    def __init__(self, owner):
-        super().__init__('burning_sacrifice', owner, image='/static/cards/burning_sacrifice.png', mana=3)
-    
     def script(self, game, user_id):
         return [
             StepSpec(kind="select_board_target", owner="self", zone="board",
@@ -1353,15 +1221,18 @@ class BurningSacrifice(Sorcery):
         
         # Find and steal from opponent's deck
         deck = game.decks[opponent_id]
-        for i, c in enumerate(deck):
-            if c.id == monster_id and hasattr(c, 'mana') and c.mana >= 2:
-                stolen_monster = deck.pop(i)
-                game.hands[user_id].append(stolen_monster)
-                break
+        c = deck.get(monster_id)
+        if c and hasattr(c, 'mana') and c.mana >= 2:
+            game.hands[user_id].append(deck.take(monster_id))
     
     def do_destroy_land_effect(self, game, _pos, user_id):
         x, y = game.interaction.temp["destroy_land"]
         if game.land_board[x][y]:
             game.land_board[x][y] = None
             # Gain 1 mana for destroying enemy land
-            game.mana[user_id] = game.mana.get(user_id, 0) + 1
\ No newline at end of file
+            game.mana[user_id] = game.mana.get(user_id, 0) + 1
+
+
+# index every class above (ids, catalog rows) once, at import
+import registry
+registry.reload()
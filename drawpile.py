@@ -0,0 +1,63 @@
+# drawpile.py
+"""
+Draw pile for the main decks.
+
+Cards are kept in an OrderedDict keyed by instance id: the first entry is the
+top of the deck. Drawing from either end and taking a card out by id are O(1)
+(the dict is backed by a doubly linked list), and iteration is top-to-bottom
+like the plain list it replaces.
+"""
+from collections import OrderedDict
+
+
+class DrawPile:
+    __slots__ = ('_cards',)
+
+    def __init__(self, cards=()):
+        self._cards = OrderedDict((c.id, c) for c in cards)
+
+    def __len__(self):
+        return len(self._cards)
+
+    def __iter__(self):
+        return iter(self._cards.values())
+
+    def __contains__(self, card_id):
+        return card_id in self._cards
+
+    def __repr__(self):
+        return f"DrawPile({list(self._cards.values())!r})"
+
+    def draw(self):
+        """Remove and return the top card (IndexError when empty, like list.pop(0))."""
+        if not self._cards:
+            raise IndexError("draw from empty pile")
+        return self._cards.popitem(last=False)[1]
+
+    def pop(self):
+        """Remove and return the bottom card."""
+        if not self._cards:
+            raise IndexError("pop from empty pile")
+        return self._cards.popitem()[1]
+
+    def get(self, card_id):
+        return self._cards.get(card_id)
+
+    def take(self, card_id):
+        """Remove and return the card with this instance id, or None."""
+        return self._cards.pop(card_id, None)
+
+    def append(self, card):
+        """Put a card on the bottom."""
+        self._cards[card.id] = card
+
+    def put_top(self, card):
+        self._cards[card.id] = card
+        self._cards.move_to_end(card.id, last=False)
+
+    def extend(self, cards):
+        for c in cards:
+            self._cards[c.id] = c
+
+    def clear(self):
+        self._cards.clear()
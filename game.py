@@ -1,42 +1,26 @@
 
-from card_types import evaluate_creation_or_activation_needs
-from random import shuffle
+from card_types import evaluate_creation_or_activation_needs, NeedMap
+import random
+from copy import deepcopy
+from inspect import signature
+from itertools import count
 from card_types import Monster, Sorcery, Land
-import re
 from typing import Any, Dict, List, Optional, Tuple
 from interactions import StepSpec, PendingInteraction, StepKind
-import time
+from bitboard import BitBoards, tiles, bit, tracked_grid
+from drawpile import DrawPile
+from zobrist import Zobrist
+from functools import wraps
+import registry
+import snapshot
+import gamelog
+from gamelog import DEBUG
 
+log = gamelog.channel('engine')
+slog = gamelog.channel('sorcery')
 
 
 
-def _all_subclasses(cls):
-    out = set()
-    for sub in cls.__subclasses__():
-        out.add(sub)
-        out |= _all_subclasses(sub)
-    return out
-
-def _canon_id(s: str) -> str:
-    # accept "Abyssal Leviathan", "abyssal-leviathan", "abyssal_leviathan" as the same
-    return re.sub(r'[^a-z0-9]+', '_', (s or '').lower()).strip('_')
-
-def _legal_id_map():
-    """normalized_id -> canonical_id (from card instances)"""
-    legal = {}
-    for base in (Monster, Sorcery, Land):
-        for cls in _all_subclasses(base):
-            try:
-                inst = cls(owner='1')
-            except TypeError:
-                # if some exotic ctors exist, skip or handle specially
-                continue
-            cid = getattr(inst, 'card_id', None) or getattr(cls, 'card_id', None)
-            if not cid:
-                # fallback to class name
-                cid = cls.__name__
-            legal[_canon_id(cid)] = cid
-    return legal
 
 
 def validate_deck_payload(payload):
@@ -44,13 +28,12 @@ def validate_deck_payload(payload):
         return False, "Bad payload"
 
     piles = payload.get('piles') or {}
-    legal = _legal_id_map()   # normalized_id -> canonical_id
 
     unknown = []
     for pile in ('MAIN', 'LAND', 'SIDE'):
         for row in (piles.get(pile) or []):
             raw = (row or {}).get('card_id')
-            if _canon_id(raw) not in legal:
+            if registry.lookup(raw) is None:
                 unknown.append(raw)
 
     if unknown:
@@ -62,47 +45,297 @@ def validate_deck_payload(payload):
     return True, "ok"
 
 
-# Canonical id -> class map (same canon rules as validate_deck_payload)
-_CLASS_MAP_CANON = None
-def _class_map_by_canon():
-    m = {}
-    for base in (Monster, Sorcery, Land):
-        for cls in _all_subclasses(base):
-            try:
-                inst = cls(owner='1')
-            except TypeError:
-                continue
-            cid = getattr(inst, 'card_id', None) or getattr(cls, 'card_id', None) or cls.__name__
-            m[_canon_id(cid)] = cls
-    return m
-def _get_class_map():
-    global _CLASS_MAP_CANON
-    if _CLASS_MAP_CANON is None:
-        _CLASS_MAP_CANON = _class_map_by_canon()
-    return _CLASS_MAP_CANON
-
-def build_instances_from_rows(rows, owner):
+# --- legal move generation -----------------------------------------------------
+
+BOARD_SIZE = 6
+_UNIT_VECTORS = [(-1, 0), (-1, -1), (-1, 1), (0, -1), (0, 1), (1, 0), (1, -1), (1, 1)]
+
+# (card class, owner) -> table[x][y] = tuple of rays; a ray is the tuple of
+# tiles walked in one direction, nearest first, cut by range and board edge
+_RAY_TABLES = {}
+registry.on_reload(_RAY_TABLES.clear)
+
+def _build_ray_table(movement, owner):
+    # direction name -> board vector for this owner (same orientation as Monster.resolve_direction)
+    vectors = {Monster.resolve_direction(dx, dy, owner): (dx, dy) for dx, dy in _UNIT_VECTORS}
+    table = []
+    for x in range(BOARD_SIZE):
+        row = []
+        for y in range(BOARD_SIZE):
+            rays = []
+            for direction, reach in movement.items():
+                vec = vectors.get(direction)
+                if not vec or not reach:
+                    continue
+                limit = BOARD_SIZE if reach == 'any' else int(reach)
+                ray = []
+                tx, ty = x, y
+                for _ in range(limit):
+                    tx += vec[0]
+                    ty += vec[1]
+                    if not (0 <= tx < BOARD_SIZE and 0 <= ty < BOARD_SIZE):
+                        break
+                    ray.append((tx, ty))
+                if ray:
+                    rays.append(tuple(ray))
+            row.append(tuple(rays))
+        table.append(row)
+    return table
+
+def _ray_table(cls, owner):
+    table = _RAY_TABLES.get((cls, owner))
+    if table is None:
+        table = _RAY_TABLES[(cls, owner)] = _build_ray_table(cls.movement, owner)
+    return table
+
+
+# --- sorcery programs ----------------------------------------------------------
+# A card class's script is built once into an immutable program (a tuple of
+# frozen StepSpecs) shared by every cast. Apply methods are bound once per
+# (class, method name): the function and which call signature it takes.
+
+_PROGRAMS = {}  # card class -> tuple of StepSpec
+_APPLY = {}     # (card class, method name) -> (function, takes_temp), or None if missing
+registry.on_reload(_PROGRAMS.clear)
+registry.on_reload(_APPLY.clear)
+
+_NO_OP_PROGRAM = (StepSpec(kind="apply_effect", apply_method="no_op"),)
+
+def _program(card, game, user_id):
+    """The card's steps; scripts must not depend on the game (they're built once per class)."""
+    cls = type(card)
+    program = _PROGRAMS.get(cls)
+    if program is None:
+        if hasattr(card, "script"):
+            program = tuple(card.script(game, user_id))
+        elif hasattr(card, "affect_board"):
+            program = (StepSpec(kind="apply_effect", apply_method="affect_board"),)
+        else:
+            program = _NO_OP_PROGRAM
+        for step in program:
+            if step.kind == "apply_effect":
+                _apply_binding(cls, step.apply_method)
+        _PROGRAMS[cls] = program
+    return program
+
+def _apply_binding(cls, name):
+    key = (cls, name)
+    try:
+        return _APPLY[key]
+    except KeyError:
+        pass
+    fn = getattr(cls, name or "", None)
+    if callable(fn):
+        # most cards: (game, pos, user_id); the newer signature is (game, user_id, temp)
+        binding = (fn, 'temp' in signature(fn).parameters)
+    else:
+        binding = None
+    _APPLY[key] = binding
+    return binding
+
+
+def build_instances_from_rows(rows, owner, rng=random, ids=None):
+    """Instances for compressed deck rows, shuffled with rng; ids numbers them (per game)."""
     out = []
-    cmap = _get_class_map()
     for r in (rows or []):
-        key = _canon_id((r or {}).get("card_id"))
         qty = int((r or {}).get("qty", 1) or 1)
-        cls = cmap.get(key)
+        cls = registry.lookup((r or {}).get("card_id"))
         if not cls:
             # Helpful log if something still mismatches
-            print(f"[deck] unknown id after canonization: {r}")
+            log.warning("unknown_card_id", row=r)
             continue
         for _ in range(qty):
-            out.append(cls(owner))
-    shuffle(out)
+            card = cls(owner)
+            if ids is not None:
+                card.id = str(next(ids))
+            out.append(card)
+    rng.shuffle(out)
     return out
 
 
 
 
 
+# --- make/unmake journal -------------------------------------------------------
+# When game.journal is a list, every journaled engine call pushes one undo
+# entry holding the prior values of everything that call can touch; unmake()
+# pops and restores it. Entries keep references to the same Card objects, so
+# a make/unmake cycle copies a few short lists instead of the whole game.
+
+_ZONES = ('hands', 'decks', 'land_decks', 'graveyard')
+_TURN_SETS = ('summoned_this_turn', 'sorcery_used_this_turn', 'land_placed_this_turn')
+
+def _record(game, boards=False, zones=(), sets=(), interaction=False):
+    entry = {
+        'turn_index': game.turn_index,
+        'moves_this_turn': game.moves_this_turn,
+        'max_moves_per_turn': game.max_moves_per_turn,
+        'mana': dict(game.mana),
+        'center_tile_control': dict(game.center_tile_control),
+        'actions': len(game._actions),
+    }
+    cards = []
+    if boards:
+        entry['board'] = [row[:] for row in game.board]
+        entry['land_board'] = [row[:] for row in game.land_board]
+        cards = [c for rows in (game.board, game.land_board) for row in rows for c in row if c is not None]
+        entry['graveyard_len'] = {pid: len(g) for pid, g in game.graveyard.items()}
+        entry['bitboards'] = game.bitboards.snapshot()
+        entry['zobrist'] = game.zobrist.snapshot()
+    entry['zones'] = [(getattr(game, z)[pid], list(getattr(game, z)[pid])) for z, pid in zones]
+    for _, saved in entry['zones']:
+        cards += saved
+    # on_enter / passing hooks and effects change stats in place, also on cards
+    # they pull from another zone (e.g. a summon from the deck, then a buff)
+    entry['stats'] = [(c, getattr(c, 'attack', None), getattr(c, 'defense', None), c.owner) for c in cards]
+    entry['sets'] = [(name, set(getattr(game, name))) for name in sets]
+    if interaction:
+        ixn = game.interaction
+        entry['interaction'] = (ixn, ixn.cursor, ixn.slot_index, dict(ixn.temp)) if ixn else None
+        entry['stack'] = [dict(s) for s in game.stack]
+    return entry
+
+def _restore(game, entry):
+    game.turn_index = entry['turn_index']
+    game.moves_this_turn = entry['moves_this_turn']
+    game.max_moves_per_turn = entry['max_moves_per_turn']
+    game.mana.clear()
+    game.mana.update(entry['mana'])
+    game.center_tile_control.clear()
+    game.center_tile_control.update(entry['center_tile_control'])
+    del game._actions[entry['actions']:]
+    for card, attack, defense, owner in entry['stats']:
+        card.owner = owner
+        if attack is not None:
+            card.attack, card.defense = attack, defense
+    if 'board' in entry:
+        for row, saved in zip(game.board, entry['board']):
+            list.__setitem__(row, slice(None), saved)
+        for row, saved in zip(game.land_board, entry['land_board']):
+            list.__setitem__(row, slice(None), saved)
+        for pid, n in entry['graveyard_len'].items():
+            del game.graveyard[pid][n:]
+        game.bitboards.restore(entry['bitboards'])
+        game.zobrist.restore(entry['zobrist'])
+    for zone, saved in entry['zones']:
+        # lists and DrawPiles alike
+        zone.clear()
+        zone.extend(saved)
+    for name, saved in entry['sets']:
+        live = getattr(game, name)
+        live.clear()
+        live.update(saved)
+    if 'interaction' in entry:
+        saved = entry['interaction']
+        if saved is None:
+            game.interaction = None
+        else:
+            ixn, cursor, slot_index, temp = saved
+            ixn.cursor, ixn.slot_index, ixn.temp = cursor, slot_index, temp
+            game.interaction = ixn
+        game.stack[:] = entry['stack']
+
+def _both(*zones):
+    return [(z, pid) for z in zones for pid in ('1', '2')]
+
+def journaled(recorder):
+    """
+    recorder(game, *args, **kwargs) -> undo entry, taken before the call.
+    Only the outermost journaled call records (e.g. sorcery_step_input ->
+    _finalize_sorcery is one entry). Stacked on a @logged method it does both
+    in one wrapper (see _action_wrapper).
+    """
+    def deco(fn):
+        if hasattr(fn, '_logged'):
+            return _action_wrapper(*fn._logged, recorder=recorder)
+        @wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            if self.journal is None or self._journal_depth:
+                return fn(self, *args, **kwargs)
+            self.journal.append(recorder(self, *args, **kwargs))
+            self._journal_depth += 1
+            try:
+                return fn(self, *args, **kwargs)
+            finally:
+                self._journal_depth -= 1
+        return wrapper
+    return deco
+
+# --- action log ----------------------------------------------------------------
+# Every outermost call of a player-facing entry point is recorded, and
+# game.actions lists them as {'type': ..., <its arguments>}. Together with
+# game.seed that is the whole match: ChessGame.replay(seed, actions) plays it
+# back. Calls are kept as (type, args, kwargs) and only turned into dicts
+# when game.actions is read, so recording stays cheap on the search paths.
+
+_ACTIONS = {}  # action type -> (method name, parameter names without self)
+
+def logged(kind, deep=False):
+    """deep=True deep-copies the arguments (nested ones, e.g. deck rows); otherwise one level is copied."""
+    def deco(fn):
+        _ACTIONS[kind] = (fn.__name__, tuple(signature(fn).parameters)[1:])
+        wrapper = _action_wrapper(fn, kind, deep)
+        wrapper._logged = (fn, kind, deep)
+        return wrapper
+    return deco
+
+def _action_wrapper(fn, kind, deep, recorder=None):
+    # with a recorder it also does @journaled's work: one wrapper instead of two on move/unmake
+    @wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        journal = recorder is not None and self.journal is not None and not self._journal_depth
+        log = not self._action_depth
+        if not (journal or log):
+            return fn(self, *args, **kwargs)
+        if journal:
+            self.journal.append(recorder(self, *args, **kwargs))  # first: undo cuts the log back to here
+            self._journal_depth += 1
+        if log:
+            if deep:
+                self._actions.append((kind, deepcopy(args), deepcopy(kwargs)))
+            else:
+                # arguments are JSON-shaped: positions as lists, step payloads as flat dicts
+                copied = []
+                for v in args:
+                    if type(v) is list:
+                        v = v[:]
+                    elif type(v) is dict:
+                        v = {k: x[:] if type(x) is list else x for k, x in v.items()}
+                    copied.append(v)
+                self._actions.append((kind, copied, {k: v[:] if type(v) is list else v
+                                                     for k, v in kwargs.items()} if kwargs else None))
+            self._action_depth += 1
+        try:
+            return fn(self, *args, **kwargs)
+        finally:
+            if journal:
+                self._journal_depth -= 1
+            if log:
+                self._action_depth -= 1
+    return wrapper
+
+def _action_entry(kind, args, kwargs):
+    entry = {'type': kind}
+    entry.update(zip(_ACTIONS[kind][1], args))
+    if kwargs:
+        entry.update(kwargs)
+    return entry
+
+def _record_sorcery(game, *args, **kwargs):
+    return _record(game, boards=True, zones=_both(*_ZONES), sets=_TURN_SETS, interaction=True)
+
+
 class ChessGame:
-    def __init__(self):
+    def __init__(self, seed=None):
+        # all randomness (deck shuffles) comes from this game's own rng
+        self.seed = random.SystemRandom().getrandbits(63) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self._actions = []  # (type, args, kwargs); see the actions property
+        self._action_depth = 0
+        self._card_ids = count(1)
+
+        self.bitboards = BitBoards()
+        self.zobrist = Zobrist()
         self.board = self.init_board()
         self.land_board = self.init_land_board()
 
@@ -116,7 +349,7 @@ class ChessGame:
         self.graveyard = {'1': [], '2': []}
 
         # runtime state
-        self.decks = {'1': [], '2': []}
+        self.decks = {'1': DrawPile(), '2': DrawPile()}
         self.land_decks = {'1': [], '2': []}
         self.hands = {'1': [], '2': []}
         self.summoned_this_turn = set()
@@ -125,6 +358,47 @@ class ChessGame:
         self.interaction: Optional[PendingInteraction] = None
         self.stack: List[Dict[str, Any]] = []  # purely visual; FE can render if desired
 
+        # make/unmake journal; None = not recording (normal play)
+        self.journal: Optional[List[Dict[str, Any]]] = None
+        self._journal_depth = 0
+
+    @property
+    def actions(self) -> List[Dict[str, Any]]:
+        """The action log: one {'type': ..., <arguments>} per recorded call."""
+        return [_action_entry(*record) for record in self._actions]
+
+    @classmethod
+    def replay(cls, seed, actions):
+        """Rebuild a match from its seed and action log (as recorded in game.actions)."""
+        game = cls(seed=seed)
+        for action in actions:
+            params = dict(action)
+            name, _ = _ACTIONS[params.pop('type')]
+            getattr(game, name)(**deepcopy(params))
+        return game
+
+    def to_bytes(self) -> bytes:
+        """Compact binary snapshot of the whole position (format in snapshot.py)."""
+        return snapshot.encode(self)
+
+    @classmethod
+    def from_bytes(cls, data):
+        seed, version, body = snapshot.read_header(data)
+        return snapshot.decode_into(cls(seed=seed), body, version)
+
+    def start_journal(self):
+        self.journal = []
+
+    def stop_journal(self):
+        self.journal = None
+
+    def unmake(self):
+        """Undo the last journaled engine call. Returns False if there is nothing to undo."""
+        if not self.journal:
+            return False
+        _restore(self, self.journal.pop())
+        return True
+
     def reset_runtime_state(self):
         self.board = self.init_board()
         self.land_board = self.init_land_board()
@@ -140,6 +414,7 @@ class ChessGame:
         self.interaction = None
         self.stack = []
 
+    @logged('start', deep=True)
     def apply_decks_and_start(self, deck_rows_p1, land_rows_p1, deck_rows_p2, land_rows_p2):
         """
         deck_rows_* and land_rows_* are compressed rows from your export:
@@ -147,10 +422,11 @@ class ChessGame:
         """
         self.reset_runtime_state()
 
-        self.decks['1'] = build_instances_from_rows(deck_rows_p1, '1')
-        self.decks['2'] = build_instances_from_rows(deck_rows_p2, '2')
-        self.land_decks['1'] = build_instances_from_rows(land_rows_p1, '1')
-        self.land_decks['2'] = build_instances_from_rows(land_rows_p2, '2')
+        rng, ids = self.rng, self._card_ids
+        self.decks['1'] = DrawPile(build_instances_from_rows(deck_rows_p1, '1', rng, ids))
+        self.decks['2'] = DrawPile(build_instances_from_rows(deck_rows_p2, '2', rng, ids))
+        self.land_decks['1'] = build_instances_from_rows(land_rows_p1, '1', rng, ids)
+        self.land_decks['2'] = build_instances_from_rows(land_rows_p2, '2', rng, ids)
 
         # initial draw (5)
         for pid in ['1', '2']:
@@ -168,8 +444,21 @@ class ChessGame:
 
     def draw_card(self, user_id):
         if self.decks[user_id]:
-            self.hands[user_id].append(self.decks[user_id].pop(0))
+            self.hands[user_id].append(self.decks[user_id].draw())
 
+    @journaled(lambda g, slot_index, user_id: _record(g, zones=[('hands', user_id), ('graveyard', user_id)]))
+    @logged('discard')
+    def discard(self, slot_index, user_id):
+        """Move a hand card to the graveyard (end-turn-with-discard)."""
+        hand = self.hands[user_id]
+        if not (0 <= slot_index < len(hand)):
+            return False, "Invalid card slot"
+        self.graveyard[user_id].append(hand.pop(slot_index))
+        return True, "Card discarded"
+
+    @journaled(lambda g, slot_index, to_pos, user_id: _record(
+        g, boards=True, zones=[('hands', user_id)], sets=('summoned_this_turn',)))
+    @logged('summon')
     def summon_card(self, slot_index, to_pos, user_id):
         if self._locked():
             return False, "A sorcery is resolving"
@@ -177,7 +466,7 @@ class ChessGame:
             return False, "Not your turn"
         if user_id in self.summoned_this_turn:
             return False, "You've already summoned this turn"
-        print(to_pos)
+        log.debug("summon", user=user_id, slot=slot_index, pos=to_pos)
 
         if to_pos not in self.get_valid_summon_positions(user_id):
             return False, "Invalid summon position"
@@ -199,19 +488,61 @@ class ChessGame:
         return True, f"{card.name} summoned!"
 
     def init_board(self):
-        board = [[None for _ in range(6)] for _ in range(6)]
+        # 6x6 grid of None; writes keep bitboards and the position hash in sync
+        self.bitboards.clear_monsters()
+        self.zobrist.clear_monsters(6)
+        board = tracked_grid(6, self._on_board_set)
 
         return board
 
     def init_land_board(self):
-        land_board = [[None for _ in range(7)] for _ in range(7)]
+        self.bitboards.clear_lands()
+        self.zobrist.clear_lands(7)
+        land_board = tracked_grid(7, self._on_land_set)
 
         return land_board
 
+    def _on_board_set(self, x, y, card):
+        self.bitboards.set_monster(x, y, card)
+        self.zobrist.set_monster(x, y, card)
+
+    def _on_land_set(self, x, y, land):
+        self.bitboards.set_land(x, y, land)
+        self.zobrist.set_land(x, y, land)
+
+    def _sync_boards(self):
+        """Rebuild derived board state after changes the grids can't see (card.owner, stats)."""
+        self.bitboards.sync(self.board, self.land_board)
+        self.zobrist.sync(self.board, self.land_board)
+
+    # --- board indexes: kept current by the grid write hooks (see bitboard.py) ---
+
+    def iter_monsters(self, owner=None, role=None):
+        """(x, y, card) for every monster on the board, optionally only one owner's and/or role's."""
+        board = self.board
+        for x, y in tiles(self.bitboards.monster_mask(owner, role)):
+            yield x, y, board[x][y]
+
+    def iter_lands(self, owner=None, role=None):
+        """(x, y, land) for every land on the land board, optionally only one owner's and/or role's."""
+        land_board = self.land_board
+        for x, y in tiles(self.bitboards.land_mask(owner, role)):
+            yield x, y, land_board[x][y]
+
+    def count_lands(self, owner=None, role=None) -> int:
+        return self.bitboards.land_mask(owner, role).bit_count()
+
+    @property
+    def zobrist_hash(self) -> int:
+        """64-bit position hash: boards, turn, moves, mana and per-turn flags."""
+        return self.zobrist.position_hash(self)
+
     @property
     def current_player(self):
         return self.players[self.turn_index]
 
+    @journaled(lambda g: _record(g, boards=True, zones=_both('hands', 'decks'), sets=_TURN_SETS))
+    @logged('end_turn')
     def toggle_turn(self):
         if self._locked():
             return  # cannot end-turn while locked; the caller should be blocked too
@@ -223,18 +554,20 @@ class ChessGame:
         self.land_placed_this_turn.clear()
         self.draw_card(self.current_player)
 
-        for x in range(6):
-            for y in range(6):
-                card = self.board[x][y]
-                land = self.land_board[x][y]
-                if card and land and hasattr(land, 'on_turn_start'):
-                    land.on_turn_start(self, (x, y), card)
+        for x, y in tiles(self.bitboards.turn_start_tiles):
+            card = self.board[x][y]
+            land = self.land_board[x][y]
+            if card and land:
+                land.on_turn_start(self, (x, y), card)
+                self.zobrist.set_monster(x, y, self.board[x][y])
 
     def can_move(self, user_id):
         if self._locked():
             return False
         return user_id == self.current_player and self.moves_this_turn < self.max_moves_per_turn
 
+    @journaled(lambda g, *a, **k: _record(g))
+    @logged('direct_attack')
     def direct_attack(self, pos, user_id):
         if not self.can_move(user_id):
             return False, "You've used all your moves", False
@@ -261,6 +594,8 @@ class ChessGame:
         return True, f"{card.name} attacked directly for {card.mana} mana!", False
 
 
+    @journaled(lambda g, *a, **k: _record(g, boards=True))
+    @logged('move')
     def move(self, from_pos, to_pos, user_id):
         if not self.can_move(user_id):
             return False, "You've used all your moves"
@@ -278,6 +613,8 @@ class ChessGame:
         # Blocked path check (no jumping)
         dx = tx - fx
         dy = ty - fy
+        if dx and dy and abs(dx) != abs(dy):
+            return False, "Invalid move"  # only straight lines and diagonals
         step_x = 0 if dx == 0 else dx // abs(dx)
         step_y = 0 if dy == 0 else dy // abs(dy)
 
@@ -285,12 +622,12 @@ class ChessGame:
         while (x, y) != (tx, ty):
             if self.board[x][y] is not None:
                 return False, "Path blocked by another monster"
-            x += step_x
-            y += step_y
             land = self.land_board[x][y]
             if land:
                 if hasattr(land, 'blocks_movement') and land.blocks_movement(card):
                     return False, f"{land.name} blocks movement!"
+            x += step_x
+            y += step_y
 
         target = self.board[tx][ty]
         target_land = self.land_board[tx][ty]
@@ -299,10 +636,12 @@ class ChessGame:
                 return False, f"{target_land.name} blocks movement!"
             if hasattr(target_land, 'affects_monster_passing'):
                 target_land.affects_monster_passing(card)
+                self.zobrist.set_monster(fx, fy, self.board[fx][fy])  # stats changed in place
                 return False, f"{target_land.name} blocks movement!"
             else:
                 if hasattr(target_land, 'on_enter'):
                     target_land.on_enter(self, (tx, ty), card)
+                    self.zobrist.set_monster(fx, fy, self.board[fx][fy])
 
         if target:
             if target.owner == card.owner:
@@ -336,9 +675,52 @@ class ChessGame:
         self.moves_this_turn += 1
         return True, "Move successful"
 
+    def _land_stops(self, card, x, y):
+        if not self.bitboards.blockers.get(card.owner, 0) & bit(x, y):
+            return False
+        land = self.land_board[x][y]
+        return land is not None and hasattr(land, 'blocks_movement') and land.blocks_movement(card)
+
+    def piece_moves(self, pos):
+        """
+        Tiles the monster at `pos` can legally move to right now, as [x, y] lists.
+        Same rules as move(): no jumping, lands that block the monster stop the
+        ray, own pieces can't be captured, lands with a passing hook can't be
+        landed on.
+        """
+        x, y = pos
+        card = self.board[x][y]
+        if not isinstance(card, Monster) or not self.can_move(card.owner):
+            return []
+        out = []
+        for ray in _ray_table(card.__class__, card.owner)[x][y]:
+            for tx, ty in ray:
+                if self._land_stops(card, tx, ty):
+                    break
+                target = self.board[tx][ty]
+                if target is None or target.owner != card.owner:
+                    if not hasattr(self.land_board[tx][ty], 'affects_monster_passing'):
+                        out.append([tx, ty])
+                if target is not None:
+                    break
+        return out
+
+    def legal_moves(self, user_id):
+        """Every legal move for `user_id`: [[from, to], ...] with [x, y] positions."""
+        if not self.can_move(user_id):
+            return []
+        out = []
+        for x, y in tiles(self.bitboards.occupancy.get(user_id, 0)):
+            out.extend([[x, y], to] for to in self.piece_moves((x, y)))
+        return out
+
+    def moves_to(self, pos, user_id):
+        """Positions of `user_id`'s monsters that can legally move onto `pos`."""
+        target = list(pos)
+        return [frm for frm, to in self.legal_moves(user_id) if to == target]
+
     def game_can_activate_card(self, slot_index, user_id, target_pos):
-        print('slot', slot_index, user_id, target_pos)
-        print('here game_can_activate_card')
+        log.debug("can_activate", user=user_id, slot=slot_index, target_pos=target_pos)
         if user_id != self.current_player:
             return False, "Not your turn", False
 
@@ -350,7 +732,6 @@ class ChessGame:
             return False, "Invalid card slot", False
 
         card = hand[slot_index]
-        print(card.name)
         if card.type != 'sorcery':
             return False, "This is not a sorcery", False
 
@@ -361,7 +742,7 @@ class ChessGame:
             return False, "No activation position provided", False
 
         activation_status = evaluate_creation_or_activation_needs(card, self, target_pos[0], target_pos[1])
-        print(activation_status, 'act status')
+        log.debug("activation_status", card=card.card_id, status=activation_status)
 
         if activation_status == 0:
             return False, "Activation needs not met", False
@@ -378,8 +759,11 @@ class ChessGame:
         # Optional fallback
         return False, "Unknown activation status", False
 
+    @journaled(_record_sorcery)
+    @logged('begin_sorcery')
     def begin_sorcery(self, slot_index: int, user_id: str, target_pos: Tuple[int, int], free: bool):
-        print(f"[GAME] {time.time():.6f} BEGIN slot={slot_index} user={user_id} free={free} target_pos={target_pos} ixn_pre={bool(self.interaction)}")
+        slog.debug("begin", slot=slot_index, user=user_id, free=free, target_pos=target_pos,
+                   ixn_pre=self.interaction is not None)
         if self._locked():
             return False, "Another interaction is in progress"
 
@@ -390,12 +774,7 @@ class ChessGame:
         card = hand[slot_index]
         self.stack.append({'type': 'sorcery', 'card_id': card.card_id, 'owner': user_id, 'status': 'resolving'})
 
-        if hasattr(card, "script"):
-            steps = card.script(self, user_id)
-        elif hasattr(card, "affect_board"):
-            steps = [StepSpec(kind="apply_effect", apply_method="affect_board")]
-        else:
-            steps = [StepSpec(kind="apply_effect", apply_method="no_op")]
+        steps = _program(card, self, user_id)
 
         self.interaction = PendingInteraction(
             type="sorcery",
@@ -409,195 +788,207 @@ class ChessGame:
             temp={}
         )
 
-        print(
-            f"[GAME] {time.time():.6f} BEGIN set ixn cursor={self.interaction.cursor} steps={[(s.kind, s.apply_method) for s in self.interaction.steps]}")
+        if slog.on(DEBUG):
+            slog.debug("begin_steps", card=card.card_id,
+                       steps=[(s.kind, s.apply_method) for s in self.interaction.steps])
         status, _ = self._advance_auto_steps()
-        print(
-            f"[GAME] {time.time():.6f} BEGIN _advance_auto_steps -> status={status} cursor_now={self.interaction.cursor if self.interaction else 'N/A'}")
+        slog.debug("begin_advanced", status=status,
+                   cursor=self.interaction.cursor if self.interaction else None)
         if status == "complete":
-            print(f"[GAME] {time.time():.6f} BEGIN finalize (auto-complete)")
             self._finalize_sorcery()
         return True, "Sorcery started"
 
+    @journaled(_record_sorcery)
+    @logged('sorcery_step')
     def sorcery_step_input(self, user_id: str, payload: Dict[str, Any]):
-        print(f"[STEP_IN] {time.time():.6f} enter user={user_id} payload={payload} ixn_exists={bool(self.interaction)}")
+        slog.debug("step_input", user=user_id, payload=payload, ixn=self.interaction is not None)
         ixn = self.interaction
-        print(ixn, 'ixn')
         if not ixn or ixn.type != "sorcery":
             return "error", "No sorcery is resolving"
         if ixn.owner != user_id:
             return "error", "Not your interaction"
 
         step = ixn.current_step()
-        print(step, 'step current')
+        slog.debug("step_current", cursor=ixn.cursor, kind=getattr(step, 'kind', None))
         if not step:
             return "error", "Nothing to resolve"
 
+        handler = self._PROMPT_HANDLERS.get(step.kind)
+        if handler is None:
+            return "error", f"Unknown step kind: {step.kind}"
         try:
-            if step.kind == "discard_from_hand":
-                idx = int(payload.get("hand_index"))
-                hand = self.hands[user_id]
-                if not (0 <= idx < len(hand)):
-                    return "error", "Invalid hand index"
-                card = hand.pop(idx)
-                self.graveyard[user_id].append(card)
-                if step.as_key:
-                    ixn.temp[step.as_key] = card.id
-
-            elif step.kind == "select_board_target":
-                pos = payload.get("pos")
-                if not (isinstance(pos, list) and len(pos) == 2):
-                    return "error", "Invalid target"
-                x, y = pos
-                if not (0 <= x < 6 and 0 <= y < 6):
-                    return "error", "Out of board"
-                target = self.board[x][y]
-                filt = step.filter or {}
-                if filt.get("require_enemy") and (not target or target.owner == user_id):
-                    return "error", "Must select enemy monster"
-                if filt.get("require_monster") and (not target or target.type != "monster"):
-                    return "error", "Must select a monster"
-                if step.as_key:
-                    ixn.temp[step.as_key] = (x, y)
-
-            elif step.kind == "select_graveyard_card":
-                cid = payload.get("card_id")
-                pool = self.graveyard[user_id] if (step.owner in (None, "self")) else self.graveyard[
-                    '2' if user_id == '1' else '1']
-                if not any(c.id == cid for c in pool):
-                    return "error", "Card not in graveyard"
-                if step.as_key:
-                    ixn.temp[step.as_key] = cid
-
-            elif step.kind == "select_deck_card":
-                cid = payload.get("card_id")
-                pool = self.decks[user_id] if (step.owner in (None, "self")) else self.decks[
-                    '2' if user_id == '1' else '1']
-                match = next((c for c in pool if c.id == cid), None)
-                if not match:
-                    return "error", "Card not in deck"
-                filt = step.filter or {}
-                if filt.get("type") and getattr(match, "type", None) != filt["type"]:
-                    return "error", "Invalid type"
-                if "max_attack" in filt and getattr(match, "attack", 0) > filt["max_attack"]:
-                    return "error", "Attack too high"
-                if "role" in filt and getattr(match, "role", None) != filt["role"]:
-                    return "error", "Wrong role"
-                if step.as_key:
-                    ixn.temp[step.as_key] = cid
-
-            elif step.kind == "pay_cost":
-                cost = step.cost or {}
-                mana_needed = int(cost.get("mana", 0))
-                if mana_needed > 0:
-                    if self.mana[user_id] < mana_needed:
-                        return "error", "Not enough mana"
-                    self.mana[user_id] -= mana_needed
-
-            elif step.kind == "apply_effect":
-                hand = self.hands[user_id]
-                if 0 <= ixn.slot_index < len(hand):
-                    card = hand[ixn.slot_index]
-                else:
-                    card = next((c for c in hand if c.card_id == ixn.card_id), None)
-                method = getattr(card, step.apply_method or "", None) if card else None
-                if callable(method):
-                    try:
-                        method(self, ixn.pos, user_id)
-                    except TypeError:
-                        method(self, user_id, ixn.temp)
-
-            else:
-                return "error", f"Unknown step kind: {step.kind}"
-
+            err = handler(self, ixn, step, payload)
         except Exception as e:
             return "error", str(e)
+        if err:
+            return "error", err
 
-        print(f"[STEP_IN] {time.time():.6f} before advance cursor={ixn.cursor}")
         ixn.advance()
-        print(f"[STEP_IN] {time.time():.6f} after advance cursor={ixn.cursor}")
         status, arg = self._advance_auto_steps()
-        print(
-            f"[STEP_IN] {time.time():.6f} _advance_auto_steps -> status={status} cursor_now={self.interaction.cursor if self.interaction else 'N/A'}")
+        slog.debug("step_advanced", status=status,
+                   cursor=self.interaction.cursor if self.interaction else None)
         if status == "awaiting":
             return "awaiting", "Next input needed"
         if status == "complete":
-            print(f"[STEP_IN] {time.time():.6f} finalize (complete after input)")
             self._finalize_sorcery()
-            print(f"[STEP_IN] {time.time():.6f} finalized ixn_exists={bool(self.interaction)}")
             return "complete", "Sorcery resolved"
         return "error", (arg or "Sorcery failed")
 
+    # --- prompt steps: handler(game, ixn, step, payload) -> error message or None ---
+
+    def _input_discard_from_hand(self, ixn, step, payload):
+        idx = int(payload.get("hand_index"))
+        hand = self.hands[ixn.owner]
+        if not (0 <= idx < len(hand)):
+            return "Invalid hand index"
+        if idx == ixn.slot_index:
+            return "Can't discard the resolving sorcery"
+        card = hand.pop(idx)
+        if idx < ixn.slot_index:
+            ixn.slot_index -= 1  # keep pointing at the resolving sorcery
+        self.graveyard[ixn.owner].append(card)
+        if step.as_key:
+            ixn.temp[step.as_key] = card.id
+
+    def _input_select_board_target(self, ixn, step, payload):
+        pos = payload.get("pos")
+        if not (isinstance(pos, list) and len(pos) == 2):
+            return "Invalid target"
+        x, y = pos
+        if not (0 <= x < 6 and 0 <= y < 6):
+            return "Out of board"
+        target = self.board[x][y]
+        filt = step.filter or {}
+        if filt.get("require_enemy") and (not target or target.owner == ixn.owner):
+            return "Must select enemy monster"
+        if filt.get("require_monster") and (not target or target.type != "monster"):
+            return "Must select a monster"
+        if step.as_key:
+            ixn.temp[step.as_key] = (x, y)
+
+    def _input_select_land_target(self, ixn, step, payload):
+        pos = payload.get("pos")
+        if not (isinstance(pos, list) and len(pos) == 2):
+            return "Invalid target"
+        x, y = pos
+        if not (0 <= x < len(self.land_board) and 0 <= y < len(self.land_board)):
+            return "Out of board"
+        land = self.land_board[x][y]
+        if land is None:
+            return "Must select a land"
+        if step.owner == "self" and land.owner != ixn.owner:
+            return "Must select your own land"
+        if step.owner == "opponent" and land.owner == ixn.owner:
+            return "Must select an enemy land"
+        if step.as_key:
+            ixn.temp[step.as_key] = (x, y)
+
+    def _input_select_graveyard_card(self, ixn, step, payload):
+        cid = payload.get("card_id")
+        user_id = ixn.owner
+        pool = self.graveyard[user_id] if (step.owner in (None, "self")) else self.graveyard[
+            '2' if user_id == '1' else '1']
+        if not any(c.id == cid for c in pool):
+            return "Card not in graveyard"
+        if step.as_key:
+            ixn.temp[step.as_key] = cid
+
+    def _input_select_deck_card(self, ixn, step, payload):
+        cid = payload.get("card_id")
+        user_id = ixn.owner
+        pool = self.decks[user_id] if (step.owner in (None, "self")) else self.decks[
+            '2' if user_id == '1' else '1']
+        match = pool.get(cid)
+        if not match:
+            return "Card not in deck"
+        filt = step.filter or {}
+        if filt.get("type") and getattr(match, "type", None) != filt["type"]:
+            return "Invalid type"
+        if "max_attack" in filt and getattr(match, "attack", 0) > filt["max_attack"]:
+            return "Attack too high"
+        if "role" in filt and getattr(match, "role", None) != filt["role"]:
+            return "Wrong role"
+        if step.as_key:
+            ixn.temp[step.as_key] = cid
+
+    _PROMPT_HANDLERS = {
+        "discard_from_hand": _input_discard_from_hand,
+        "select_board_target": _input_select_board_target,
+        "select_land_target": _input_select_land_target,
+        "select_graveyard_card": _input_select_graveyard_card,
+        "select_deck_card": _input_select_deck_card,
+    }
+
+    # --- auto steps: run(game, ixn, step) -> error message or None ---
+
+    def _auto_pay_cost(self, ixn, step):
+        mana_needed = int((step.cost or {}).get("mana", 0))
+        if mana_needed:
+            if self.mana[ixn.owner] < mana_needed:
+                return "Not enough mana"
+            self.mana[ixn.owner] -= mana_needed
+        slog.debug("pay_cost", cost=step.cost, mana_after=self.mana[ixn.owner])
+
+    def _auto_apply_effect(self, ixn, step):
+        slog.debug("apply_effect", method=step.apply_method, slot=ixn.slot_index)
+        hand = self.hands[ixn.owner]
+        if 0 <= ixn.slot_index < len(hand):
+            card = hand[ixn.slot_index]
+        else:
+            card = next((c for c in hand if c.card_id == ixn.card_id), None)
+        if card is None:
+            return
+        binding = _apply_binding(type(card), step.apply_method)
+        if binding is None:
+            return
+        fn, takes_temp = binding
+        if takes_temp:
+            fn(card, self, ixn.owner, ixn.temp)
+        else:
+            fn(card, self, ixn.pos, ixn.owner)
+        # effects may change card.owner, which the grids can't see
+        self._sync_boards()
+
+    _AUTO_STEPS = {
+        "pay_cost": _auto_pay_cost,
+        "apply_effect": _auto_apply_effect,
+    }
+
     def _advance_auto_steps(self):
         """
         Run auto steps until we reach a prompt or finish.
         Returns ("awaiting" | "complete" | "error", step_or_msg_or_none)
         """
         ixn = self.interaction
-        print(f"[AUTO] {time.time():.6f} enter ixn={bool(ixn)}")
         if not ixn:
-            print(f"[AUTO] {time.time():.6f} -> complete(no ixn)")
             return "complete", None
 
+        auto = self._AUTO_STEPS
         while True:
             step = ixn.current_step()
-            print(f"[AUTO] {time.time():.6f} cursor={ixn.cursor} step={getattr(step, 'kind', None)}")
             if not step:
-                print(f"[AUTO] {time.time():.6f} -> complete(no step)")
                 return "complete", None
-
-            # ---- AUTO: pay_cost ----
-            if step.kind == "pay_cost":
-                print(f"[AUTO] {time.time():.6f} pay_cost cost={step.cost} mana_before={self.mana[ixn.owner]}")
-                cost = step.cost or {}
-                mana_needed = int(cost.get("mana", 0))
-                if mana_needed:
-                    if self.mana[ixn.owner] < mana_needed:
-                        # abort on failure
-                        self.interaction = None
-                        # (optional) pop stack visual
-                        if self.stack: self.stack.pop()
-                        return "error", "Not enough mana"
-                    self.mana[ixn.owner] -= mana_needed
-                print(f"[AUTO] {time.time():.6f} pay_cost done mana_after={self.mana[ixn.owner]}")
-                ixn.advance()
-                continue
-
-            # ---- AUTO: apply_effect ----
-            if step.kind == "apply_effect":
-                print(f"[AUTO] {time.time():.6f} apply_effect method={step.apply_method} slot_index={ixn.slot_index}")
-                hand = self.hands[ixn.owner]
-                if 0 <= ixn.slot_index < len(hand):
-                    card = hand[ixn.slot_index]
-                else:
-                    card = next((c for c in hand if c.card_id == ixn.card_id), None)
-
-                if card:
-                    fn = getattr(card, step.apply_method or "", None)
-                    if callable(fn):
-                        try:
-                            # most cards: (game, pos, user_id)
-                            fn(self, ixn.pos, ixn.owner)
-                        except TypeError:
-                            # optional new signature: (game, user_id, temp)
-                            fn(self, ixn.owner, ixn.temp)
-                print(f"[AUTO] {time.time():.6f} apply_effect done")
-                ixn.advance()
-                continue
-            print(f"[AUTO] {time.time():.6f} awaiting kind={step.kind}")
-            # ---- PROMPT step: stop and wait for FE input ----
-            return "awaiting", step
-
+            run = auto.get(step.kind)
+            if run is None:
+                # ---- PROMPT step: stop and wait for FE input ----
+                slog.debug("awaiting", cursor=ixn.cursor, kind=step.kind)
+                return "awaiting", step
+            err = run(self, ixn, step)
+            if err:
+                # abort on failure
+                self.interaction = None
+                if self.stack:
+                    self.stack.pop()
+                return "error", err
+            ixn.advance()
+
+    @journaled(_record_sorcery)
     def _finalize_sorcery(self):
-        print(f"[FINALIZE] {time.time():.6f} enter ixn_exists={bool(self.interaction)}")
         ixn = self.interaction
         if not ixn:
-            print(f"[FINALIZE] {time.time():.6f} nothing to do")
             return
         user_id = ixn.owner
         hand = self.hands[user_id]
-        print(
-            f"[FINALIZE] {time.time():.6f} slot_index={ixn.slot_index} card_id={ixn.card_id} free={ixn.free} mana_before={self.mana[user_id]} hand_len_before={len(hand)}")
         # defensive: slot may have shifted if user drew/removed—ensure bounds:
         if 0 <= ixn.slot_index < len(hand):
             card = hand.pop(ixn.slot_index)
@@ -615,10 +1006,12 @@ class ChessGame:
         if self.stack:
             self.stack.pop()
         # unlock
-        print(f"[FINALIZE] {time.time():.6f} done mana_after={self.mana[user_id]} hand_len_after={len(hand)}")
+        slog.debug("finalize", card=ixn.card_id, slot=ixn.slot_index, free=ixn.free,
+                   mana_after=self.mana[user_id], hand_len=len(hand))
         self.interaction = None
-        print(f"[FINALIZE] {time.time():.6f} cleared ixn -> {self.interaction}")
 
+    @journaled(_record_sorcery)
+    @logged('activate_sorcery')
     def activate_sorcery(self, slot_index, user_id, target_pos, reduce_mana=True):
         hand = self.hands[user_id]
         card = hand[slot_index]
@@ -631,9 +1024,33 @@ class ChessGame:
         self.sorcery_used_this_turn.add(user_id)
 
         card.affect_board(self, tuple(target_pos), user_id)
+        self._sync_boards()
 
         return True, f"{card.name} activated!"
 
+    def placement_heatmaps(self, user_id):
+        """
+        Needs status of every tile for every card `user_id` could place:
+        {'hand': [...], 'land_deck': [...]}, one entry per slot. Sorceries get a
+        6x6 grid and lands a land-board grid of 0/1/2 (blocked / paid / free, as
+        evaluate_creation_or_activation_needs); other hand cards get None.
+        """
+        maps = {}
+        grids = {}  # copies of a card share one grid
+
+        def grid(card, size):
+            key = (type(card), card.owner, size)
+            if key not in grids:
+                if card.owner not in maps:
+                    maps[card.owner] = NeedMap(self, card.owner)
+                grids[key] = maps[card.owner].grid(card, size)
+            return grids[key]
+
+        return {
+            'hand': [grid(c, len(self.board)) if c.type == 'sorcery' else None for c in self.hands[user_id]],
+            'land_deck': [grid(c, len(self.land_board)) for c in self.land_decks[user_id]],
+        }
+
     def game_can_place_land(self, slot_index, user_id, to_pos):
         if user_id != self.current_player:
             return False, "Not your turn", False
@@ -666,6 +1083,9 @@ class ChessGame:
         # Success — return third value indicating if it's free
         return True, "Card can be activated for free" if activation_status == 2 else "Card can be activated", activation_status == 2
 
+    @journaled(lambda g, slot_index, user_id, *a, **k: _record(
+        g, boards=True, zones=[('land_decks', user_id)], sets=('land_placed_this_turn',)))
+    @logged('place_land')
     def place_land(self, slot_index, user_id, to_pos, reduce_mana=True):
         x, y = to_pos
 
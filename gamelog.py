@@ -0,0 +1,171 @@
+# gamelog.py
+"""
+Leveled event log for the engine and the socket server.
+
+Each subsystem has a channel:
+
+    log = gamelog.channel('engine')
+    log.debug('summon', user=user_id, pos=to_pos)
+
+A call below the channel's level returns before building anything. Enabled
+calls queue a (time, subsystem, level, event, fields) record; a background
+thread formats and writes them, so the caller never touches the stream.
+Fields are formatted later on that thread: pass plain values, not containers
+that will change. Guard expensive fields with `if log.on(gamelog.DEBUG):`.
+
+Levels come from GAME_LOG, e.g. GAME_LOG="sorcery=debug,ws=info,*=warning",
+or from set_level() at runtime. Records go to stderr, or to GAME_LOG_FILE.
+"""
+import atexit
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR}
+_NAMES = {v: k.upper() for k, v in LEVELS.items()}
+
+SUBSYSTEMS = ('engine', 'sorcery', 'ws', 'cards', 'bot')
+
+
+def _parse(spec):
+    out = {}
+    for part in (spec or '').split(','):
+        name, _, level = part.strip().partition('=')
+        if not level:
+            # bare level applies to everything
+            name, level = '*', name
+        if level.lower() in LEVELS:
+            out[name.strip() or '*'] = LEVELS[level.lower()]
+    return out
+
+
+_config = _parse(os.environ.get('GAME_LOG', ''))
+_channels = {}
+
+
+class Channel:
+    __slots__ = ('name', 'level')
+
+    def __init__(self, name, level):
+        self.name = name
+        self.level = level
+
+    def on(self, level):
+        return level >= self.level
+
+    def debug(self, event, **fields):
+        if self.level <= DEBUG:
+            _queue.put((time.time(), self.name, DEBUG, event, fields))
+            _ensure_writer()
+
+    def info(self, event, **fields):
+        if self.level <= INFO:
+            _queue.put((time.time(), self.name, INFO, event, fields))
+            _ensure_writer()
+
+    def warning(self, event, **fields):
+        if self.level <= WARNING:
+            _queue.put((time.time(), self.name, WARNING, event, fields))
+            _ensure_writer()
+
+    def error(self, event, exc_info=False, **fields):
+        if self.level <= ERROR:
+            if exc_info:
+                # has to be captured on the raising thread
+                fields['traceback'] = traceback.format_exc()
+            _queue.put((time.time(), self.name, ERROR, event, fields))
+            _ensure_writer()
+
+
+def channel(name):
+    ch = _channels.get(name)
+    if ch is None:
+        ch = _channels[name] = Channel(name, _config.get(name, _config.get('*', WARNING)))
+    return ch
+
+
+def set_level(name, level):
+    """Set one subsystem's level ('*' for all); level is a name or a number."""
+    if isinstance(level, str):
+        level = LEVELS[level.lower()]
+    _config[name] = level
+    for ch in _channels.values():
+        if name == '*' or ch.name == name:
+            ch.level = level
+
+
+# --- background writer ---------------------------------------------------------
+
+_queue = queue.SimpleQueue()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _format(record):
+    ts, name, level, event, fields = record
+    tail = ''.join(f" {k}={v}" for k, v in fields.items() if k != 'traceback')
+    line = f"{ts:.6f} {_NAMES[level]:<7} [{name}] {event}{tail}\n"
+    if 'traceback' in fields:
+        line += fields['traceback']
+    return line
+
+
+def _run(stream):
+    while True:
+        record = _queue.get()
+        batch = []
+        # drain whatever queued up meanwhile: one write + flush per burst
+        while record is not None:
+            batch.append(_format(record))
+            try:
+                record = _queue.get_nowait()
+            except queue.Empty:
+                break
+        if batch:
+            stream.write(''.join(batch))
+            stream.flush()
+        if record is None:
+            return
+
+
+def _open_stream():
+    path = os.environ.get('GAME_LOG_FILE')
+    return open(path, 'a', buffering=1 << 16) if path else sys.stderr
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None:
+        return
+    with _writer_lock:
+        if _writer is None:
+            t = threading.Thread(target=_run, args=(_open_stream(),), name='gamelog', daemon=True)
+            t.start()
+            _writer = t
+
+
+def flush(timeout=2.0):
+    """Stop the writer after it drains the queue (runs at exit)."""
+    global _writer
+    t = _writer
+    if t is None:
+        return
+    _queue.put(None)
+    t.join(timeout)
+    _writer = None
+
+
+def _after_fork():
+    # the writer thread doesn't survive fork(); the child starts its own
+    global _queue, _writer, _writer_lock
+    _queue = queue.SimpleQueue()
+    _writer = None
+    _writer_lock = threading.Lock()
+
+
+atexit.register(flush)
+os.register_at_fork(after_in_child=_after_fork)
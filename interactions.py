@@ -1,6 +1,6 @@
 # interactions.py
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional, Tuple, Literal
+from typing import Any, Dict, Optional, Sequence, Tuple, Literal
 
 StepKind = Literal[
     "pay_cost",
@@ -12,8 +12,9 @@ StepKind = Literal[
     "apply_effect",
 ]
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class StepSpec:
+    # one step of a sorcery program; programs are shared per card class, so never mutate
     kind: StepKind
     owner: Optional[str] = None
     zone: Optional[str] = None
@@ -30,7 +31,7 @@ class PendingInteraction:
     card_id: str
     free: bool
     pos: Optional[Tuple[int, int]] = None
-    steps: List[StepSpec] = field(default_factory=list)
+    steps: Sequence[StepSpec] = field(default_factory=tuple)
     cursor: int = 0
     temp: Dict[str, Any] = field(default_factory=dict)
 
@@ -51,7 +51,8 @@ class DeckPile(db.Model):
 
     pile_type = db.Column(db.Enum(PileType), nullable=False)
 
-    deck = db.relationship("Deck", backref=db.backref("piles", lazy="dynamic", cascade="all, delete"))
+    # plain lists (not lazy="dynamic") so deck reads can eager-load piles and cards
+    deck = db.relationship("Deck", backref=db.backref("piles", lazy="select", cascade="all, delete"))
 
     __table_args__ = (
         db.UniqueConstraint("deck_id", "pile_type", name="uq_deck_pile_once_each"),
@@ -65,7 +66,9 @@ class DeckCard(db.Model):
     qty = db.Column(db.Integer, nullable=False, default=1)
     position = db.Column(db.Integer)  # optional explicit ordering
 
-    pile = db.relationship("DeckPile", backref=db.backref("cards", lazy="dynamic", cascade="all, delete"))
+    pile = db.relationship("DeckPile", backref=db.backref(
+        "cards", lazy="select", cascade="all, delete",
+        order_by=lambda: (DeckCard.position.asc().nulls_last(), DeckCard.card_id.asc())))
 
     __table_args__ = (
         db.UniqueConstraint("pile_id", "card_id", name="uq_one_row_per_card_in_pile"),
@@ -0,0 +1,1129 @@
+# protocol.py
+"""
+Game socket protocol, independent of the server it runs under.
+
+Holds the room state (games, lobbies, seat assignments, connected sockets),
+builds the state frames and handles every client message. A server only
+needs connection objects with send(str) and close(), both callable from any
+thread, and calls from its connection handlers:
+
+    open_connection(conn, game_id)
+    receive(conn, text)          # for every text frame
+    close_connection(conn)
+
+Messages are applied by the room's actor (see "room actors"), never by the
+caller.
+
+app.py serves it with flask_sock, aioserver.py with asyncio.
+"""
+import json
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+import bot
+import gamelog
+import roomstore
+from bitboard import tiles
+from game import ChessGame, validate_deck_payload
+from snapshot import SnapshotError
+
+WS_ID_COUNTER = count(1)  # 1,2,3,...
+
+log = gamelog.channel('ws')
+
+user_assignments = {}
+connected_users = {}
+games = {}
+
+rooms = {}  # game_id -> {"phase": "lobby"|"playing", "choices": {"1": None, "2": None}, "ready": {"1": False, "2": False}}
+
+def _room(game_id):
+    if game_id not in rooms:
+        rooms[game_id] = {
+            "phase": "lobby",
+            "choices": {'1': None, '2': None},   # stores uploaded payloads (or deck_ids)
+            "ready": {'1': False, '2': False},
+        }
+    return rooms[game_id]
+
+def _broadcast_lobby(game_id):
+    r = _room(game_id)
+    if r['phase'] != 'lobby':
+        return
+    game = games.get(game_id)
+    extra = {
+        'phase': r['phase'],
+        'choices': {k: bool(v) for k, v in r['choices'].items()},
+        'ready': r['ready'],
+        'usernames': user_assignments.get(game_id, {}),
+    }
+    _broadcast(game_id, 'lobby', game, extra)
+
+def _maybe_start_match(game_id, game):
+    r = _room(game_id)
+    if r["phase"] != "lobby":
+        return
+    if not (r["choices"]['1'] and r["choices"]['2']):
+        return
+    if not (r["ready"]['1'] and r["ready"]['2']):
+        return
+
+
+
+    ok1, msg1 = validate_deck_payload(r["choices"]['1'])
+    ok2, msg2 = validate_deck_payload(r["choices"]['2'])
+    if not ok1 or not ok2:
+        # notify failures to specific users if you want; for now, broadcast
+        _broadcast(game_id, "lobby_error", game, {
+                      "message": f"Deck invalid: P1={msg1}, P2={msg2}"
+                                   })
+        return
+
+    p1 = r["choices"]['1']["piles"]
+    p2 = r["choices"]['2']["piles"]
+    game.apply_decks_and_start(
+        p1.get("MAIN", []), p1.get("LAND", []),
+        p2.get("MAIN", []), p2.get("LAND", []),
+    )
+
+    r["phase"] = "playing"
+    # Send initial full state with type 'init' like you already do
+    _broadcast(game_id, 'init', game, {
+        'usernames': user_assignments.get(game_id, {}),
+        'message': 'Match started',
+        'phase': 'playing',   # <-- add
+    })
+    _bot_poke(game_id)
+
+
+# ---------- Helpers (no behavior change) ----------
+
+def _ser_board(game):
+    return [[p.to_dict() if p else None for p in row] for row in game.board]
+
+def _ser_land_board(game):
+    return [[p.to_dict() if p else None for p in row] for row in game.land_board]
+
+def _ser_hand(game, pid):
+    return [c.to_dict() for c in game.hands[pid]]
+
+def _ser_graveyard(game):
+    return {
+        '1': [c.to_dict() for c in game.graveyard['1']],
+        '2': [c.to_dict() for c in game.graveyard['2']],
+    }
+
+def _ser_land_decks(game):
+    return {
+        '1': [c.to_dict() for c in game.land_decks['1']],
+        '2': [c.to_dict() for c in game.land_decks['2']],
+    }
+
+def _deck_sizes(game):
+    return {
+        '1': len(game.decks['1']),
+        '2': len(game.decks['2']),
+    }
+
+def _actions_this_turn(game):
+    return {
+        '1': {
+            'summoned': '1' in game.summoned_this_turn,
+            'sorcery_used': '1' in game.sorcery_used_this_turn,
+            'land_placed': '1' in game.land_placed_this_turn,
+        },
+        '2': {
+            'summoned': '2' in game.summoned_this_turn,
+            'sorcery_used': '2' in game.sorcery_used_this_turn,
+            'land_placed': '2' in game.land_placed_this_turn,
+        },
+        # Optional: perspective-friendly flags
+        'current': {
+            'summoned': game.current_player in game.summoned_this_turn,
+            'sorcery_used': game.current_player in game.sorcery_used_this_turn,
+            'land_placed': game.current_player in game.land_placed_this_turn,
+        }
+    }
+
+def _base_state(game):
+    # Matches what you were sending everywhere
+    return {
+        'board': _ser_board(game),
+        'land_board': _ser_land_board(game),
+        'hand1': _ser_hand(game, '1'),
+        'hand2': _ser_hand(game, '2'),
+        'turn': game.current_player,
+        'mana': dict(game.mana),
+        'graveyard': _ser_graveyard(game),
+        'land_decks': _ser_land_decks(game),
+        'deck_sizes': _deck_sizes(game),
+        'center_tile_control': dict(game.center_tile_control),
+        'actions_this_turn': _actions_this_turn(game),
+        'stack': [dict(s) for s in game.stack],
+        'interaction': _ser_interaction(game.interaction, game),
+    }
+
+
+def _ser_step(step: 'StepSpec'):
+    if not step:
+        return None
+    return {
+        'kind': step.kind,
+        'owner': step.owner,
+        'zone': step.zone,
+        'filter': step.filter,
+        'as_key': step.as_key,
+        'cost': step.cost,
+    }
+
+def _step_suggestions(game, ixn, step):
+    """Return a list the FE can use to render/choose (or [] if none)."""
+    owner = ixn.owner
+    if step.kind == "select_board_target":
+        bb = game.bitboards
+        opponent = '2' if owner == '1' else '1'
+        require_enemy = step.filter and step.filter.get("require_enemy")
+        if step.owner == "self":
+            mask = 0 if require_enemy else bb.occupancy[owner]
+        elif step.owner == "opponent" or require_enemy:
+            mask = bb.occupancy[opponent]
+        else:
+            mask = bb.occupied
+        out = []
+        for x, y in tiles(mask):
+            c = game.board[x][y]
+            if step.filter and step.filter.get("require_monster") and getattr(c, "type", None) != "monster":
+                continue
+            out.append([x, y])
+        return out
+
+    if step.kind == "select_land_target":
+        bb = game.bitboards
+        opponent = '2' if owner == '1' else '1'
+        if step.owner == "self":
+            mask = bb.land_owner[owner]
+        elif step.owner == "opponent":
+            mask = bb.land_owner[opponent]
+        else:
+            mask = bb.lands
+        return [[x, y] for x, y in tiles(mask)]
+
+    if step.kind == "select_deck_card":
+        deck = game.decks[owner]
+        filt = step.filter or {}
+        def ok(card):
+            if filt.get("type") and getattr(card, "type", None) != filt["type"]:
+                return False
+            if "role" in filt and getattr(card, "role", None) != filt["role"]:
+                return False
+            if "max_attack" in filt and getattr(card, "attack", None) is not None and card.attack > int(filt["max_attack"]):
+                return False
+            if "min_attack" in filt and getattr(card, "attack", None) is not None and card.attack < int(filt["min_attack"]):
+                return False
+            return True
+        return [c.to_dict() for c in deck if ok(c)]
+
+    if step.kind == "discard_from_hand":
+        # FE can just let the active player click any card in hand.
+        # (Return indices if you prefer: list(range(len(game.hands[owner]))))
+        return []
+
+    if step.kind == "pay_cost":
+        return []
+
+    if step.kind == "apply_effect":
+        return []
+
+    return []
+
+def _ser_interaction(ixn, game=None):
+    if not ixn:
+        return None
+    step = ixn.current_step()
+    awaiting = _ser_step(step) if step else None
+    if awaiting and game is not None:
+        awaiting = {**awaiting, "suggestions": _step_suggestions(game, ixn, step)}
+    return {
+        'type': ixn.type,
+        'owner': ixn.owner,
+        'card_id': ixn.card_id,
+        'slot_index': ixn.slot_index,
+        'free': ixn.free,
+        'pos': ixn.pos,
+        'cursor': ixn.cursor,
+        'awaiting': awaiting
+    }
+
+
+
+
+# --- versioned state deltas ---------------------------------------------------
+# Every published state gets a version. Clients that identify with
+# {"deltas": true} receive only the changed paths since the previous version
+# ({"version", "base_version", "delta": [ops]}); on a version gap they send
+# {"type": "sync"} and get a full 'snapshot'. Other clients keep full frames.
+# Only broadcasts publish versions. A message to one socket carries the last
+# published version if the state still matches it; otherwise it carries the
+# full state without a version, which is no base for deltas (the client syncs
+# on its next delta).
+
+state_versions = {}  # game_id -> {"version": int, "state": last published _base_state}
+
+# message types that always carry the full state, even for delta clients
+FULL_STATE_TYPES = {'init', 'snapshot'}
+
+def _diff_state(old, new, path=(), out=None):
+    """
+    Ops that turn `old` into `new`:
+      {"op": "set", "path": [...], "value": v}
+      {"op": "del", "path": [...]}
+      {"op": "append", "path": [...], "values": [...]}   (list grew at the end, e.g. graveyards)
+    """
+    if out is None:
+        out = []
+    if type(old) is dict and type(new) is dict:
+        for k, v in new.items():
+            if k not in old:
+                out.append({'op': 'set', 'path': [*path, k], 'value': v})
+            elif old[k] != v:
+                _diff_state(old[k], v, (*path, k), out)
+        for k in old:
+            if k not in new:
+                out.append({'op': 'del', 'path': [*path, k]})
+    elif type(old) is list and type(new) is list:
+        n = len(old)
+        if len(new) == n:
+            for i in range(n):
+                if old[i] != new[i]:
+                    _diff_state(old[i], new[i], (*path, i), out)
+        elif len(new) > n and new[:n] == old:
+            out.append({'op': 'append', 'path': list(path), 'values': new[n:]})
+        else:
+            out.append({'op': 'set', 'path': list(path), 'value': new})
+    else:
+        out.append({'op': 'set', 'path': list(path), 'value': new})
+    return out
+
+def _publish_state(game_id, game):
+    """Diff against the last published state; bump the version if anything changed."""
+    state = _base_state(game)
+    entry = state_versions.get(game_id)
+    if entry is None:
+        state_versions[game_id] = {'version': 0, 'state': state}
+        return 0, 0, [], state
+    base_version = entry['version']
+    ops = _diff_state(entry['state'], state)
+    if ops:
+        entry['version'] = base_version + 1
+        entry['state'] = state
+    return entry['version'], base_version, ops, state
+
+def _peek_state(game_id, game):
+    """-> (version, state): the last published version if the state still matches it, else None."""
+    state = _base_state(game)
+    entry = state_versions.get(game_id)
+    if entry is None:
+        state_versions[game_id] = {'version': 0, 'state': state}
+        return 0, state
+    return (entry['version'] if entry['state'] == state else None), state
+
+def _state_frames(game_id, game, publish=True):
+    """
+    Publish the current state once and return frame_for(ws, msg_type, extra).
+    The shared state (full or delta) is encoded once per event, not per socket;
+    only the per-recipient extras are encoded per frame. publish=False leaves
+    the room's version alone (messages to a single socket).
+    """
+    if publish:
+        version, base_version, ops, state = _publish_state(game_id, game)
+    else:
+        version, state = _peek_state(game_id, game)
+        base_version, ops = version, []
+    full = None
+    heatmaps = None
+    legal_moves = None
+    delta = None if version is None else {
+        'version': json.dumps(version),
+        'base_version': json.dumps(base_version),
+        'delta': json.dumps(ops),
+    }
+
+    def frame_for(ws, msg_type, extra=None):
+        nonlocal full, heatmaps, legal_moves
+        if delta is not None and getattr(ws, '_deltas', False) and msg_type not in FULL_STATE_TYPES:
+            encoded = delta
+        else:
+            if full is None:
+                full = {k: json.dumps(v) for k, v in state.items()}
+                if delta is not None:
+                    full['version'] = delta['version']
+            encoded = full
+        if getattr(ws, '_heatmaps', False):
+            # opt-in: where the player to move can activate/place each card, computed once per event
+            if heatmaps is None:
+                heatmaps = json.dumps({'player': game.current_player,
+                                       **game.placement_heatmaps(game.current_player)})
+            encoded = {**encoded, 'heatmaps': heatmaps}
+        if getattr(ws, '_legal_moves', False):
+            # opt-in: the player to move's monster moves, generated once per event
+            if legal_moves is None:
+                legal_moves = json.dumps(game.legal_moves(game.current_player))
+            encoded = {**encoded, 'legal_moves': legal_moves}
+        return _frame(msg_type, encoded, extra)
+    return frame_for
+
+def _frame(msg_type, encoded_state, extra=None):
+    # same key order/precedence as {'type': ..., **state, **extra}
+    parts = {'type': json.dumps(msg_type)}
+    parts.update(encoded_state)
+    if extra:
+        for k, v in extra.items():
+            parts[k] = json.dumps(v)
+    return '{' + ', '.join(f'{json.dumps(k)}: {v}' for k, v in parts.items()) + '}'
+
+def _send(ws, msg_type, game, extra=None):
+    ws.send(_state_frames(ws._game_id, game, publish=False)(ws, msg_type, extra))
+
+def _fan_out(game_id, frames_for):
+    """frames_for(uid, ws) -> frame str. Drops sockets that fail to send."""
+    conns = connected_users.get(game_id, {})
+    dead = []
+    for uid, ws_conn in list(conns.items()):
+        try:
+            ws_conn.send(frames_for(uid, ws_conn))
+        except Exception:
+            dead.append(uid)
+    for uid in dead:
+        conns.pop(uid, None)
+
+def _broadcast(game_id, msg_type, game, extra=None):
+    # one encode for the whole room; sockets with the same opt-ins (deltas, heatmaps, legal_moves)
+    # share a frame
+    frame_for = _state_frames(game_id, game)
+    frames = {}
+    def frames_for(uid, ws_conn):
+        key = (getattr(ws_conn, '_deltas', False), getattr(ws_conn, '_heatmaps', False),
+               getattr(ws_conn, '_legal_moves', False))
+        if key not in frames:
+            frames[key] = frame_for(ws_conn, msg_type, extra)
+        return frames[key]
+    _fan_out(game_id, frames_for)
+
+
+def _broadcast_per_viewer(game_id, builder):
+    """builder(uid, game)->(msg_type, extra_dict) so you can vary 'type' per-recipient."""
+    game = games[game_id]
+    frame_for = _state_frames(game_id, game)
+    def frames_for(uid, ws_conn):
+        msg_type, extra = builder(uid, game)
+        return frame_for(ws_conn, msg_type, extra)
+    _fan_out(game_id, frames_for)
+
+
+# --- bot seats ------------------------------------------------------------------
+# A room can seat a bot (see 'add_bot'). When it's the bot's decision, the
+# room asks bot.think() (searched in a worker process, so the room never waits
+# on it); the answer comes back through the room's queue, is played through the
+# engine and broadcast like any other move, until the decision is a human's again.
+
+bots = {}  # game_id -> {"seat": '1'|'2', "difficulty": str, "busy": bool}
+
+def _bot_poke(game_id):
+    """Start the bot's search if it has the next decision. Runs on the room actor."""
+    b = bots.get(game_id)
+    game = games.get(game_id)
+    if b is None or game is None or _room(game_id)['phase'] != 'playing':
+        return
+    if b['busy'] or not bot.to_move(game, b['seat']):
+        return
+    b['busy'] = True
+    future = bot.think(game, b['seat'], b['difficulty'])
+    future.add_done_callback(lambda f: submit(game_id, _bot_play, game_id, f))
+
+def _bot_play(game_id, future):
+    b = bots[game_id]
+    game = games[game_id]
+    seat = b['seat']
+    b['busy'] = False
+    try:
+        result = future.result()
+    except Exception:
+        log.error("bot_exception", exc_info=True, game_id=game_id, seat=seat)
+        return
+    if not bot.to_move(game, seat):
+        return
+    action = result['action']
+    ok, info, game_over = bot.play(game, seat, action)
+    log.info("bot_action", game_id=game_id, seat=seat, action=action, ok=ok,
+             iterations=result['iterations'], value=result['value'])
+    if game_over:
+        def builder(uid, game_):
+            return 'game-over', {
+                'success': True,
+                'mana': game_.mana,
+                'info': info,
+                'moves_left': game_.max_moves_per_turn - game_.moves_this_turn,
+                'game_over': {'result': 'victory' if uid == seat else 'defeat'},
+                'usernames': user_assignments[game_id],
+            }
+        _room(game_id)['finished_at'] = time.monotonic()
+        _broadcast_per_viewer(game_id, builder)
+        return
+    if not ok and game.interaction is None:
+        # shouldn't happen (the search only plays legal actions); don't stall the match
+        bot.end_turn(game, seat)
+        info = f"Player {seat} ended their turn."
+    _broadcast(game_id, 'update', game, {
+        'success': ok,
+        'info': info,
+        'mana': game.mana,
+        'moves_left': game.max_moves_per_turn - game.moves_this_turn,
+        'usernames': user_assignments[game_id],
+    })
+    if ok:
+        _bot_poke(game_id)
+
+
+# --- room actors ----------------------------------------------------------------
+# Each room is owned by one actor: every message, connect/disconnect and bot
+# move for the room goes through its queue and runs in order, so a game and
+# its entries in the dicts above are only ever touched by one thread at a
+# time. An actor only occupies a pool thread while it has queued work; it
+# drains everything queued so far in one go.
+
+ROOM_WORKERS = int(os.environ.get('ROOM_WORKERS', 4))
+
+class RoomActor:
+    __slots__ = ('game_id', 'inbox', 'lock', 'running', 'retired')
+
+    def __init__(self, game_id):
+        self.game_id = game_id
+        self.inbox = deque()
+        self.lock = threading.Lock()
+        self.running = False
+        self.retired = False  # room no longer live; new commands go to a fresh actor
+
+    def submit(self, fn, *args):
+        with self.lock:
+            if not self.retired:
+                self.inbox.append((fn, args))
+                if self.running:
+                    return
+                self.running = True
+        if self.retired:
+            submit(self.game_id, fn, *args)
+        else:
+            _executor().submit(self._drain)
+
+    def _retire(self):
+        """Drop this actor from `actors` unless more commands were queued meanwhile."""
+        with _actors_lock, self.lock:
+            if self.inbox:
+                return False
+            self.retired = True
+            self.running = False
+            if actors.get(self.game_id) is self:
+                del actors[self.game_id]
+            return True
+
+    def _drain(self):
+        while True:
+            with self.lock:
+                batch = list(self.inbox)
+                self.inbox.clear()
+                if not batch and self.game_id in games:
+                    self.running = False
+                    return
+            if not batch:
+                # the room was evicted (or never opened): retire once nothing
+                # is left, so the next command starts a fresh actor
+                if self._retire():
+                    return
+                continue
+            for fn, args in batch:
+                try:
+                    fn(*args)
+                except Exception:
+                    log.error("actor_exception", exc_info=True, game_id=self.game_id, command=fn.__name__)
+
+
+actors = {}  # game_id -> RoomActor
+_actors_lock = threading.Lock()
+_pool = None
+
+def _executor():
+    global _pool
+    if _pool is None:
+        with _actors_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=ROOM_WORKERS, thread_name_prefix='room')
+    return _pool
+
+def submit(game_id, fn, *args):
+    """Queue fn(*args) on the room's actor. Safe from any thread."""
+    actor = actors.get(game_id)
+    if actor is None:
+        with _actors_lock:
+            actor = actors.get(game_id)
+            if actor is None:
+                actor = actors[game_id] = RoomActor(game_id)
+    actor.submit(fn, *args)
+
+
+# --- room lifecycle -------------------------------------------------------------
+# A background sweep evicts rooms nobody needs in memory:
+#   - finished rooms (game over), FINISHED_GRACE seconds after the end;
+#   - rooms with no one connected for IDLE_TIMEOUT seconds. These are spilled
+#     to roomstore first and reloaded when someone connects to them again.
+# Eviction itself runs on the room's actor, so it can't race a reconnect; the
+# actor retires once its queue is empty and the room is gone.
+# The sweep also has each live room measure its snapshot size for room_stats.
+
+IDLE_TIMEOUT = float(os.environ.get('ROOM_IDLE_TIMEOUT', 15 * 60))
+FINISHED_GRACE = float(os.environ.get('ROOM_FINISHED_GRACE', 2 * 60))
+SWEEP_INTERVAL = float(os.environ.get('ROOM_SWEEP_INTERVAL', 30))
+
+last_active = {}  # game_id -> time.monotonic() of the last client connect/message/close
+snapshot_sizes = {}  # game_id -> len(game.to_bytes()) as of the last sweep
+_sweeper = None
+
+def _ensure_sweeper():
+    global _sweeper
+    if _sweeper is not None:
+        return
+    with _actors_lock:
+        if _sweeper is None:
+            _sweeper = threading.Thread(target=_sweep_forever, name='room-sweeper', daemon=True)
+            _sweeper.start()
+
+def _sweep_forever():
+    while True:
+        time.sleep(SWEEP_INTERVAL)
+        try:
+            sweep()
+        except Exception:
+            log.error("sweep_exception", exc_info=True)
+
+def sweep(now=None):
+    """
+    Queue eviction for every finished or idle room and a size measurement for
+    the others. Returns how many evictions were queued.
+    """
+    now = time.monotonic() if now is None else now
+    queued = 0
+    for game_id in list(games):
+        finished_at = rooms.get(game_id, {}).get('finished_at')
+        if finished_at is not None and now - finished_at >= FINISHED_GRACE:
+            submit(game_id, _evict, game_id, False, now)
+            queued += 1
+        elif not connected_users.get(game_id) and now - last_active.get(game_id, now) >= IDLE_TIMEOUT:
+            submit(game_id, _evict, game_id, True, now)
+            queued += 1
+        else:
+            submit(game_id, _measure, game_id)
+    return queued
+
+def _measure(game_id):
+    game = games.get(game_id)
+    if game is not None:
+        snapshot_sizes[game_id] = len(game.to_bytes())
+
+def _evict(game_id, spill, now):
+    game = games.get(game_id)
+    if game is None:
+        return
+    if spill and (connected_users.get(game_id) or now - last_active.get(game_id, now) < IDLE_TIMEOUT):
+        return  # someone came back in the meantime
+    b = bots.get(game_id)
+    if b is not None and b['busy']:
+        return  # a search result is on its way; try again next sweep
+    if spill:
+        roomstore.put(game_id, game.to_bytes(), {
+            'room': rooms.get(game_id),
+            'users': user_assignments.get(game_id, {}),
+            'bot': b,
+        })
+    for ws in list(connected_users.get(game_id, {}).values()):
+        _hang_up(ws)  # still looking at a finished game
+    for d in (games, rooms, user_assignments, connected_users, state_versions, bots, last_active,
+              snapshot_sizes):
+        d.pop(game_id, None)
+    log.info("evict", game_id=game_id, spilled=spill)
+
+def _restore(game_id):
+    """Reload a spilled room into memory; -> its game, or None if it isn't stored."""
+    stored = roomstore.take(game_id)
+    if stored is None:
+        return None
+    snap, meta = stored
+    try:
+        game = ChessGame.from_bytes(snap)
+    except SnapshotError as e:
+        log.warning("restore_failed", game_id=game_id, error=str(e))
+        return None
+    if meta['room'] is not None:
+        rooms[game_id] = meta['room']
+    user_assignments[game_id] = meta['users']
+    if meta['bot'] is not None:
+        bots[game_id] = meta['bot']
+    log.info("restore", game_id=game_id)
+    return game
+
+def room_stats():
+    """
+    Live vs spilled rooms and their size, for the admin endpoint. Live sizes
+    are as of the last sweep (see _measure); games are only read on their own
+    actor.
+    """
+    live_bytes = sum(list(snapshot_sizes.values()))
+    spilled, spilled_bytes = roomstore.stats()
+    return {
+        'live': len(games),
+        'live_connections': sum(len(c) for c in list(connected_users.values())),
+        'live_bytes': live_bytes,  # as snapshots; the in-memory objects are larger
+        'spilled': spilled,
+        'spilled_bytes': spilled_bytes,
+    }
+
+
+# --- connections ----------------------------------------------------------------
+# What a server calls from its connection threads/coroutines. These only parse
+# and queue; the room actor does the rest, and closes the socket (ws.close())
+# when the protocol says so.
+
+def open_connection(ws, game_id):
+    ws._id = next(WS_ID_COUNTER)
+    ws._game_id = game_id
+    ws._user_id = None
+    ws._deltas = False
+    ws._heatmaps = False
+    ws._legal_moves = False
+    log.info("open", conn_id=ws._id, game_id=game_id)
+    _ensure_sweeper()
+    submit(game_id, _open, game_id)
+
+
+def receive(ws, message):
+    """Queue one text frame from `ws` for its room."""
+    log.debug("recv", conn_id=ws._id, raw=message[:200])
+    try:
+        data = json.loads(message)
+    except Exception:
+        # Not JSON? Ignore this frame and keep waiting.
+        submit(ws._game_id, _reply, ws, {'type': 'error', 'message': 'Expected JSON'})
+        return
+    submit(ws._game_id, _dispatch, ws, data)
+
+
+def close_connection(ws):
+    submit(ws._game_id, _close, ws)
+
+
+def _open(game_id):
+    last_active[game_id] = time.monotonic()
+    if game_id not in games:
+        games[game_id] = _restore(game_id) or ChessGame()
+        _bot_poke(game_id)
+
+    # Ensure we have a persistent assignment for this game.
+    if game_id not in user_assignments:
+        user_assignments[game_id] = {}
+
+
+def _close(ws):
+    game_id, user_id = ws._game_id, ws._user_id
+    if game_id not in games:
+        return  # evicted while this socket was open
+    last_active[game_id] = time.monotonic()
+    if user_id and connected_users.get(game_id, {}).get(user_id) is ws:
+        del connected_users[game_id][user_id]
+
+
+def _reply(ws, payload):
+    try:
+        ws.send(json.dumps(payload))
+    except Exception:
+        pass
+
+
+def _hang_up(ws):
+    try:
+        ws.close()
+    except Exception:
+        pass
+
+
+def _dispatch(ws, data):
+    if ws._game_id not in games:
+        _hang_up(ws)  # evicted while this socket was open
+        return
+    last_active[ws._game_id] = time.monotonic()
+    try:
+        keep_open = _handle(ws, data)
+    except Exception as e:
+        # Full Python traceback (with line numbers)
+        log.error("exception", exc_info=True, game_id=ws._game_id, user_id=ws._user_id,
+                  last_message=data)
+        # Optionally send to the client, so you see it in the browser console
+        _reply(ws, {
+            "type": "server-error",
+            "error": str(e),
+            "traceback": traceback.format_exc(),
+        })
+        keep_open = False
+    if not keep_open:
+        _hang_up(ws)
+
+
+def _handle(ws, data):
+    """Apply one client message. Returns False when the connection should close."""
+    game_id = ws._game_id
+    game = games[game_id]
+    user_id = ws._user_id
+
+    if not user_id:
+        # Ensure the connected_users map exists for this game.
+        if game_id not in connected_users:
+            connected_users[game_id] = {}
+        game_users = connected_users[game_id]
+
+        # Get the username from the client (the client generated it if none existed)
+        incoming_username = data.get('username')
+
+        if not incoming_username:
+            # Ignore and wait for a proper identify packet; do NOT close the socket.
+            try:
+                ws.send(json.dumps({'type': 'error', 'message': 'Username is required'}))
+            except Exception:
+                pass
+            return True
+        log.info("identify", conn_id=ws._id, username=incoming_username)
+
+        # Check if this username was already assigned a slot
+        if incoming_username in user_assignments[game_id]:
+            user_id = user_assignments[game_id][incoming_username]
+        else:
+            # Assign a new slot if available.
+            bot_seat = bots.get(game_id, {}).get('seat')
+            if '1' not in game_users and bot_seat != '1':
+                user_id = '1'
+            elif '2' not in game_users and bot_seat != '2':
+                user_id = '2'
+            else:
+                ws.send(json.dumps({'type': 'error', 'message': 'Game room is full'}))
+                return False
+            # Save this assignment so that it persists on reconnects.
+            user_assignments[game_id][incoming_username] = user_id
+
+        # Register this WebSocket connection.
+        connected_users[game_id][user_id] = ws
+        ws._user_id = user_id
+        # opt-in: versioned state deltas instead of full snapshots
+        ws._deltas = bool(data.get('deltas'))
+        # opt-in: placement heatmaps of the player to move in every frame
+        ws._heatmaps = bool(data.get('heatmaps'))
+        # opt-in: the player to move's legal monster moves in every frame
+        ws._legal_moves = bool(data.get('legal_moves'))
+
+        # Send initial board + hands (same fields as before)
+        _send(ws, 'init', game, {
+            'username': incoming_username,
+            'user_id': user_id,
+            'user_assignments': user_assignments[game_id],
+            'phase': _room(game_id)['phase'],  # 'lobby' on handshake
+        })
+        _broadcast_lobby(game_id)
+
+    elif data['type'] == 'sync':
+        # client detected a version gap (or wants to toggle deltas) -> full snapshot
+        if 'deltas' in data:
+            ws._deltas = bool(data['deltas'])
+        if 'heatmaps' in data:
+            ws._heatmaps = bool(data['heatmaps'])
+        if 'legal_moves' in data:
+            ws._legal_moves = bool(data['legal_moves'])
+        _send(ws, 'snapshot', game, {
+            'user_id': user_id,
+            'phase': _room(game_id)['phase'],
+            'usernames': user_assignments[game_id],
+        })
+
+    elif data['type'] == 'choose_deck':
+        # Client sends an exported deck JSON payload directly:
+        # { type:'choose_deck', deck: {version, name, piles:{MAIN, SIDE, LAND}} }
+        r = _room(game_id)
+        deck_payload = data.get('deck')
+        if not deck_payload:
+            _send(ws, 'lobby_error', games[game_id], {"message": "Missing deck payload"})
+            return True
+        r["choices"][user_id] = deck_payload
+        r["ready"][user_id] = False  # reset ready on new choice
+        _broadcast_lobby(game_id)
+
+    elif data['type'] == 'add_bot':
+        # { type:'add_bot', difficulty:'easy'|'normal'|'hard', deck?: payload } -> bot takes the free seat
+        r = _room(game_id)
+        seat = '2' if user_id == '1' else '1'
+        difficulty = data.get('difficulty', 'normal')
+        if r['phase'] != 'lobby' or game_id in bots or seat in user_assignments[game_id].values():
+            _send(ws, 'lobby_error', game, {"message": "No free seat for a bot"})
+            return True
+        if difficulty not in bot.DIFFICULTY:
+            _send(ws, 'lobby_error', game, {"message": f"Unknown difficulty {difficulty!r}"})
+            return True
+        bots[game_id] = {'seat': seat, 'difficulty': difficulty, 'busy': False}
+        user_assignments[game_id][f"bot ({difficulty})"] = seat
+        r["choices"][seat] = data.get('deck') or bot.default_deck()
+        r["ready"][seat] = True
+        _broadcast_lobby(game_id)
+        _maybe_start_match(game_id, game)
+
+    elif data['type'] == 'ready':
+        r = _room(game_id)
+        r["ready"][user_id] = True
+        _broadcast_lobby(game_id)
+        _maybe_start_match(game_id, game)
+
+
+    elif data['type'] == 'move':
+        if game._locked():
+            _send(ws, 'update', game, {'success': False, 'info': 'A sorcery is resolving'})
+            return True
+        from_pos = data['from']
+        to_pos = data['to']
+        success, info = game.move(from_pos, to_pos, user_id)
+
+        if success:
+            _broadcast(game_id, 'update', game, {
+                'success': success,
+                'info': info,
+                'from': from_pos,
+                'to': to_pos,
+                'user_id': user_id,
+                'moves_left': game.max_moves_per_turn - game.moves_this_turn,
+                'usernames': user_assignments[game_id],
+            })
+        else:
+            # Only notify the user who tried the move
+            _send(ws, 'update', game, {
+                'success': success,
+                'info': info,
+                'from': from_pos,
+                'to': to_pos,
+                'user_id': user_id,
+                'moves_left': game.max_moves_per_turn - game.moves_this_turn,
+                'usernames': user_assignments[game_id],
+            })
+
+    elif (data['type'] == 'end-turn') or (data['type'] == 'end-turn-with-discard'):
+        if game._locked():
+            _send(ws, 'update', game, {'success': False, 'info': 'A sorcery is resolving'})
+            return True
+        if data['type'] == 'end-turn-with-discard':
+            game.discard(data['slot'], user_id)
+
+        if len(game.hands[user_id]) > 5:
+            # Same as before: actor gets 'discard-to-end-turn', opponent gets 'opponent-discarding'
+            def builder(uid, game_):
+                msg_type = 'discard-to-end-turn' if uid == user_id else 'opponent-discarding'
+                extra = {
+                    'success': True,
+                    'mana': game_.mana,
+                    'info': "Discarding needed to end turn!",
+                    'moves_left': game_.max_moves_per_turn - game_.moves_this_turn,
+                    'usernames': user_assignments[game_id],
+                }
+                return msg_type, extra
+            _broadcast_per_viewer(game_id, builder)
+
+        # elif game.center_tile_control[user_id] >= 7:
+        #     # This player wins (same payload fields as before)
+        #     def builder(uid, game_):
+        #         extra = {
+        #             'success': True,
+        #             'mana': game_.mana,
+        #             'info': f"Player {user_id} has controlled the center for 6 turns!",
+        #             'moves_left': game_.max_moves_per_turn - game_.moves_this_turn,
+        #             'game_over': {
+        #                 'result': 'victory' if uid == user_id else 'defeat'
+        #             },
+        #             'usernames': user_assignments[game_id],
+        #         }
+        #         return 'game-over', extra
+        #     _broadcast_per_viewer(game_id, builder)
+
+        elif user_id == game.current_player:
+            game.toggle_turn()
+            _broadcast(game_id, 'update', game, {
+                'mana': game.mana,
+                'info': f"Player {user_id} ended their turn.",
+                'success': True,
+                'moves_left': game.max_moves_per_turn - game.moves_this_turn,
+                'usernames': user_assignments[game_id],
+            })
+            _bot_poke(game_id)
+
+    elif data['type'] == 'summon':
+        if game._locked():
+            _send(ws, 'update', game, {'success': False, 'info': 'A sorcery is resolving'})
+            return True
+        slot = data['slot']
+        to_pos = data['to']
+        success, info = game.summon_card(slot, to_pos, user_id)
+
+        if success:
+            _broadcast(game_id, 'update', game, {
+                'success': success,
+                'info': info,
+                'to': to_pos,
+                'mana': game.mana,
+                'center_tile_control': game.center_tile_control,
+                'usernames': user_assignments[game_id],
+            })
+        else:
+            # Only notify the player who attempted the summon
+            _send(connected_users[game_id][user_id], 'update', game, {
+                'success': success,
+                'info': info,
+                'to': to_pos,
+                'mana': game.mana,
+                'center_tile_control': game.center_tile_control,
+                'usernames': user_assignments[game_id],
+            })
+
+    elif data['type'] == 'direct-attack':
+        if game._locked():
+            _send(ws, 'update', game, {'success': False, 'info': 'A sorcery is resolving'})
+            return True
+        pos = data['pos']
+        success, info, game_over = game.direct_attack(pos, user_id)
+        x, y = pos
+        card = game.board[x][y]  # same as before
+
+        if game_over:
+            winner = user_id
+            def builder(uid, game_):
+                extra = {
+                    'success': True,
+                    'mana': game_.mana,
+                    'info': info,
+                    'moves_left': game_.max_moves_per_turn - game_.moves_this_turn,
+                    'game_over': {
+                        'result': 'victory' if uid == winner else 'defeat'
+                    },
+                    'usernames': user_assignments[game_id],
+                }
+                return 'game-over', extra
+            _room(game_id)['finished_at'] = time.monotonic()
+            _broadcast_per_viewer(game_id, builder)
+            return False
+        else:
+            _broadcast(game_id, 'update', game, {
+                'success': success,
+                'card': card.to_dict() if card else None,
+                'mana': game.mana,
+                'info': info,
+                'moves_left': game.max_moves_per_turn - game.moves_this_turn,
+                'usernames': user_assignments[game_id],
+            })
+
+    elif data['type'] == 'activate-sorcery':
+        log.debug("activate", conn_id=ws._id, user=user_id, slot=data.get('slot'), pos=data.get('pos'),
+                  ixn=game.interaction is not None)
+
+        if not user_id: return True
+        slot = data['slot']
+        pos = data.get('pos')
+        ok, info, is_free = game.game_can_activate_card(slot, user_id, pos)
+        if not ok:
+            _send(ws, 'update', game, {'success': False, 'info': info})
+            return True
+
+        ok2, info2 = game.begin_sorcery(slot, user_id, pos, free=is_free)
+        _broadcast(game_id, 'update', game, {
+            'success': ok2,
+            'info': info2,
+            'usernames': user_assignments[game_id],
+            'moves_left': game.max_moves_per_turn - game.moves_this_turn,
+        })
+
+    elif data['type'] == 'sorcery-step':
+        log.debug("sorcery_step", conn_id=ws._id, user=user_id, payload=data.get('payload'))
+        payload = data.get('payload') or {}
+        status, info = game.sorcery_step_input(user_id, payload)
+        ok = (status != "error")
+        _broadcast(game_id, 'update', game, {
+            'success': ok,
+            'info': info,
+            'usernames': user_assignments[game_id],
+            'moves_left': game.max_moves_per_turn - game.moves_this_turn,
+        })
+
+
+    elif data['type'] == 'place-land':
+        if game._locked():
+            _send(ws, 'update', game, {'success': False, 'info': 'A sorcery is resolving'})
+            return True
+        log.debug("place_land", conn_id=ws._id, user=user_id, slot=data.get('slot'), pos=data.get('pos'))
+        if not user_id:
+            return True  # or raise, or wait — don't access hands/cards yet
+
+        slot = data['slot']
+        pos = data.get('pos')  # optional
+
+        # Regular placement logic
+        success, info, is_free = game.game_can_place_land(slot, user_id, pos)
+        if not success:
+            # Only notify the user who tried the move
+            _send(ws, 'update', game, {
+                'success': success,
+                'mana': game.mana,
+                'info': info,
+                'pos': pos,
+                'moves_left': game.max_moves_per_turn - game.moves_this_turn,
+                'usernames': user_assignments[game_id],
+            })
+        else:
+            success, info = game.place_land(slot, user_id, pos, reduce_mana=not is_free)
+            _broadcast(game_id, 'update', game, {
+                'success': success,
+                'pos': pos,
+                'mana': game.mana,
+                'info': info,
+                'moves_left': game.max_moves_per_turn - game.moves_this_turn,
+                'usernames': user_assignments[game_id],
+            })
+
+    elif data['type'] == 'resolve-land':
+        if game._locked():
+            _send(ws, 'update', game, {'success': False, 'info': 'A sorcery is resolving'})
+            return True
+        slot = data['slot']
+        target = data['target']
+        card = game.hands[user_id][slot]
+
+        success, info, is_free = game.game_can_place_land(slot, user_id, target)
+
+        if hasattr(card, "resolve_with_input"):
+            # Try resolving first — don't remove card or spend mana yet
+            success, info = card.resolve_with_input(game, user_id, target)
+            if success:
+                game.hands[user_id].pop(slot)
+                game.graveyard[user_id].append(card)
+                if not is_free:
+                    game.mana[user_id] -= card.mana
+
+            _broadcast(game_id, 'update', game, {
+                'success': success,
+                'mana': game.mana,
+                'info': info,
+                'moves_left': game.max_moves_per_turn - game.moves_this_turn,
+                'usernames': user_assignments[game_id],
+            })
+
+    return True
@@ -0,0 +1,147 @@
+# registry.py
+"""
+Card registry: every playable card class indexed once.
+
+Built when `cards` is imported (see the bottom of cards.py). Holds
+  - canonical id -> class (same canon rules the deck validator always used)
+  - class -> static metadata (the catalog row: card_id, name, type, mana, ...)
+  - the prebuilt catalog served by /api/cards
+  - a stable class index (sorted by card_id) for compact encodings
+reload() rebuilds all of them together and notifies anything that derives its
+own per-class data (see on_reload).
+"""
+import re
+import sys
+import zlib
+
+from card_types import Monster, Land, Sorcery
+
+# keep only stable, catalog-y fields; strip instance id/owner
+WANTED_FIELDS = {
+    "card_id", "type", "name", "role", "mana", "image", "text", "attack", "defense",
+    "activation_needs", "creation_needs", "movement"
+}
+
+_BASES = (Monster, Land, Sorcery)  # catalog order
+
+_by_canon = {}      # canonical id -> class
+_meta = {}          # class -> catalog row
+_catalog = []       # catalog rows, grouped by base then class name
+_classes = []       # every registered class, sorted by card_id
+_index = {}         # class -> position in _classes
+_listeners = []
+_built = False
+_fingerprint = 0  # crc32 of the class index order
+
+
+def canon_id(s: str) -> str:
+    # accept "Abyssal Leviathan", "abyssal-leviathan", "abyssal_leviathan" as the same
+    return re.sub(r'[^a-z0-9]+', '_', (s or '').lower()).strip('_')
+
+
+def _all_subclasses(cls):
+    out = set()
+    for sub in cls.__subclasses__():
+        out.add(sub)
+        out |= _all_subclasses(sub)
+    return out
+
+
+def _is_current(cls):
+    # skip classes shadowed by a later definition with the same name (or a re-import)
+    module = sys.modules.get(cls.__module__)
+    return module is not None and getattr(module, cls.__name__, None) is cls
+
+
+def reload():
+    """Rebuild every index from the card classes currently defined."""
+    global _built, _fingerprint
+    by_canon, meta, catalog = {}, {}, []
+    for base in _BASES:
+        for cls in sorted(_all_subclasses(base), key=lambda c: c.__name__):
+            if not _is_current(cls):
+                continue
+            try:
+                inst = cls(owner='1')
+            except TypeError:
+                # if some exotic ctors exist, skip or handle specially
+                continue
+            d = inst.to_dict()
+            d.pop("id", None)     # per-instance id
+            d.pop("owner", None)  # not needed for catalog
+            row = {k: v for k, v in d.items() if k in WANTED_FIELDS}
+            cid = row.get('card_id') or cls.__name__
+            row['card_id'] = cid
+            by_canon[canon_id(cid)] = cls
+            meta[cls] = row
+            catalog.append(row)
+
+    _by_canon.clear()
+    _by_canon.update(by_canon)
+    _meta.clear()
+    _meta.update(meta)
+    _catalog[:] = catalog
+    _classes[:] = sorted(meta, key=lambda c: meta[c]['card_id'])
+    _index.clear()
+    _index.update({cls: i for i, cls in enumerate(_classes)})
+    _fingerprint = zlib.crc32(','.join(meta[c]['card_id'] for c in _classes).encode())
+    _built = True
+    for fn in _listeners:
+        fn()
+
+
+def on_reload(fn):
+    """Register fn() to run after every reload (for caches derived from card classes)."""
+    _listeners.append(fn)
+    return fn
+
+
+def _ensure():
+    if not _built:
+        import cards  # noqa: F401  (builds the registry on import)
+        if not _built:
+            reload()
+
+
+def lookup(card_id):
+    """Class for any spelling of a card id, or None."""
+    _ensure()
+    return _by_canon.get(canon_id(card_id))
+
+
+def canonical_ids():
+    """canonical id -> card_id as cards declare it."""
+    _ensure()
+    return {k: _meta[cls]['card_id'] for k, cls in _by_canon.items()}
+
+
+def metadata(cls):
+    _ensure()
+    return _meta.get(cls)
+
+
+def catalog():
+    _ensure()
+    return _catalog
+
+
+def card_classes():
+    """Every registered class in stable index order."""
+    _ensure()
+    return list(_classes)
+
+
+def class_index(cls):
+    _ensure()
+    return _index[cls]
+
+
+def class_at(i):
+    _ensure()
+    return _classes[i]
+
+
+def fingerprint():
+    """Changes whenever the class index would (cards added, removed or renamed)."""
+    _ensure()
+    return _fingerprint
@@ -0,0 +1,72 @@
+# roomstore.py
+"""
+On-disk store for rooms evicted from memory while idle (see protocol.py,
+"room lifecycle").
+
+One SQLite row per spilled room: the game snapshot (ChessGame.to_bytes)
+plus a small JSON document with the lobby, seat assignments and bot seat.
+A row is taken (read and deleted) when someone reconnects to the room.
+
+The database lives at instance/rooms.db, or ROOM_STORE.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+PATH = os.environ.get('ROOM_STORE') or os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                    'instance', 'rooms.db')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS rooms (
+    game_id    TEXT PRIMARY KEY,
+    snapshot   BLOB NOT NULL,
+    meta       TEXT NOT NULL,
+    spilled_at REAL NOT NULL
+)'''
+
+_conn = None
+_lock = threading.Lock()  # one connection, shared by the room actors' threads
+
+
+def _db():
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(PATH), exist_ok=True)
+        conn = sqlite3.connect(PATH, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(_SCHEMA)
+        _conn = conn
+    return _conn
+
+
+def put(game_id, snapshot: bytes, meta: dict):
+    doc = json.dumps(meta, separators=(',', ':'))
+    with _lock:
+        _db().execute('INSERT OR REPLACE INTO rooms VALUES (?, ?, ?, ?)',
+                      (game_id, snapshot, doc, time.time()))
+
+
+def take(game_id):
+    """-> (snapshot, meta) and forget the room, or None if it isn't stored."""
+    with _lock:
+        db = _db()
+        row = db.execute('SELECT snapshot, meta FROM rooms WHERE game_id = ?', (game_id,)).fetchone()
+        if row is None:
+            return None
+        db.execute('DELETE FROM rooms WHERE game_id = ?', (game_id,))
+    return bytes(row[0]), json.loads(row[1])
+
+
+def delete(game_id):
+    with _lock:
+        _db().execute('DELETE FROM rooms WHERE game_id = ?', (game_id,))
+
+
+def stats():
+    """-> (rooms stored, bytes of snapshot + metadata)."""
+    with _lock:
+        n, size = _db().execute(
+            'SELECT COUNT(*), COALESCE(SUM(LENGTH(snapshot) + LENGTH(meta)), 0) FROM rooms').fetchone()
+    return n, size
@@ -0,0 +1,401 @@
+# simulate.py
+"""
+Headless self-play: run many complete matches between scripted/random policies
+straight on ChessGame (no Flask, no sockets), spread over a process pool.
+
+    python -m simulate --games 10000
+    python -m simulate --deck decks/red.json --deck decks/blue.json --policy greedy --out results.ndjson
+
+Decks are JSON files in the same shape `choose_deck` accepts
+({name, piles: {MAIN, LAND, SIDE}}), or a list of those. Without --deck, one
+deck per role is built from the card pool. Every pair of decks plays the same
+number of games, alternating seats. Per-game results go to --out as NDJSON,
+the aggregate win rates per deck are printed as JSON.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import cards  # registers every card class
+from bitboard import tiles
+from game import ChessGame, validate_deck_payload
+import registry
+
+MAX_HAND = 5               # same limit the socket handler enforces at end of turn
+MAX_ACTIONS_PER_TURN = 12  # policies end the turn after this many attempts
+
+
+# --- decks ----------------------------------------------------------------------
+
+def role_decks(copies=2):
+    """One deck per role: every monster/sorcery of that role in MAIN, its lands in LAND."""
+    by_role = defaultdict(lambda: {'MAIN': [], 'LAND': []})
+    for cls in registry.card_classes():
+        meta = registry.metadata(cls)
+        pile = 'LAND' if meta['type'] == 'land' else 'MAIN'
+        by_role[meta['role']][pile].append({'card_id': meta['card_id'], 'qty': copies})
+    return [{'name': role, 'piles': piles} for role, piles in sorted(by_role.items())]
+
+
+def load_decks(paths):
+    decks = []
+    for path in paths:
+        with open(path) as f:
+            data = json.load(f)
+        for i, deck in enumerate(data if isinstance(data, list) else [data]):
+            ok, msg = validate_deck_payload(deck)
+            if not ok:
+                raise SystemExit(f"{path}: {msg}")
+            deck.setdefault('name', f"{os.path.basename(path)}#{i}")
+            decks.append(deck)
+    return decks
+
+
+# --- action enumeration ---------------------------------------------------------
+
+def _opponent(uid):
+    return '2' if uid == '1' else '1'
+
+
+def _need_tiles(game, uid):
+    """
+    Tiles where an activation/creation need can possibly be met: needs are only
+    satisfied by the player's own monster or land on a neighbouring tile.
+    """
+    bb = game.bitboards
+    out = set()
+    for px, py in tiles(bb.occupancy[uid] | bb.land_owner[uid]):
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                x, y = px + dx, py + dy
+                if (dx or dy) and 0 <= x < 6 and 0 <= y < 6:
+                    out.add((x, y))
+    return sorted(out)
+
+
+def legal_actions(game, uid, tried_sorceries=()):
+    """Everything `uid` may try this turn, as (kind, args) tuples; ('end',) is always last."""
+    out = []
+    if game.can_move(uid):
+        back_row = 0 if uid == '1' else 5
+        for y in range(6):
+            card = game.board[back_row][y]
+            if card is not None and card.owner == uid and card.type == 'monster':
+                out.append(('direct_attack', [back_row, y]))
+        for frm, to in game.legal_moves(uid):
+            out.append(('move', frm, to))
+
+    hand = game.hands[uid]
+    if uid not in game.summoned_this_turn:
+        free = [pos for pos in game.get_valid_summon_positions(uid) if game.board[pos[0]][pos[1]] is None]
+        for slot, card in enumerate(hand):
+            if card.type == 'monster' and card.mana <= game.mana[uid]:
+                out.extend(('summon', slot, pos) for pos in free)
+
+    need_tiles = None
+    if uid not in game.sorcery_used_this_turn:
+        need_tiles = _need_tiles(game, uid)
+        seen = set()
+        for slot, card in enumerate(hand):
+            if card.type != 'sorcery' or card.id in tried_sorceries or card.mana > game.mana[uid]:
+                continue
+            if card.card_id in seen:
+                continue  # copies have the same placements
+            seen.add(card.card_id)
+            for x, y in (need_tiles if card.activation_needs else [(0, 0)]):
+                ok, _, free = game.game_can_activate_card(slot, uid, [x, y])
+                if ok:
+                    out.append(('sorcery', slot, [x, y], free))
+
+    if uid not in game.land_placed_this_turn:
+        if need_tiles is None:
+            need_tiles = _need_tiles(game, uid)
+        seen = set()
+        for slot, land in enumerate(game.land_decks[uid]):
+            if land.card_id in seen:
+                continue
+            seen.add(land.card_id)
+            for x, y in need_tiles:
+                if game.land_board[x][y] is None and game.board[x][y] is None:
+                    ok, _, free = game.game_can_place_land(slot, uid, [x, y])
+                    if ok:
+                        out.append(('land', slot, [x, y], free))
+
+    out.append(('end',))
+    return out
+
+
+def step_choices(game):
+    """Inputs the engine would accept for the pending sorcery step ([] = stuck)."""
+    ixn = game.interaction
+    step = ixn.current_step()
+    uid = ixn.owner
+    filt = step.filter or {}
+    kind = step.kind
+
+    if kind == 'discard_from_hand':
+        return [{'hand_index': i} for i in range(len(game.hands[uid])) if i != ixn.slot_index]
+
+    if kind == 'select_board_target':
+        out = []
+        for x in range(6):
+            for y in range(6):
+                c = game.board[x][y]
+                if filt.get('require_enemy') and (not c or c.owner == uid):
+                    continue
+                if filt.get('require_monster') and (not c or c.type != 'monster'):
+                    continue
+                if step.owner == 'self' and filt.get('require_monster') is False:
+                    # placement prompt: empty tile on our summon row
+                    if c is not None or [x, y] not in game.get_valid_summon_positions(uid):
+                        continue
+                elif step.owner == 'self' and (not c or c.owner != uid):
+                    continue
+                out.append({'pos': [x, y]})
+        return out
+
+    if kind == 'select_land_target':
+        out = []
+        for x, row in enumerate(game.land_board):
+            for y, land in enumerate(row):
+                if land is None:
+                    continue
+                if step.owner == 'self' and land.owner != uid:
+                    continue
+                if step.owner == 'opponent' and land.owner == uid:
+                    continue
+                out.append({'pos': [x, y]})
+        return out
+
+    if kind == 'select_graveyard_card':
+        pool = game.graveyard[uid if step.owner in (None, 'self') else _opponent(uid)]
+        return [{'card_id': c.id} for c in pool
+                if not filt.get('type') or c.type == filt['type']]
+
+    if kind == 'select_deck_card':
+        pool = game.decks[uid if step.owner in (None, 'self') else _opponent(uid)]
+        out = []
+        for c in pool:
+            if filt.get('type') and c.type != filt['type']:
+                continue
+            if 'max_attack' in filt and getattr(c, 'attack', 0) > filt['max_attack']:
+                continue
+            if 'role' in filt and getattr(c, 'role', None) != filt['role']:
+                continue
+            out.append({'card_id': c.id})
+        return out
+
+    return []
+
+
+# --- policies -------------------------------------------------------------------
+
+def random_policy(game, uid, actions, rng):
+    return rng.choice(actions)
+
+
+def greedy_policy(game, uid, actions, rng):
+    """Direct attacks, then winning captures, then summons/sorceries/lands, then advancing."""
+    def score(a):
+        kind = a[0]
+        if kind == 'direct_attack':
+            return 100
+        if kind == 'move':
+            (fx, fy), (tx, ty) = a[1], a[2]
+            target = game.board[tx][ty]
+            if target is not None:
+                return 80 if game.board[fx][fy].attack > target.defense else -10
+            forward = (fx - tx) if uid == '1' else (tx - fx)
+            return 10 + forward
+        if kind == 'summon':
+            return 60 + game.hands[uid][a[1]].mana
+        if kind == 'sorcery':
+            return 50 + (5 if a[3] else 0)
+        if kind == 'land':
+            return 40
+        return 0
+    best = max(score(a) for a in actions)
+    return rng.choice([a for a in actions if score(a) == best])
+
+
+POLICIES = {'random': random_policy, 'greedy': greedy_policy}
+
+
+# --- one match ------------------------------------------------------------------
+
+def _resolve_sorcery(game, rng, mark):
+    """Feed random valid inputs; roll back to `mark` if a prompt can't be satisfied."""
+    while game.interaction:
+        choices = step_choices(game)
+        status = 'error'
+        if choices:
+            status, _ = game.sorcery_step_input(game.interaction.owner, rng.choice(choices))
+        if status == 'error':
+            while len(game.journal) > mark:
+                game.unmake()
+            return False
+    return True
+
+
+def _take(game, uid, action, rng, tried):
+    kind = action[0]
+    if kind == 'direct_attack':
+        ok, _, over = game.direct_attack(action[1], uid)
+        return over
+    if kind == 'move':
+        game.move(action[1], action[2], uid)
+    elif kind == 'summon':
+        game.summon_card(action[1], action[2], uid)
+    elif kind == 'land':
+        game.place_land(action[1], uid, action[2], reduce_mana=not action[3])
+    elif kind == 'sorcery':
+        tried.add(game.hands[uid][action[1]].id)
+        mark = len(game.journal)
+        game.begin_sorcery(action[1], uid, action[2], free=action[3])
+        _resolve_sorcery(game, rng, mark)
+    return False
+
+
+def start_game(deck_a, deck_b, seed):
+    game = ChessGame(seed=seed)
+    game.apply_decks_and_start(
+        deck_a['piles'].get('MAIN', []), deck_a['piles'].get('LAND', []),
+        deck_b['piles'].get('MAIN', []), deck_b['piles'].get('LAND', []),
+    )
+    game.start_journal()  # only used to roll back sorceries that get stuck
+    return game
+
+
+def play_turn(game, policy, rng):
+    """Play the current player's turn with `policy` and end it. Returns True if they won."""
+    uid = game.current_player
+    tried = set()
+    for _ in range(MAX_ACTIONS_PER_TURN):
+        action = policy(game, uid, legal_actions(game, uid, tried), rng)
+        if action[0] == 'end':
+            break
+        if _take(game, uid, action, rng, tried):
+            return True
+    # discard down to the hand limit like 'end-turn-with-discard'
+    hand = game.hands[uid]
+    while len(hand) > MAX_HAND:
+        game.discard(rng.randrange(len(hand)), uid)
+    game.journal.clear()
+    game.toggle_turn()
+    return False
+
+
+def play_match(task):
+    """task -> per-game result dict. Runs in a worker process."""
+    index, deck_a, deck_b, policy_names, seed, max_turns = task
+    rng = random.Random(seed)
+    policies = {'1': POLICIES[policy_names[0]], '2': POLICIES[policy_names[1]]}
+
+    game = start_game(deck_a, deck_b, seed)
+    winner, reason, turns = None, 'turn_limit', 0
+    while turns < max_turns:
+        uid = game.current_player
+        if play_turn(game, policies[uid], rng):
+            winner, reason = uid, 'mana'
+            break
+        turns += 1
+
+    return {
+        'game': index,
+        'seed': seed,
+        'decks': {'1': deck_a['name'], '2': deck_b['name']},
+        'policies': {'1': policy_names[0], '2': policy_names[1]},
+        'winner': winner,
+        'winner_deck': {'1': deck_a['name'], '2': deck_b['name']}.get(winner),
+        'reason': reason,
+        'turns': turns,
+        'mana': dict(game.mana),
+    }
+
+
+# --- batch ----------------------------------------------------------------------
+
+def build_tasks(decks, games, policies, seed, max_turns):
+    pairs = list(combinations(decks, 2)) or [(decks[0], decks[0])]
+    tasks = []
+    for i in range(games):
+        a, b = pairs[(i // 2) % len(pairs)]
+        if i % 2:
+            a, b = b, a  # alternate seats
+        tasks.append((i, a, b, policies, seed + i, max_turns))
+    return tasks
+
+
+def summarize(results):
+    stats = defaultdict(lambda: {'games': 0, 'wins': 0, 'losses': 0, 'draws': 0})
+    for r in results:
+        for seat, name in r['decks'].items():
+            s = stats[name]
+            s['games'] += 1
+            if r['winner'] is None:
+                s['draws'] += 1
+            elif r['winner'] == seat:
+                s['wins'] += 1
+            else:
+                s['losses'] += 1
+    for s in stats.values():
+        s['win_rate'] = round(s['wins'] / s['games'], 4) if s['games'] else 0.0
+    return dict(sorted(stats.items()))
+
+
+def run(decks, games, policies=('random', 'random'), seed=0, max_turns=200, workers=None, out=None):
+    tasks = build_tasks(decks, games, tuple(policies), seed, max_turns)
+    results = []
+    started = time.time()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunk = max(1, len(tasks) // ((workers or os.cpu_count() or 1) * 8))
+        for r in pool.map(play_match, tasks, chunksize=chunk):
+            results.append(r)
+            if out:
+                out.write(json.dumps(r) + '\n')
+    elapsed = time.time() - started
+    return {
+        'games': len(results),
+        'seconds': round(elapsed, 2),
+        'games_per_minute': round(len(results) / elapsed * 60) if elapsed else None,
+        'decks': summarize(results),
+    }
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    p.add_argument('--deck', action='append', default=[], help='deck JSON file (repeatable)')
+    p.add_argument('--games', type=int, default=1000)
+    p.add_argument('--policy', default='random', help=f"policy for both seats, or 'p1,p2' ({', '.join(POLICIES)})")
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--max-turns', type=int, default=200)
+    p.add_argument('--workers', type=int, default=None, help='processes (default: all cores)')
+    p.add_argument('--out', help='per-game results as NDJSON')
+    args = p.parse_args(argv)
+
+    policies = args.policy.split(',')
+    if len(policies) == 1:
+        policies *= 2
+    for name in policies:
+        if name not in POLICIES:
+            p.error(f"unknown policy {name!r}")
+    decks = load_decks(args.deck) if args.deck else role_decks()
+
+    out = open(args.out, 'w') if args.out else None
+    try:
+        summary = run(decks, args.games, policies, args.seed, args.max_turns, args.workers, out)
+    finally:
+        if out:
+            out.close()
+    json.dump(summary, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
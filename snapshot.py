@@ -0,0 +1,240 @@
+# snapshot.py
+"""
+Compact binary snapshot of a ChessGame (ChessGame.to_bytes / from_bytes).
+
+Layout, little-endian:
+  header    magic 'CG', version, registry fingerprint, seed
+  counters  turn_index, moves_this_turn, max_moves_per_turn, turn flags,
+            mana x2, center_tile_control x2
+  shape     monster board and land board tile masks (bitboard layout), then
+            card counts of hands, decks, land decks, graveyards ('1', '2')
+  cards     one fixed 7-byte entry per card: registry class index, numeric
+            instance id (u32; u16 in version 1), owner. Board cards first
+            (row-major per mask), then the zones in the order above
+  stats     u16 count + (card ordinal, attack, defense) for monsters whose
+            stats differ from their class values
+  tail      u32 length + compact JSON of the pending interaction and the
+            stack; empty when nothing is resolving
+
+Snapshots only restore against the same card registry. The make/unmake
+journal and the action log are not part of a snapshot.
+"""
+import json
+import struct
+from dataclasses import asdict
+from functools import lru_cache
+from itertools import count
+
+import registry
+from bitboard import STRIDE, tiles
+from drawpile import DrawPile
+from interactions import PendingInteraction, StepSpec
+from zobrist import PLAYERS, TURN_FLAGS
+
+MAGIC = b'CG'
+VERSION = 2
+_ID_CODES = {1: 'H', 2: 'I'}  # version -> struct code of card instance ids (still read: 1)
+
+_ZONES = ('hands', 'decks', 'land_decks', 'graveyard')
+
+_HEADER = struct.Struct('<2sBIQ')
+_COUNTERS = struct.Struct('<BBBBiihh')
+_SHAPE = struct.Struct('<QQ' + 'H' * (len(_ZONES) * len(PLAYERS)))
+_LEN16 = struct.Struct('<H')
+_LEN32 = struct.Struct('<I')
+
+
+@lru_cache(maxsize=512)
+def _cards_struct(n, id_code):
+    return struct.Struct('<' + ('H' + id_code + 'B') * n)
+
+
+@lru_cache(maxsize=128)
+def _stats_struct(n):
+    return struct.Struct('<' + 'Hii' * n)
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+# class index -> (class, original attack, original defense); None stats for non-monsters
+_CLASS_TABLE = []
+
+@registry.on_reload
+def _reset_class_table():
+    _CLASS_TABLE.clear()
+
+def _class_table():
+    if not _CLASS_TABLE:
+        _CLASS_TABLE.extend((cls, getattr(cls, 'original_attack', None), getattr(cls, 'original_defense', None))
+                            for cls in registry.card_classes())
+    return _CLASS_TABLE
+
+
+# --- encode ----------------------------------------------------------------------
+
+def _tail(game):
+    ixn = game.interaction
+    if ixn is None and not game.stack:
+        return b''
+    doc = {'stack': game.stack}
+    if ixn is not None:
+        doc['ixn'] = {
+            'type': ixn.type, 'owner': ixn.owner, 'slot_index': ixn.slot_index,
+            'card_id': ixn.card_id, 'free': ixn.free, 'pos': ixn.pos,
+            'steps': [{k: v for k, v in asdict(s).items() if v is not None} for s in ixn.steps],
+            'cursor': ixn.cursor, 'temp': ixn.temp,
+        }
+    return json.dumps(doc, separators=(',', ':')).encode()
+
+
+def encode(game) -> bytes:
+    try:
+        return _encode(game)
+    except struct.error as e:  # a value outside its field, e.g. an instance id past u32
+        raise SnapshotError(f"Can't snapshot this game: {e}") from e
+
+
+def _encode(game):
+    cards = []
+    shape = []
+    for grid in (game.board, game.land_board):
+        mask = 0
+        for x, row in enumerate(grid):
+            for y, card in enumerate(row):
+                if card is not None:
+                    mask |= 1 << (x * STRIDE + y)
+                    cards.append(card)
+        shape.append(mask)
+    for zone in _ZONES:
+        piles = getattr(game, zone)
+        for pid in PLAYERS:
+            pile = piles[pid]
+            shape.append(len(pile))
+            cards.extend(pile)
+
+    index = registry.class_index
+    flat = []
+    stats = []
+    for i, card in enumerate(cards):
+        flat += (index(type(card)), int(card.id), card.owner == '2')
+        attack = getattr(card, 'attack', None)
+        if attack is not None and (attack != card.original_attack or card.defense != card.original_defense):
+            stats += (i, attack, card.defense)
+
+    flags = 0
+    for i, name in enumerate(TURN_FLAGS):
+        played = getattr(game, name)
+        for j, pid in enumerate(PLAYERS):
+            if pid in played:
+                flags |= 1 << (i * 2 + j)
+
+    out = bytearray(_HEADER.pack(MAGIC, VERSION, registry.fingerprint(), game.seed))
+    out += _COUNTERS.pack(game.turn_index, game.moves_this_turn, game.max_moves_per_turn, flags,
+                          game.mana['1'], game.mana['2'],
+                          game.center_tile_control['1'], game.center_tile_control['2'])
+    out += _SHAPE.pack(*shape)
+    out += _cards_struct(len(cards), _ID_CODES[VERSION]).pack(*flat)
+    out += _LEN16.pack(len(stats) // 3)
+    out += _stats_struct(len(stats) // 3).pack(*stats)
+    tail = _tail(game)
+    out += _LEN32.pack(len(tail))
+    out += tail
+    return bytes(out)
+
+
+# --- decode ----------------------------------------------------------------------
+
+def read_header(data: bytes):
+    """-> (seed, version, body) after checking magic, version and registry fingerprint."""
+    if len(data) < _HEADER.size:
+        raise SnapshotError("Snapshot too short")
+    magic, version, fp, seed = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise SnapshotError("Not a game snapshot")
+    if version not in _ID_CODES:
+        raise SnapshotError(f"Unsupported snapshot version {version}")
+    if fp != registry.fingerprint():
+        raise SnapshotError("Snapshot was taken with a different card set")
+    return seed, version, memoryview(data)[_HEADER.size:]
+
+
+def decode_into(game, body, version=VERSION):
+    """Fill a fresh ChessGame (built with the snapshot's seed) from the body read_header() returns."""
+    try:
+        return _decode_into(game, body, _ID_CODES[version])
+    except (struct.error, IndexError, KeyError, TypeError, ValueError, StopIteration) as e:
+        raise SnapshotError(f"Corrupt snapshot: {e}") from e
+
+
+def _decode_into(game, body, id_code):
+    pos = 0
+    (turn_index, moves, max_moves, flags, mana1, mana2,
+     center1, center2) = _COUNTERS.unpack_from(body, pos)
+    pos += _COUNTERS.size
+    shape = _SHAPE.unpack_from(body, pos)
+    pos += _SHAPE.size
+    board_mask, land_mask, counts = shape[0], shape[1], shape[2:]
+
+    n = board_mask.bit_count() + land_mask.bit_count() + sum(counts)
+    st = _cards_struct(n, id_code)
+    flat = st.unpack_from(body, pos)
+    pos += st.size
+    table = _class_table()
+    cards = []
+    append = cards.append
+    for index, cid, owner in zip(flat[0::3], flat[1::3], flat[2::3]):
+        cls, attack, defense = table[index]
+        card = cls.__new__(cls)
+        card.id = str(cid)
+        card.owner = '2' if owner else '1'
+        if attack is not None:
+            card.attack = attack
+            card.defense = defense
+        append(card)
+
+    n_stats, = _LEN16.unpack_from(body, pos)
+    pos += _LEN16.size
+    st = _stats_struct(n_stats)
+    stats = st.unpack_from(body, pos)
+    pos += st.size
+    for i in range(0, 3 * n_stats, 3):
+        card = cards[stats[i]]
+        card.attack, card.defense = stats[i + 1], stats[i + 2]
+
+    # stats are final before the grid writes key the position hash
+    it = iter(cards)
+    for grid, mask in ((game.board, board_mask), (game.land_board, land_mask)):
+        for x, y in tiles(mask):
+            grid[x][y] = next(it)
+    counts = iter(counts)
+    for zone in _ZONES:
+        piles = getattr(game, zone)
+        for pid in PLAYERS:
+            pile = [next(it) for _ in range(next(counts))]
+            piles[pid] = DrawPile(pile) if zone == 'decks' else pile
+    game._card_ids = count(max(flat[1::3], default=0) + 1)
+
+    game.turn_index, game.moves_this_turn, game.max_moves_per_turn = turn_index, moves, max_moves
+    for i, name in enumerate(TURN_FLAGS):
+        played = getattr(game, name)
+        played.clear()
+        played.update(pid for j, pid in enumerate(PLAYERS) if flags & (1 << (i * 2 + j)))
+    game.mana = {'1': mana1, '2': mana2}
+    game.center_tile_control = {'1': center1, '2': center2}
+
+    n_tail, = _LEN32.unpack_from(body, pos)
+    pos += _LEN32.size
+    doc = json.loads(bytes(body[pos:pos + n_tail])) if n_tail else {}
+    game.stack = doc.get('stack', [])
+    ixn = doc.get('ixn')
+    if ixn is not None:
+        ixn['steps'] = [StepSpec(**s) for s in ixn['steps']]
+        if ixn['pos'] is not None:
+            ixn['pos'] = tuple(ixn['pos'])
+        # selected tiles are stored as (x, y) tuples; JSON hands back lists
+        ixn['temp'] = {k: tuple(v) if isinstance(v, list) else v for k, v in ixn['temp'].items()}
+        ixn = PendingInteraction(**ixn)
+    game.interaction = ixn
+    return game
@@ -0,0 +1,46 @@
+import random
+
+from bitboard import BitBoards
+from simulate import _take, legal_actions, role_decks, start_game
+from zobrist import Zobrist
+
+
+def _assert_in_sync(game):
+    bitboards = BitBoards()
+    bitboards.sync(game.board, game.land_board)
+    assert game.bitboards.snapshot() == bitboards.snapshot()
+    zobrist = Zobrist()
+    zobrist.sync(game.board, game.land_board)
+    assert game.zobrist_hash == zobrist.position_hash(game)
+
+
+def _checked_turn(game, rng, kinds, max_actions=8):
+    """Random actions for the player to move, checking after each; -> True if the game ended."""
+    uid = game.current_player
+    tried = set()
+    for _ in range(max_actions):
+        action = rng.choice(legal_actions(game, uid, tried))
+        if action[0] == 'end':
+            break
+        kinds.add(action[0])
+        over = _take(game, uid, action, rng, tried)
+        _assert_in_sync(game)
+        if over:
+            return True
+    game.journal.clear()
+    game.toggle_turn()
+    _assert_in_sync(game)
+    return False
+
+
+def test_bitboards_and_zobrist_follow_every_action():
+    decks = role_decks()
+    kinds = set()
+    for seed in range(8):
+        game = start_game(decks[seed % len(decks)], decks[(seed + 1) % len(decks)], seed)
+        rng = random.Random(seed)
+        _assert_in_sync(game)
+        for _ in range(15):
+            if _checked_turn(game, rng, kinds):
+                break
+    assert {'move', 'summon', 'land', 'sorcery'} <= kinds
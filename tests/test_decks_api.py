@@ -0,0 +1,178 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('flask_sqlalchemy')
+pytest.importorskip('flask_sock')
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')  # in-memory; must be set before app is imported
+
+import app as app_module
+from app import app
+from models import db
+
+USER = {'X-Clerk-User-Id': 'user_test'}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setitem(app.config, 'ADMIN_TOKEN', 'secret')
+    with app.app_context():
+        db.create_all()
+        app_module._user_ids.clear()  # users.id values restart with every fresh schema
+        yield app.test_client()
+        db.session.remove()
+        db.drop_all()
+
+
+def new_deck(client, name='Deck'):
+    r = client.post('/api/decks', json={'name': name}, headers=USER)
+    assert r.status_code == 201
+    return r.get_json()['id']
+
+
+def piles(client, deck_id):
+    return client.get(f'/api/decks/{deck_id}', headers=USER).get_json()['piles']
+
+
+def replace(client, deck_id, body):
+    r = client.post(f'/api/decks/{deck_id}/cards', json=body, headers=USER)
+    assert r.status_code == 200, r.get_json()
+    return r.get_json()
+
+
+# --- replace_pile_cards ------------------------------------------------------
+
+def test_replace_writes_only_the_rows_that_differ(client):
+    deck_id = new_deck(client)
+    cards = [{'card_id': 'bonecrawler', 'qty': 3}, {'card_id': 'magistra', 'qty': 1}]
+    assert replace(client, deck_id, {'pile': 'MAIN', 'cards': cards}) == \
+        {'ok': True, 'inserted': 2, 'updated': 0, 'deleted': 0}
+
+    # same body again: nothing to write
+    assert replace(client, deck_id, {'pile': 'MAIN', 'cards': cards}) == \
+        {'ok': True, 'inserted': 0, 'updated': 0, 'deleted': 0}
+
+    cards = [{'card_id': 'bonecrawler', 'qty': 2}, {'card_id': 'rift_strider', 'qty': 1}]
+    assert replace(client, deck_id, {'pile': 'MAIN', 'cards': cards}) == \
+        {'ok': True, 'inserted': 1, 'updated': 1, 'deleted': 1}
+    assert piles(client, deck_id)['MAIN'] == [
+        {'card_id': 'bonecrawler', 'qty': 2, 'position': 0},
+        {'card_id': 'rift_strider', 'qty': 1, 'position': 1},
+    ]
+
+
+def test_replace_several_piles_at_once(client):
+    deck_id = new_deck(client)
+    body = {'piles': {
+        'MAIN': [{'card_id': 'bonecrawler', 'qty': 3}],
+        'LAND': [{'card_id': 'storm_nexus', 'qty': 1}, {'card_id': 'sacred_grove', 'qty': 2}],
+        'side': [{'card_id': 'magistra', 'qty': 1}],  # pile names are case-insensitive; SIDE is created
+    }}
+    assert replace(client, deck_id, body) == {'ok': True, 'inserted': 4, 'updated': 0, 'deleted': 0}
+
+    # emptying one pile leaves the others alone
+    assert replace(client, deck_id, {'piles': {'LAND': []}}) == \
+        {'ok': True, 'inserted': 0, 'updated': 0, 'deleted': 2}
+    got = piles(client, deck_id)
+    assert [c['card_id'] for c in got['MAIN']] == ['bonecrawler']
+    assert got['LAND'] == []
+    assert [c['card_id'] for c in got['SIDE']] == ['magistra']
+
+
+def test_replace_rejects_bad_piles_without_writing(client):
+    deck_id = new_deck(client)
+    r = client.post(f'/api/decks/{deck_id}/cards', headers=USER, json={'piles': {
+        'MAIN': [{'card_id': 'bonecrawler'}], 'GRAVE': []}})
+    assert r.status_code == 400
+    r = client.post(f'/api/decks/{deck_id}/cards', headers=USER, json={'pile': 'MAIN', 'cards': [
+        {'card_id': 'bonecrawler'}, {'card_id': 'bonecrawler', 'qty': 2}]})
+    assert r.status_code == 400
+    assert 'duplicate' in r.get_json()['error']
+    assert piles(client, deck_id)['MAIN'] == []
+
+
+# --- NDJSON export / import --------------------------------------------------
+
+def export_lines(client, query='', headers=USER):
+    r = client.get('/api/decks/export' + query, headers=headers)
+    assert r.status_code == 200
+    assert r.mimetype == 'application/x-ndjson'
+    return [json.loads(line) for line in r.get_data(as_text=True).splitlines()]
+
+
+def import_ndjson(client, lines, headers=USER):
+    body = '\n'.join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+    r = client.post('/api/decks/import', data=body, headers=headers, content_type='application/x-ndjson')
+    assert r.status_code == 200
+    return r.get_json()
+
+
+def test_export_import_round_trip(client):
+    deck_id = new_deck(client, 'Storm')
+    replace(client, deck_id, {'piles': {
+        'MAIN': [{'card_id': 'bonecrawler', 'qty': 3}, {'card_id': 'magistra', 'qty': 1}],
+        'LAND': [{'card_id': 'storm_nexus', 'qty': 2}],
+    }})
+    exported = export_lines(client)
+    assert len(exported) == 1
+    assert exported[0]['piles'] == {
+        'MAIN': [{'card_id': 'bonecrawler', 'qty': 3}, {'card_id': 'magistra', 'qty': 1}],
+        'LAND': [{'card_id': 'storm_nexus', 'qty': 2}],
+        'SIDE': [],
+    }
+
+    other = {'X-Clerk-User-Id': 'user_other'}
+    assert import_ndjson(client, exported, headers=other) == {'imported': 1, 'failed': 0, 'errors': []}
+    (copy,) = export_lines(client, headers=other)
+    assert copy['id'] != exported[0]['id']
+    assert {k: copy[k] for k in ('name', 'description', 'piles')} == \
+        {k: exported[0][k] for k in ('name', 'description', 'piles')}
+
+    # admin scope sees both users' decks; without the token it's refused
+    admin = {'X-Admin-Token': 'secret'}
+    assert len(export_lines(client, '?scope=all', headers=admin)) == 2
+    assert len(export_lines(client, '?users=user_other', headers=admin)) == 1
+    assert client.get('/api/decks/export?scope=all', headers=USER).status_code == 403
+
+
+def test_import_reports_errors_per_line(client):
+    good = {'name': 'Good', 'piles': {'MAIN': [{'card_id': 'bonecrawler', 'qty': 2}]}}
+    result = import_ndjson(client, [
+        good,                                                          # 1
+        '{not json',                                                   # 2
+        '',                                                            # 3: blank, skipped
+        {'name': '  ', 'piles': {}},                                   # 4
+        {'name': 'Bad', 'piles': {'MAIN': [{'card_id': 'no_such_card'}]}},  # 5
+        {'name': 'Bad', 'piles': {'MAIN': [{'card_id': 'bonecrawler', 'qty': '2'}]}},  # 6
+        {'name': 'Also good', 'piles': {'LAND': [{'card_id': 'storm_nexus'}]}},  # 7
+    ])
+    assert result['imported'] == 2
+    assert result['failed'] == 4
+    assert [(e['line'], e['error']) for e in result['errors']] == [
+        (2, 'invalid JSON'),
+        (4, 'name required'),
+        (5, 'Unknown card ids: no_such_card'),
+        (6, 'qty must be an integer'),
+    ]
+    assert sorted(d['name'] for d in export_lines(client)) == ['Also good', 'Good']
+
+
+def test_import_failed_batch_fails_each_of_its_lines(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'IMPORT_BATCH', 2)
+    real_insert = app_module._insert_decks
+
+    def insert_decks(user_id, payloads):
+        if any(p['name'] == 'boom' for p in payloads):
+            raise RuntimeError('boom')
+        real_insert(user_id, payloads)
+
+    monkeypatch.setattr(app_module, '_insert_decks', insert_decks)
+    deck = lambda name: {'name': name, 'piles': {'MAIN': [{'card_id': 'bonecrawler'}]}}
+    result = import_ndjson(client, [deck('a'), deck('b'), deck('boom'), deck('c'), deck('d')])
+    assert result['imported'] == 3
+    assert [(e['line'], e['error']) for e in result['errors']] == \
+        [(3, 'batch failed: boom'), (4, 'batch failed: boom')]
+    assert sorted(d['name'] for d in export_lines(client)) == ['a', 'b', 'd']
@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+import registry
+from card_types import Land, Sorcery, evaluate_creation_or_activation_needs
+from game import ChessGame
+from simulate import greedy_policy, play_turn, role_decks, start_game
+
+
+@pytest.fixture(scope='module')
+def positions():
+    decks = role_decks()
+    out = []
+    for seed in range(3):
+        game = start_game(decks[seed % len(decks)], decks[(seed + 1) % len(decks)], seed)
+        rng = random.Random(seed)
+        for turn in range(6):
+            if play_turn(game, greedy_policy, rng):
+                break
+            out.append(game.to_bytes())
+    return out
+
+
+def test_heatmaps_match_the_per_tile_evaluator(positions):
+    for snap in positions:
+        game = ChessGame.from_bytes(snap)
+        for uid in ('1', '2'):
+            # one of every sorcery and land, on top of whatever the player holds
+            for cls in registry.card_classes():
+                if issubclass(cls, Sorcery):
+                    game.hands[uid].append(cls(uid))
+                elif issubclass(cls, Land):
+                    game.land_decks[uid].append(cls(uid))
+            maps = game.placement_heatmaps(uid)
+            for card, grid in zip(game.hands[uid], maps['hand']):
+                if card.type != 'sorcery':
+                    assert grid is None
+                    continue
+                assert grid == [[evaluate_creation_or_activation_needs(card, game, x, y)
+                                 for y in range(len(game.board))] for x in range(len(game.board))]
+            for card, grid in zip(game.land_decks[uid], maps['land_deck']):
+                assert grid == [[evaluate_creation_or_activation_needs(card, game, x, y)
+                                 for y in range(len(game.land_board))] for x in range(len(game.land_board))]
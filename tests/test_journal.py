@@ -0,0 +1,26 @@
+import random
+
+import pytest
+
+from simulate import _take, legal_actions, play_turn, random_policy, role_decks, start_game
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_unmake_restores_the_position_exactly(seed):
+    decks = role_decks()
+    game = start_game(decks[seed % len(decks)], decks[(seed + 1) % len(decks)], seed)
+    rng = random.Random(seed)
+    for turn in range(10):
+        uid = game.current_player
+        for action in legal_actions(game, uid):
+            if action[0] in ('end', 'direct_attack'):
+                continue
+            before, key = game.to_bytes(), game.zobrist_hash
+            mark = len(game.journal)
+            _take(game, uid, action, random.Random(turn), set())
+            while len(game.journal) > mark:
+                game.unmake()
+            assert game.to_bytes() == before, (turn, action)
+            assert game.zobrist_hash == key, (turn, action)
+        if play_turn(game, random_policy, rng):
+            break
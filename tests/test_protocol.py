@@ -0,0 +1,132 @@
+import json
+
+import pytest
+
+import protocol
+from simulate import role_decks, start_game
+
+
+class FakeSocket:
+    def __init__(self, game_id, heatmaps=False, deltas=False, legal_moves=False):
+        self._game_id = game_id
+        self._deltas = deltas
+        self._heatmaps = heatmaps
+        self._legal_moves = legal_moves
+        self.frames = []
+
+    def send(self, text):
+        self.frames.append(json.loads(text))
+
+
+@pytest.mark.parametrize('opted_in_first', [True, False])
+def test_broadcast_heatmaps_follow_each_sockets_opt_in(opted_in_first):
+    game_id = f'heatmaps-{opted_in_first}'
+    decks = role_decks()
+    protocol.games[game_id] = start_game(decks[0], decks[1], 1)
+    opted_in = FakeSocket(game_id, heatmaps=True)
+    plain = FakeSocket(game_id, heatmaps=False)
+    seats = [('1', opted_in), ('2', plain)] if opted_in_first else [('1', plain), ('2', opted_in)]
+    protocol.connected_users[game_id] = dict(seats)
+    try:
+        protocol._broadcast(game_id, 'update', protocol.games[game_id], {'info': 'x'})
+    finally:
+        for d in (protocol.games, protocol.connected_users, protocol.state_versions):
+            d.pop(game_id, None)
+
+    assert 'heatmaps' in opted_in.frames[-1]
+    assert 'heatmaps' not in plain.frames[-1]
+    assert opted_in.frames[-1]['board'] == plain.frames[-1]['board']
+
+
+def test_legal_moves_only_go_to_sockets_that_ask():
+    game_id = 'legal-moves'
+    decks = role_decks()
+    game = protocol.games[game_id] = start_game(decks[0], decks[1], 1)
+    asks, plain = FakeSocket(game_id, legal_moves=True), FakeSocket(game_id)
+    protocol.connected_users[game_id] = {'1': asks, '2': plain}
+    try:
+        protocol._broadcast(game_id, 'update', game, {})
+    finally:
+        for d in (protocol.games, protocol.connected_users, protocol.state_versions):
+            d.pop(game_id, None)
+
+    assert asks.frames[-1]['legal_moves'] == [list(map(list, m)) for m in game.legal_moves(game.current_player)]
+    assert 'legal_moves' not in plain.frames[-1]
+
+
+def test_send_to_one_socket_does_not_advance_the_shared_version():
+    game_id = 'versions'
+    decks = role_decks()
+    game = protocol.games[game_id] = start_game(decks[0], decks[1], 1)
+    a, b = FakeSocket(game_id, deltas=True), FakeSocket(game_id, deltas=True)
+    protocol.connected_users[game_id] = {'1': a, '2': b}
+    try:
+        protocol._broadcast(game_id, 'update', game, {})
+        version = a.frames[-1]['version']
+
+        protocol._send(a, 'update', game, {'success': False})  # nothing changed
+        assert a.frames[-1]['version'] == a.frames[-1]['base_version'] == version
+        assert a.frames[-1]['delta'] == []
+
+        game.mana['1'] += 1
+        protocol._send(a, 'update', game, {'success': False})  # changed, not yet broadcast
+        assert 'version' not in a.frames[-1]
+        assert a.frames[-1]['mana']['1'] == game.mana['1']
+        assert protocol.state_versions[game_id]['version'] == version
+
+        protocol._broadcast(game_id, 'update', game, {})
+        assert b.frames[-1]['base_version'] == version
+        assert b.frames[-1]['version'] == version + 1
+    finally:
+        for d in (protocol.games, protocol.connected_users, protocol.state_versions):
+            d.pop(game_id, None)
+
+
+def _run_on_actor(game_id, *commands):
+    """Run commands as one batch on the room's actor, on this thread."""
+    actor = protocol.actors[game_id] = protocol.RoomActor(game_id)
+    actor.inbox.extend(commands)
+    actor.running = True
+    actor._drain()
+    return actor
+
+
+@pytest.fixture
+def room(monkeypatch):
+    monkeypatch.setattr(protocol.roomstore, 'take', lambda game_id: None)
+    game_id = 'room'
+    protocol.games[game_id] = protocol.ChessGame(seed=1)
+    yield game_id
+    for d in (protocol.games, protocol.rooms, protocol.user_assignments, protocol.connected_users,
+              protocol.state_versions, protocol.last_active, protocol.snapshot_sizes, protocol.actors):
+        d.pop(game_id, None)
+
+
+def test_evicted_room_retires_its_actor(room):
+    actor = _run_on_actor(room, (protocol._evict, (room, False, 0.0)))
+    assert actor.retired
+    assert room not in protocol.actors
+    assert room not in protocol.games
+
+
+def test_command_after_evict_in_the_same_batch_keeps_the_actor(room):
+    actor = _run_on_actor(room, (protocol._evict, (room, False, 0.0)), (protocol._open, (room,)))
+    assert not actor.retired
+    assert protocol.actors[room] is actor
+    assert room in protocol.games
+
+
+def test_sweep_measures_live_rooms_on_their_actor(room):
+    _run_on_actor(room, (protocol._measure, (room,)))
+    assert protocol.snapshot_sizes[room] == len(protocol.games[room].to_bytes())
+    assert protocol.room_stats()['live_bytes'] >= protocol.snapshot_sizes[room]
+
+
+def test_failing_measure_does_not_stall_the_room(room, monkeypatch):
+    def broken():
+        raise ValueError('encode failed')
+    monkeypatch.setattr(protocol.games[room], 'to_bytes', broken)
+    ran = []
+    actor = _run_on_actor(room, (protocol._measure, (room,)), (ran.append, ('next',)))
+    assert ran == ['next']
+    assert not actor.running
@@ -0,0 +1,48 @@
+import json
+import random
+
+import pytest
+
+from game import ChessGame
+from simulate import play_turn, random_policy, role_decks, start_game
+
+
+def _self_play(seed, turns=30):
+    decks = role_decks()
+    game = start_game(decks[seed % len(decks)], decks[(seed + 1) % len(decks)], seed)
+    rng = random.Random(seed)
+    for _ in range(turns):
+        if play_turn(game, random_policy, rng):
+            break
+    return game
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_replay_of_a_self_play_log_reaches_the_same_position(seed):
+    game = _self_play(seed)
+    log = json.loads(json.dumps(game.actions))  # as stored or sent over the wire
+    replayed = ChessGame.replay(game.seed, log)
+    assert replayed.to_bytes() == game.to_bytes()
+    assert replayed.zobrist_hash == game.zobrist_hash
+    assert replayed.actions == game.actions
+
+
+def test_log_records_calls_by_parameter_name_and_copies_positions():
+    game = _self_play(1, turns=2)
+    uid = game.current_player
+    frm, to = game.legal_moves(uid)[0]
+    frm, to = list(frm), list(to)
+    expected = {'type': 'move', 'from_pos': list(frm), 'to_pos': list(to), 'user_id': uid}
+    game.move(frm, to, uid)
+    frm[0] = to[0] = 99  # the caller reusing its lists must not rewrite the log
+    assert game.actions[-1] == expected
+
+
+def test_unmake_drops_the_undone_calls_from_the_log():
+    game = _self_play(2, turns=2)
+    before = game.actions
+    uid = game.current_player
+    game.move(*game.legal_moves(uid)[0], uid)
+    assert len(game.actions) == len(before) + 1
+    game.unmake()
+    assert game.actions == before
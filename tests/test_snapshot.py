@@ -0,0 +1,44 @@
+import pytest
+
+import snapshot
+from game import ChessGame
+from simulate import role_decks, start_game
+from snapshot import SnapshotError
+
+
+def _game():
+    decks = role_decks()
+    return start_game(decks[0], decks[1], 7)
+
+
+def test_round_trip_keeps_the_position():
+    game = _game()
+    restored = ChessGame.from_bytes(game.to_bytes())
+    assert restored.to_bytes() == game.to_bytes()
+    assert restored.zobrist_hash == game.zobrist_hash
+
+
+def test_round_trip_with_instance_ids_past_u16():
+    game = _game()
+    card = game.hands['1'][0]
+    card.id = str(70_000)
+    restored = ChessGame.from_bytes(game.to_bytes())
+    assert restored.hands['1'][0].id == '70000'
+    assert int(next(restored._card_ids)) == 70_001  # new ids don't collide
+
+
+def test_ids_outside_the_field_raise_a_snapshot_error():
+    game = _game()
+    game.hands['1'][0].id = str(1 << 32)
+    with pytest.raises(SnapshotError):
+        game.to_bytes()
+
+
+def test_version_1_snapshots_still_load(monkeypatch):
+    game = _game()
+    with monkeypatch.context() as m:
+        m.setattr(snapshot, 'VERSION', 1)
+        old = game.to_bytes()
+    assert old[2] == 1
+    restored = ChessGame.from_bytes(old)
+    assert restored.to_bytes() == game.to_bytes()
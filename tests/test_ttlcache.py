@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+
+import ttlcache
+from ttlcache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ttlcache, 'time', clock)
+    return clock
+
+
+def test_concurrent_misses_load_once():
+    cache = TTLCache()
+    started, release = threading.Event(), threading.Event()
+    loads = []
+
+    def load():
+        loads.append(1)
+        started.set()
+        release.wait(5)
+        return 'value'
+
+    results = []
+    def ask():
+        results.append(cache.get_or_load('k', load))
+    leader = threading.Thread(target=ask)
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=ask) for _ in range(4)]
+    for t in followers:
+        t.start()
+    release.set()
+    for t in [leader, *followers]:
+        t.join(5)
+
+    assert loads == [1]
+    assert results == ['value'] * 5
+    assert cache.get('k') == 'value'
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = TTLCache(ttl=10)
+    cache.put('k', 1)
+    clock.now += 9.9
+    assert cache.get('k') == 1
+    clock.now += 0.2
+    assert cache.get('k') is None
+    assert cache.get_or_load('k', lambda: 2) == 2
+
+
+def test_least_recently_used_entry_goes_first():
+    cache = TTLCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+
+
+def test_invalidate_during_a_load_keeps_the_result_out():
+    cache = TTLCache()
+
+    def load():
+        cache.invalidate('k')  # e.g. the row was deleted meanwhile
+        return 'stale'
+
+    assert cache.get_or_load('k', load) == 'stale'
+    assert cache.get('k') is None
+
+
+def test_a_failing_load_is_not_cached_and_followers_retry():
+    cache = TTLCache()
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError('db down')
+
+    errors, results = [], []
+    def lead():
+        try:
+            cache.get_or_load('k', failing)
+        except RuntimeError as e:
+            errors.append(e)
+    leader = threading.Thread(target=lead)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(cache.get_or_load('k', lambda: 'ok')))
+    follower.start()
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(errors) == 1
+    assert results == ['ok']
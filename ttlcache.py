@@ -0,0 +1,109 @@
+# ttlcache.py
+"""
+Bounded LRU cache with a time-to-live per entry, safe to share between
+request threads.
+
+    users = TTLCache(maxsize=10_000, ttl=300)
+    uid = users.get_or_load(key, lambda: expensive_lookup(key))
+
+get_or_load() is single-flight: when several threads miss the same key at
+once, one runs the loader and the others wait for its result.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Flight:
+    __slots__ = ('done', 'value', 'failed', 'invalidated')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.failed = False
+        self.invalidated = False  # invalidate() ran while loading; don't cache the result
+
+
+class TTLCache:
+    def __init__(self, maxsize=10_000, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires at, value), least recently used first
+        self._inflight = {}         # key -> _Flight
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._lookup(key, time.monotonic(), default)
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value, time.monotonic())
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            flight = self._inflight.get(key)
+            if flight is not None:
+                flight.invalidated = True
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            for flight in self._inflight.values():
+                flight.invalidated = True
+
+    def get_or_load(self, key, load):
+        """Cached value for key, else load() once across all threads that ask meanwhile."""
+        missing = object()
+        with self._lock:
+            value = self._lookup(key, time.monotonic(), missing)
+            if value is not missing:
+                return value
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if not flight.failed:
+                return flight.value
+            return load()  # the leader's load raised; let this caller see its own error
+
+        try:
+            value = load()
+        except BaseException:
+            flight.failed = True
+            raise
+        else:
+            flight.value = value
+            with self._lock:
+                if not flight.invalidated:
+                    self._store(key, value, time.monotonic())
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    # --- under self._lock ---
+
+    def _lookup(self, key, now, default):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        if entry[0] <= now:
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def _store(self, key, value, now):
+        self._data[key] = (now + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
@@ -0,0 +1,99 @@
+# zobrist.py
+"""
+64-bit Zobrist hash of a ChessGame position.
+
+Board and land tiles are hashed incrementally from the grid write hooks: each
+tile remembers the key it XORed in, so a write only swaps that key out and
+the new one in. Monster keys include class, owner and current attack/defense;
+the engine re-keys a tile after hooks that change stats in place.
+The fixed-size fields (turn_index, moves_this_turn, mana, per-turn flags) are
+folded in when the hash is read, which is O(1) as well.
+
+Keys come from blake2b over the key parts, so hashes are stable across
+processes (self-play workers, datasets).
+"""
+from functools import lru_cache
+from hashlib import blake2b
+
+PLAYERS = ('1', '2')
+TURN_FLAGS = ('summoned_this_turn', 'sorcery_used_this_turn', 'land_placed_this_turn')
+
+
+@lru_cache(maxsize=1 << 16)
+def zkey(*parts) -> int:
+    return int.from_bytes(blake2b(repr(parts).encode(), digest_size=8).digest(), 'little')
+
+
+def _monster_key(x, y, card):
+    if card is None:
+        return 0
+    return zkey('m', type(card).__name__, card.owner,
+                getattr(card, 'attack', None), getattr(card, 'defense', None), x, y)
+
+
+def _land_key(x, y, land):
+    if land is None:
+        return 0
+    return zkey('l', type(land).__name__, land.owner, x, y)
+
+
+class Zobrist:
+    def __init__(self):
+        self.board_hash = 0
+        self.monster_keys = [[0] * 6 for _ in range(6)]
+        self.land_keys = [[0] * 7 for _ in range(7)]
+
+    def clear_monsters(self, size=6):
+        for row in self.monster_keys:
+            for k in row:
+                self.board_hash ^= k
+        self.monster_keys = [[0] * size for _ in range(size)]
+
+    def clear_lands(self, size=7):
+        for row in self.land_keys:
+            for k in row:
+                self.board_hash ^= k
+        self.land_keys = [[0] * size for _ in range(size)]
+
+    def set_monster(self, x, y, card):
+        new = _monster_key(x, y, card)
+        row = self.monster_keys[x]
+        self.board_hash ^= row[y] ^ new
+        row[y] = new
+
+    def set_land(self, x, y, land):
+        new = _land_key(x, y, land)
+        row = self.land_keys[x]
+        self.board_hash ^= row[y] ^ new
+        row[y] = new
+
+    def sync(self, board, land_board):
+        """Re-key every tile (after effects that changed cards in place)."""
+        # tiles that are empty and hold no key are already right
+        for x, row in enumerate(board):
+            keys = self.monster_keys[x]
+            for y, card in enumerate(row):
+                if card is not None or keys[y]:
+                    self.set_monster(x, y, card)
+        for x, row in enumerate(land_board):
+            keys = self.land_keys[x]
+            for y, land in enumerate(row):
+                if land is not None or keys[y]:
+                    self.set_land(x, y, land)
+
+    def position_hash(self, game) -> int:
+        h = self.board_hash ^ zkey('turn', game.turn_index) ^ zkey('moves', game.moves_this_turn)
+        for pid in PLAYERS:
+            h ^= zkey('mana', pid, game.mana.get(pid, 0))
+        for name in TURN_FLAGS:
+            for pid in getattr(game, name):
+                h ^= zkey('flag', name, pid)
+        return h
+
+    def snapshot(self):
+        return self.board_hash, [r[:] for r in self.monster_keys], [r[:] for r in self.land_keys]
+
+    def restore(self, snap):
+        self.board_hash, monster_keys, land_keys = snap
+        self.monster_keys = [r[:] for r in monster_keys]
+        self.land_keys = [r[:] for r in land_keys]